@@ -0,0 +1,171 @@
+"""
+Asyncio page loader driving one headless Chromium over the DevTools protocol
+
+Selenium sends one blocking WebDriver round trip per command and needs a
+browser per concurrent page. This backend runs Playwright's async API on a
+single event loop in a background thread and opens each page as a tab of
+one shared browser, so dozens of pages load concurrently from one browser
+process. Fetch threads call load_page_source(), which blocks only the
+calling thread until its tab has rendered.
+
+Playwright is optional: install it with
+    pip install playwright && playwright install chromium
+"""
+
+import asyncio
+import threading
+import time
+
+import stage_timer
+from driver_pool import USER_AGENT
+from page_ready import wait_for_content_async
+from resource_filter import TRANSFER_FUNCTION
+
+
+class AsyncBrowser:
+    """
+    One Chromium process serving up to max_tabs pages at a time.
+
+    The browser is launched on the first page load and relaunched if it
+    crashes. With a ResourceFilter, every request of a tab is checked
+    against it and blocked requests are aborted.
+    """
+
+    def __init__(self, max_tabs=16, headless=True, navigation_timeout=60, resource_filter=None):
+        self.max_tabs = max(1, max_tabs)
+        self.headless = headless
+        self.navigation_timeout = navigation_timeout
+        self.resource_filter = resource_filter
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="devtools-loop", daemon=True)
+        self._thread.start()
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._tabs = None
+        self._starting = None
+        self._open_tabs = 0
+        self._closed = False
+        self.stats = {
+            'pages': 0,
+            'failed': 0,
+            'started': 0,
+            'startup_seconds': 0.0,
+            'max_open_tabs': 0,
+        }
+
+    def _run(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _launch(self):
+        try:
+            from playwright.async_api import async_playwright
+        except ImportError:
+            raise RuntimeError("The cdp browser backend needs Playwright: "
+                               "pip install playwright && playwright install chromium")
+
+        start = time.time()
+        with stage_timer.span('driver_startup'):
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=['--no-sandbox', '--disable-dev-shm-usage', '--disable-blink-features=AutomationControlled'])
+            self._context = await self._browser.new_context(user_agent=USER_AGENT,
+                                                            viewport={'width': 1920, 'height': 1080})
+        elapsed = time.time() - start
+        self.stats['started'] += 1
+        self.stats['startup_seconds'] += elapsed
+        print(f"Started Chromium for {self.max_tabs} tabs in {elapsed:.2f}s")
+
+    async def _ensure_browser(self):
+        if self._tabs is None:
+            self._tabs = asyncio.Semaphore(self.max_tabs)
+        if self._browser is not None and self._browser.is_connected():
+            return
+        # Tabs waiting for the browser share one launch
+        if self._starting is None:
+            self._starting = asyncio.ensure_future(self._launch())
+        try:
+            await self._starting
+        finally:
+            self._starting = None
+
+    async def _load(self, url, ready_selectors, ready_timeout, tags):
+        await self._ensure_browser()
+        async with self._tabs:
+            await self._ensure_browser()
+            page = await self._context.new_page()
+            self._open_tabs += 1
+            self.stats['max_open_tabs'] = max(self.stats['max_open_tabs'], self._open_tabs)
+            try:
+                if self.resource_filter:
+                    await page.route('**/*', lambda route: self._filter(url, route))
+                start = time.time()
+                with stage_timer.span('page_load', url, **tags):
+                    await page.goto(url, wait_until='domcontentloaded', timeout=self.navigation_timeout * 1000)
+
+                # Wait for the content the parser needs instead of a fixed sleep
+                with stage_timer.span('ready_wait', url, **tags):
+                    await wait_for_content_async(page, ready_selectors, timeout=ready_timeout)
+                if self.resource_filter:
+                    transferred, requests = await page.evaluate(TRANSFER_FUNCTION)
+                    self.resource_filter.record_page(url, time.time() - start, transferred, requests)
+                page_source = await page.content()
+                self.stats['pages'] += 1
+                return page_source
+            except Exception:
+                self.stats['failed'] += 1
+                raise
+            finally:
+                self._open_tabs -= 1
+                try:
+                    await page.close()
+                except Exception:
+                    # The browser crashed; the next load relaunches it
+                    pass
+
+    async def _filter(self, page_url, route):
+        request = route.request
+        if self.resource_filter.should_block(page_url, request.url, request.resource_type):
+            self.resource_filter.count_blocked()
+            await route.abort()
+        else:
+            await route.continue_()
+
+    def load_page_source(self, url, ready_selectors=('body',), ready_timeout=20):
+        """
+        Load a page in a new tab and return its rendered HTML once one of
+        ready_selectors has content and the page has settled
+        """
+        if self._closed:
+            raise RuntimeError("Async browser is closed")
+        # Spans recorded on the event loop thread carry the calling thread's tags
+        return self._run(self._load(url, ready_selectors, ready_timeout, stage_timer.current_tags()))
+
+    async def _shutdown(self):
+        for closer in (self._context, self._browser):
+            if closer is not None:
+                try:
+                    await closer.close()
+                except Exception as e:
+                    print(f"Error closing Chromium: {str(e)}")
+        if self._playwright is not None:
+            await self._playwright.stop()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._run(self._shutdown())
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"Async browser: {stats['pages']} pages, {stats['failed']} failed, up to "
+              f"{stats['max_open_tabs']} tabs open at once, {stats['started']} launches "
+              f"({stats['startup_seconds']:.2f}s total)")
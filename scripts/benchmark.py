@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the comparison pipeline
+
+Runs against synthetic policies so results are reproducible and need no
+network access.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import resource
+import shlex
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from cpu_pool import CpuPool, compare_texts, default_cpu_workers
+from diff_engine import DIFF_MODES, LineDiff, iter_diff_rows
+from extraction import extract_destination_text, extract_source_text
+import stage_timer
+from fixture_server import serve
+from similarity import MATCH_METRICS, SIMILARITY_METRICS, best_matches, score_pair, score_pairs, tokenize
+from test_data_generator import (generate_policy_comparison_data, generate_policy_page, generate_policy_text,
+                                 mutate_policy_text)
+
+
+def benchmark_diff(args):
+    """Compare the fast and precise diff backends on large synthetic policies"""
+    print(f"Diffing {args.policies} synthetic policies of ~{args.lines} lines with {args.mutation_rate:.0%} of lines changed")
+
+    pairs = []
+    for policy_num in range(args.policies):
+        source_text = generate_policy_text(policy_num, args.lines)
+        dest_text = mutate_policy_text(source_text, args.mutation_rate, seed=policy_num)
+        pairs.append((source_text, dest_text))
+
+    timings = {}
+    counts = {}
+    for mode in ('precise', 'fast'):
+        start = time.perf_counter()
+        counts[mode] = [Counter(status for status, _, _ in iter_diff_rows(s, d, mode)) for s, d in pairs]
+        timings[mode] = time.perf_counter() - start
+        print(f"  {mode:8s} {timings[mode]:8.2f}s  ({timings[mode] / len(pairs) * 1000:.1f} ms per policy)")
+
+    identical = sum(1 for p, f in zip(counts['precise'], counts['fast']) if p == f)
+    print(f"Speedup: {timings['precise'] / timings['fast']:.1f}x")
+    print(f"Identical Match/Only in Source/Only in Destination counts: {identical}/{len(pairs)} policies")
+    for idx, (p, f) in enumerate(zip(counts['precise'], counts['fast'])):
+        if p != f:
+            print(f"  policy {idx}: precise {dict(p)} vs fast {dict(f)}")
+
+
+def _load_corpus(corpus_dir):
+    """Every .html file under corpus_dir, e.g. a page cache directory or saved debug pages"""
+    pages = []
+    for root, _, files in os.walk(corpus_dir):
+        for name in sorted(files):
+            if name.endswith('.html'):
+                with open(os.path.join(root, name), 'r', encoding='utf-8', errors='replace') as f:
+                    pages.append((os.path.join(root, name), f.read()))
+    return pages
+
+
+def benchmark_extract(args):
+    """Compare the fast (lxml) and bs4 extraction backends on saved or synthetic pages"""
+    if args.corpus:
+        # A saved page does not say which site it came from, so try both parsers
+        jobs = [(name, html, extract) for name, html in _load_corpus(args.corpus)
+                for extract in (extract_source_text, extract_destination_text)]
+        print(f"Extracting {len(jobs) // 2} pages from {args.corpus} with both the source and destination parsers")
+    else:
+        jobs = [(f"synthetic {kind} {policy_num}", generate_policy_page(policy_num, kind, args.lines),
+                 extract_source_text if kind == 'source' else extract_destination_text)
+                for policy_num in range(args.pages) for kind in ('source', 'destination')]
+        print(f"Extracting {len(jobs)} synthetic pages of ~{args.lines} policy lines")
+
+    timings = {}
+    outputs = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The source parser writes a debug copy of the container to the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for backend in ('bs4', 'fast'):
+                    start = time.perf_counter()
+                    outputs[backend] = [extract(html, name, backend=backend) for name, html, extract in jobs]
+                    timings[backend] = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    for backend in ('bs4', 'fast'):
+        print(f"  {backend:5s} {timings[backend]:8.2f}s  ({timings[backend] / max(1, len(jobs)) * 1000:.1f} ms per extraction)")
+    if timings['fast']:
+        print(f"Speedup: {timings['bs4'] / timings['fast']:.1f}x")
+
+    identical = sum(1 for b, f in zip(outputs['bs4'], outputs['fast']) if b == f)
+    print(f"Identical text and found flag: {identical}/{len(outputs['bs4'])} extractions")
+    for (name, _, extract), b, f in zip(jobs, outputs['bs4'], outputs['fast']):
+        if b != f:
+            print(f"  {name} ({extract.__name__}): texts differ")
+
+
+def _cpu_job(source_html, dest_html, diff_mode):
+    """One pair's CPU work as the pipeline does it: extract both pages, then score and diff them"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        source_text, _ = extract_source_text(source_html)
+        dest_text, _ = extract_destination_text(dest_html)
+        _, diff_rows = compare_texts(source_text, dest_text, diff_mode)
+    return len(diff_rows)
+
+
+def benchmark_cpu(args):
+    """Scaling of the CPU stages over worker processes, on saved or synthetic pages"""
+    if args.corpus:
+        # Saved pages are not paired, so each page is extracted by both parsers and the texts compared
+        jobs = [(html, html) for _, html in _load_corpus(args.corpus)]
+        print(f"Extracting and comparing {len(jobs)} pages from {args.corpus}")
+    else:
+        jobs = []
+        for policy_num in range(args.policies):
+            source_text = generate_policy_text(policy_num, args.lines)
+            dest_text = mutate_policy_text(source_text, args.mutation_rate, seed=policy_num)
+            jobs.append((generate_policy_page(policy_num, 'source', text=source_text),
+                         generate_policy_page(policy_num, 'destination', text=dest_text)))
+        print(f"Extracting and comparing {len(jobs)} synthetic policy pairs of ~{args.lines} lines")
+
+    max_workers = args.max_workers or default_cpu_workers()
+    worker_counts = [0] + [n for n in (1, 2, 4, 8, 16, 32, 64) if n < max_workers] + [max_workers]
+    print(f"{os.cpu_count()} CPUs available")
+
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The source parser writes a debug copy of the container to the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp_dir)
+        try:
+            for workers in worker_counts:
+                cpu_pool = CpuPool(workers)
+                # As many threads as processes, like the compare stage of the pipeline
+                with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+                    # Start the worker processes before timing
+                    list(executor.map(lambda _: cpu_pool.run(abs, 0), range(max(1, workers))))
+                    start = time.perf_counter()
+                    rows = sum(executor.map(lambda job: cpu_pool.run(_cpu_job, job[0], job[1], args.diff_mode), jobs))
+                    elapsed = time.perf_counter() - start
+                cpu_pool.close()
+
+                label = f"{workers} processes" if workers else "main process"
+                if workers == 1:
+                    baseline = elapsed
+                scaling = (f"  {baseline / elapsed:5.2f}x vs 1 process, {baseline / elapsed / workers:4.0%} efficiency"
+                           if workers and baseline else "")
+                print(f"  {label:14s} {elapsed:8.2f}s  {len(jobs) / elapsed:6.1f} pairs/s  {rows} rows{scaling}")
+        finally:
+            os.chdir(cwd)
+
+
+def benchmark_similarity(args):
+    """Pair-by-pair versus batch similarity scoring, and best-match search versus a loop over every combination"""
+    sources = [generate_policy_text(policy_num, args.lines) for policy_num in range(args.policies)]
+    dests = [mutate_policy_text(text, args.mutation_rate, seed=policy_num) for policy_num, text in enumerate(sources)]
+    print(f"Scoring {args.policies} synthetic policy pairs of ~{args.lines} lines with all {len(SIMILARITY_METRICS)} metrics")
+
+    start = time.perf_counter()
+    looped = [score_pair(source, dest, SIMILARITY_METRICS) for source, dest in zip(sources, dests)]
+    loop_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = score_pairs(sources, dests, SIMILARITY_METRICS)
+    batch_elapsed = time.perf_counter() - start
+    print(f"  pair by pair {loop_elapsed:8.2f}s  (TF-IDF over each pair)")
+    print(f"  batch        {batch_elapsed:8.2f}s  (TF-IDF over the corpus)")
+    # TF-IDF weights differ on purpose: the batch takes its IDF over every text, a pair over its own two
+    for metric in SIMILARITY_METRICS:
+        if metric != 'tfidf_cosine':
+            agree = sum(1 for a, b in zip(looped, batched) if abs(a[metric] - b[metric]) < 1e-9)
+            print(f"  {metric:16s} identical for {agree}/{len(looped)} pairs")
+
+    # Shuffle the destinations so the best matches have to be found
+    order = list(range(args.policies))
+    random.Random(0).shuffle(order)
+    shuffled = [dests[i] for i in order]
+    print(f"Matching {args.policies} sources against {args.policies} shuffled destinations by {args.metric}")
+    source_tokens = [tokenize(text, [args.metric]) for text in sources]
+    dest_tokens = [tokenize(text, [args.metric]) for text in shuffled]
+
+    start = time.perf_counter()
+    matches = best_matches(source_tokens, dest_tokens, args.metric)
+    batch_elapsed = time.perf_counter() - start
+    found = sum(1 for i, candidates in enumerate(matches) if order[candidates[0][0]] == i)
+    print(f"  sparse matrix products {batch_elapsed:8.2f}s  {found}/{args.policies} sources matched their own destination")
+
+    if args.metric != 'tfidf_cosine':
+        start = time.perf_counter()
+        looped = [max(range(len(dest_tokens)), key=lambda j: score_pair(source, dest_tokens[j], [args.metric])[args.metric])
+                  for source in source_tokens]
+        loop_elapsed = time.perf_counter() - start
+        agree = sum(1 for best, candidates in zip(looped, matches) if best == candidates[0][0])
+        print(f"  Python loop            {loop_elapsed:8.2f}s  ({loop_elapsed / batch_elapsed:.1f}x), "
+              f"same best match for {agree}/{args.policies} sources")
+
+
+def _process_rss(pid):
+    """Resident memory in bytes of one process (Linux /proc only), 0 if it is gone"""
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def _process_tree_rss(pid=None):
+    """Resident memory in bytes of every descendant of a process (Linux /proc only), or None"""
+    pid = pid or os.getpid()
+    try:
+        children = {}
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat', 'r') as f:
+                        ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+                except (OSError, IndexError, ValueError):
+                    continue
+                children.setdefault(ppid, []).append(int(entry))
+    except OSError:
+        return None
+
+    total = 0
+    pending = list(children.get(pid, []))
+    while pending:
+        child = pending.pop()
+        pending.extend(children.get(child, []))
+        total += _process_rss(child)
+    return total
+
+
+def benchmark_browser(args):
+    """Pages per minute and memory per concurrent page of the Selenium and DevTools browser backends"""
+    # Imported here so the other benchmarks do not need Selenium or Playwright installed
+    from async_browser import AsyncBrowser
+    from compare_urls import SOURCE_READY_SELECTORS, load_page_source
+    from driver_pool import DriverPool
+    from resource_filter import ResourceFilter
+
+    # Every page pulls in the same images and web font, like the real policy portals
+    assets = ''.join(f'<img src="/banner-{n}.png">' for n in range(args.images))
+    assets += '<link rel="preload" href="/brand.woff2" as="font" crossorigin>'
+    pages = {f"/mp-{policy_num}": generate_policy_page(policy_num, 'source', args.lines).replace('</body>', assets + '</body>')
+             for policy_num in range(args.pages)}
+    paths = list(pages)
+    for n in range(args.images):
+        pages[f"/banner-{n}.png"] = os.urandom(args.image_kb * 1024)
+    pages["/brand.woff2"] = os.urandom(args.image_kb * 1024)
+    print(f"Loading {args.pages} synthetic pages of ~{args.lines} lines and {args.images} images "
+          f"with {args.concurrency} pages at a time")
+
+    runs = [(backend, blocking) for backend in args.backends.split(',')
+            for blocking in (('off', 'on') if args.blocking == 'both' else (args.blocking,))]
+    with serve(pages) as base_url:
+        urls = [base_url + path for path in paths]
+        for backend, blocking in runs:
+            resource_filter = (ResourceFilter() if blocking == 'on' else
+                               ResourceFilter(block_types=(), block_extensions=(), block_domains=()))
+            if backend == 'selenium':
+                browser = DriverPool(size=args.concurrency, headless=True, max_pages_per_driver=0,
+                                     resource_filter=resource_filter)
+                load = lambda url: load_page_source(url, True, browser, SOURCE_READY_SELECTORS, args.ready_timeout)
+            else:
+                browser = AsyncBrowser(max_tabs=args.concurrency, headless=True, resource_filter=resource_filter)
+                load = lambda url: browser.load_page_source(url, SOURCE_READY_SELECTORS, args.ready_timeout)
+            label = f"{backend} (blocking {blocking})"
+
+            peak = [0]
+            sampling = threading.Event()
+
+            def sample():
+                while not sampling.wait(0.2):
+                    peak[0] = max(peak[0], _process_tree_rss() or 0)
+
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+            try:
+                with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        loaded = sum(1 for html in executor.map(load, urls) if html)
+                    elapsed = time.perf_counter() - start
+            except Exception as e:
+                print(f"  {label:24s} failed: {str(e).strip().splitlines()[0]}")
+                continue
+            finally:
+                sampling.set()
+                sampler.join()
+                browser.close()
+
+            memory = (f"peak {peak[0] / 1024 / 1024:7.1f} MB browser memory, "
+                      f"{peak[0] / args.concurrency / 1024 / 1024:6.1f} MB per concurrent page") if peak[0] else "memory n/a"
+            stats = resource_filter.stats
+            transfer = f"{stats['bytes_transferred'] / max(1, stats['pages']) / 1024:7.0f} KB/page"
+            print(f"  {label:24s} {loaded} pages in {elapsed:7.2f}s  {loaded * 60 / elapsed:7.1f} pages/min  "
+                  f"{transfer}  {memory}")
+
+
+def benchmark_pipeline(args):
+    """Throughput, per-stage latency and peak memory of a full compare_urls.py run against the fixture server"""
+    scripts_dir = os.path.dirname(os.path.abspath(__file__))
+    server_command = [sys.executable, os.path.join(scripts_dir, 'fixture_server.py'), '--port', '0',
+                      '--lines', str(args.lines), '--mutation-rate', str(args.mutation_rate),
+                      '--delay', str(args.delay), '--js-fraction', str(args.js_fraction)]
+    if args.pages_dir:
+        server_command += ['--pages-dir', os.path.abspath(args.pages_dir)]
+    # The server runs in its own process so it does not compete with the run for the GIL
+    server = subprocess.Popen(server_command, stdout=subprocess.PIPE, text=True)
+    try:
+        base_url = server.stdout.readline().split()[-1]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            workbook = os.path.join(tmp_dir, 'policies.xlsx')
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_policy_comparison_data(workbook, args.policies, base_url)
+            output = os.path.join(tmp_dir, 'results', 'comparisons.xlsx')
+            timings = os.path.join(tmp_dir, 'results', 'timings.jsonl')
+            command = [sys.executable, os.path.join(scripts_dir, 'compare_urls.py'), '--config', workbook,
+                       '--output', output, '--headless', '--no-cache', '--rate-limit', '0',
+                       '--timings', timings] + shlex.split(args.compare_args)
+            print(f"Comparing {args.policies} synthetic policies of ~{args.lines} lines served from {base_url} "
+                  f"with {args.delay:.2f}s response delay")
+            print(f"  {' '.join(command[1:])}")
+
+            # The run writes output/ and debug files to its working directory
+            log_path = os.path.join(tmp_dir, 'run.log')
+            with open(log_path, 'w') as log:
+                start = time.perf_counter()
+                run = subprocess.Popen(command, cwd=tmp_dir, stdout=log, stderr=subprocess.STDOUT)
+                peak = 0
+                while run.poll() is None:
+                    peak = max(peak, _process_rss(run.pid) + (_process_tree_rss(run.pid) or 0))
+                    time.sleep(0.1)
+                elapsed = time.perf_counter() - start
+            if run.returncode:
+                with open(log_path, 'r') as log:
+                    print(''.join(log.readlines()[-20:]))
+                print(f"compare_urls.py exited with status {run.returncode}")
+                return
+            if not peak:
+                # No /proc: fall back to the largest finished child
+                peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+
+            with open(os.path.splitext(output)[0] + '_journal.jsonl', 'r') as f:
+                failed = sum(1 for line in f if '"state": "failed"' in line)
+            summary = stage_timer.summarize(timings)
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        'policies': args.policies,
+        'failed': failed,
+        'seconds': round(elapsed, 2),
+        'pairs_per_minute': round(args.policies * 60 / elapsed, 1),
+        'peak_rss_mb': round(peak / 1024 / 1024, 1),
+        'stages': summary,
+    }
+    print(f"  {args.policies} pairs ({failed} failed) in {elapsed:.2f}s, {result['pairs_per_minute']:.1f} pairs/min, "
+          f"peak memory {result['peak_rss_mb']:.1f} MB (run and its child processes)")
+    stage_timer.print_summary(summary)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        change = result['pairs_per_minute'] / baseline['pairs_per_minute'] - 1
+        print(f"Throughput {change:+.0%} against {args.baseline} ({baseline['pairs_per_minute']:.1f} pairs/min)")
+        for stage, before, after in stage_timer.regressions(summary, baseline['stages']):
+            print(f"⚠️ {stage} p95 regressed from {before:.3f}s to {after:.3f}s")
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Results saved to {args.save}")
+
+
+def _synthetic_results(count, lines, mutation_rate):
+    results = []
+    for policy_num in range(count):
+        source_text = generate_policy_text(policy_num, lines)
+        results.append({
+            'policy_number': str(policy_num),
+            'source_url': f"https://al-policies.exploremyplan.com/portal/web/medical-policies/-/mp-{policy_num}",
+            'dest_url': f"https://stage-us-mypolicies.itilitihealth.us/policy/938125692074/{policy_num}?lob=BCBS+AL",
+            'source_text': source_text,
+            'dest_text': mutate_policy_text(source_text, mutation_rate, seed=policy_num),
+            'similarity': 0.9,
+        })
+    return results
+
+
+def benchmark_results(args):
+    """Memory held by compared results: both texts plus row lists versus LineDiffs"""
+    texts = []
+    for policy_num in range(args.policies):
+        source_text = generate_policy_text(policy_num, args.lines)
+        texts.append((source_text, mutate_policy_text(source_text, args.mutation_rate, seed=policy_num)))
+    corpus_mb = sum(len(s) + len(d) for s, d in texts) / 1024 / 1024
+    print(f"Holding {args.policies} diffed synthetic policies of ~{args.lines} lines "
+          f"({corpus_mb:.1f} MB of text) with the {args.diff_mode} diff")
+
+    builders = {
+        'rows': lambda s, d: {'source_text': s, 'dest_text': d,
+                              'diff_rows': list(iter_diff_rows(s, d, args.diff_mode))},
+        'compact': lambda s, d: {'diff_rows': LineDiff.from_texts(s, d, args.diff_mode)},
+    }
+    for name, build in builders.items():
+        tracemalloc.start()
+        # Fresh copies of the texts, as fetched, so those a result keeps count against it
+        results = [build(s.encode('utf-8').decode('utf-8'), d.encode('utf-8').decode('utf-8')) for s, d in texts]
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        start = time.perf_counter()
+        rows = sum(1 for result in results for _ in result['diff_rows'])
+        elapsed = time.perf_counter() - start
+        print(f"  {name:8s} held {held / 1024 / 1024:7.1f} MB, peak {peak / 1024 / 1024:7.1f} MB, "
+              f"{rows} rows iterated in {elapsed:.2f}s")
+        del results
+
+
+def _write_inventory(path, rows):
+    """A workbook of `rows` URL pairs in the layout of test_data_generator.py"""
+    import openpyxl
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Policy Comparison Data")
+    ws.append(["Source URL", "Destination URL"])
+    for policy_num in range(rows):
+        ws.append([f"https://al-policies.exploremyplan.com/portal/web/medical-policies/-/mp-{policy_num}",
+                   f"https://stage-us-mypolicies.itilitihealth.us/policy/938125692074/{policy_num}?lob=BCBS+AL"])
+    wb.save(path)
+
+
+def _full_load_pairs(xlsx_path):
+    """The URL pairs as the loader read them before streaming: whole workbook, then cell by cell"""
+    import openpyxl
+    ws = openpyxl.load_workbook(xlsx_path).active
+    for row_idx in range(2, ws.max_row + 1):
+        yield {'source_url': ws.cell(row=row_idx, column=1).value, 'dest_url': ws.cell(row=row_idx, column=2).value}
+
+
+def benchmark_input(args):
+    """Time to the first URL pair and peak memory of loading a whole workbook versus streaming it"""
+    # Imported here so the other benchmarks do not need Selenium installed
+    from compare_urls import iter_url_pairs
+
+    loaders = {'full': _full_load_pairs, 'streaming': iter_url_pairs}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'inventory.xlsx')
+        _write_inventory(path, args.rows)
+        print(f"Reading a workbook of {args.rows} URL pairs ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+        # tracemalloc slows allocation-heavy code a lot, so time and memory are
+        # measured in separate passes
+        for name, load in loaders.items():
+            start = time.perf_counter()
+            pairs = load(path)
+            next(pairs)
+            first = time.perf_counter() - start
+            count = 1 + sum(1 for _ in pairs)
+            elapsed = time.perf_counter() - start
+
+            tracemalloc.start()
+            for _ in load(path):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"  {name:9s} first pair after {first:6.2f}s, {count} pairs in {elapsed:6.2f}s, "
+                  f"peak {peak / 1024 / 1024:7.1f} MB")
+
+
+def benchmark_report(args):
+    """Compare peak memory and write time of the append and streaming report modes"""
+    # Imported here so the diff benchmark does not need Selenium installed
+    from compare_urls import create_comparison_excel
+
+    results = _synthetic_results(args.policies, args.lines, args.mutation_rate)
+    print(f"Writing reports for {args.policies} synthetic policies of ~{args.lines} lines, "
+          f"{args.runs} consecutive runs into the same output")
+
+    # tracemalloc slows allocation-heavy code a lot, so time and memory are
+    # measured in separate passes
+    for measure in ('time', 'memory'):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for mode in ('append', 'streaming'):
+                output_file = os.path.join(tmp_dir, f"{mode}.xlsx")
+                for run in range(1, args.runs + 1):
+                    if measure == 'memory':
+                        tracemalloc.start()
+                    start = time.perf_counter()
+                    create_comparison_excel(results, output_file, report_mode=mode)
+                    elapsed = time.perf_counter() - start
+                    if measure == 'time':
+                        print(f"  {mode:9s} run {run}: {elapsed:7.2f}s")
+                    else:
+                        _, peak = tracemalloc.get_traced_memory()
+                        tracemalloc.stop()
+                        print(f"  {mode:9s} run {run}: peak {peak / 1024 / 1024:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark parts of the policy comparison pipeline')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    diff_parser = subparsers.add_parser('diff', help='Fast versus precise line diff')
+    diff_parser.add_argument('--policies', type=int, default=5,
+                             help='Number of synthetic policies to diff')
+    diff_parser.add_argument('--lines', type=int, default=3000,
+                             help='Approximate number of lines per policy')
+    diff_parser.add_argument('--mutation-rate', type=float, default=0.02,
+                             help='Fraction of lines edited, deleted or inserted in the destination')
+    diff_parser.set_defaults(func=benchmark_diff)
+
+    extract_parser = subparsers.add_parser('extract', help='Fast (lxml) versus bs4 HTML extraction')
+    extract_parser.add_argument('--corpus', default=None,
+                                help='Directory of saved .html pages, e.g. the page cache (default: synthetic pages)')
+    extract_parser.add_argument('--pages', type=int, default=50,
+                                help='Number of synthetic policies, each with a source and a destination page')
+    extract_parser.add_argument('--lines', type=int, default=1000,
+                                help='Approximate number of lines per synthetic policy')
+    extract_parser.set_defaults(func=benchmark_extract)
+
+    cpu_parser = subparsers.add_parser('cpu', help='Scaling of extraction, similarity and diffing over processes')
+    cpu_parser.add_argument('--corpus', default=None,
+                            help='Directory of saved .html pages, e.g. the page cache (default: synthetic pages)')
+    cpu_parser.add_argument('--policies', type=int, default=64,
+                            help='Number of synthetic policy pairs')
+    cpu_parser.add_argument('--lines', type=int, default=1000,
+                            help='Approximate number of lines per synthetic policy')
+    cpu_parser.add_argument('--mutation-rate', type=float, default=0.02,
+                            help='Fraction of lines edited, deleted or inserted in the destination')
+    cpu_parser.add_argument('--diff-mode', choices=DIFF_MODES, default='fast',
+                            help='Line diff backend to run')
+    cpu_parser.add_argument('--max-workers', type=int, default=0,
+                            help='Largest number of processes to try (default: one per CPU)')
+    cpu_parser.set_defaults(func=benchmark_cpu)
+
+    similarity_parser = subparsers.add_parser('similarity', help='Pair-by-pair versus batch similarity scoring')
+    similarity_parser.add_argument('--policies', type=int, default=500,
+                                   help='Number of synthetic policy pairs')
+    similarity_parser.add_argument('--lines', type=int, default=300,
+                                   help='Approximate number of lines per synthetic policy')
+    similarity_parser.add_argument('--mutation-rate', type=float, default=0.05,
+                                   help='Fraction of lines edited, deleted or inserted in the destination')
+    similarity_parser.add_argument('--metric', choices=MATCH_METRICS, default='word_jaccard',
+                                   help='Metric for the best-match search')
+    similarity_parser.set_defaults(func=benchmark_similarity)
+
+    pipeline_parser = subparsers.add_parser('pipeline', help='Full compare_urls.py run against a local fixture server')
+    pipeline_parser.add_argument('--policies', type=int, default=1000,
+                                 help='Number of distinct synthetic policies in the workbook')
+    pipeline_parser.add_argument('--lines', type=int, default=300,
+                                 help='Approximate number of lines per synthetic policy')
+    pipeline_parser.add_argument('--mutation-rate', type=float, default=0.02,
+                                 help='Fraction of lines edited, deleted or inserted on the destination pages')
+    pipeline_parser.add_argument('--delay', type=float, default=0.05,
+                                 help='Seconds the fixture server waits before answering each request')
+    pipeline_parser.add_argument('--js-fraction', type=float, default=0.0,
+                                 help='Share of pages rendered by a script, which need the browser tier')
+    pipeline_parser.add_argument('--pages-dir', default=None,
+                                 help='Recorded source_<policy>.html and dest_<policy>.html pages to serve')
+    pipeline_parser.add_argument('--compare-args', default='--workers 8',
+                                 help='Extra compare_urls.py options, e.g. "--workers 16 --diff-mode precise"')
+    pipeline_parser.add_argument('--save', default=None,
+                                 help='Save throughput, peak memory and stage timings to this JSON file')
+    pipeline_parser.add_argument('--baseline', default=None,
+                                 help='JSON file saved by an earlier --save to compare against')
+    pipeline_parser.set_defaults(func=benchmark_pipeline)
+
+    browser_parser = subparsers.add_parser('browser', help='Selenium versus DevTools (cdp) browser backend')
+    browser_parser.add_argument('--pages', type=int, default=50,
+                                help='Number of synthetic pages served by a local fixture server')
+    browser_parser.add_argument('--lines', type=int, default=1000,
+                                help='Approximate number of lines per synthetic policy')
+    browser_parser.add_argument('--concurrency', type=int, default=8,
+                                help='Pages loaded at once: Selenium drivers or cdp tabs')
+    browser_parser.add_argument('--ready-timeout', type=float, default=20,
+                                help='Seconds to wait for each page to render')
+    browser_parser.add_argument('--backends', default='selenium,cdp',
+                                help='Comma-separated backends to run')
+    browser_parser.add_argument('--images', type=int, default=4,
+                                help='Images per page')
+    browser_parser.add_argument('--image-kb', type=int, default=200,
+                                help='Size of each image and of the web font in KB')
+    browser_parser.add_argument('--blocking', choices=('on', 'off', 'both'), default='both',
+                                help='Run with resource blocking on, off or both')
+    browser_parser.set_defaults(func=benchmark_browser)
+
+    input_parser = subparsers.add_parser('input', help='Whole-workbook versus streaming URL pair loading')
+    input_parser.add_argument('--rows', type=int, default=100000,
+                              help='Number of URL pairs in the synthetic workbook')
+    input_parser.set_defaults(func=benchmark_input)
+
+    results_parser = subparsers.add_parser('results', help='Memory of row lists versus compact LineDiff results')
+    results_parser.add_argument('--policies', type=int, default=200,
+                                help='Number of synthetic policies held')
+    results_parser.add_argument('--lines', type=int, default=1000,
+                                help='Approximate number of lines per policy')
+    results_parser.add_argument('--mutation-rate', type=float, default=0.02,
+                                help='Fraction of lines edited, deleted or inserted in the destination')
+    results_parser.add_argument('--diff-mode', choices=DIFF_MODES, default='fast',
+                                help='Line diff backend to run')
+    results_parser.set_defaults(func=benchmark_results)
+
+    report_parser = subparsers.add_parser('report', help='Append versus streaming Excel report writing')
+    report_parser.add_argument('--policies', type=int, default=20,
+                               help='Number of synthetic policies in the report')
+    report_parser.add_argument('--lines', type=int, default=1000,
+                               help='Approximate number of lines per policy')
+    report_parser.add_argument('--mutation-rate', type=float, default=0.02,
+                               help='Fraction of lines edited, deleted or inserted in the destination')
+    report_parser.add_argument('--runs', type=int, default=2,
+                               help='Consecutive runs writing to the same output file')
+    report_parser.set_defaults(func=benchmark_report)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,212 +1,228 @@
 import time
 import re
 import argparse
+import contextlib
+import csv
+import itertools
 import os
 import json
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
-import openpyxl
-from openpyxl.styles import PatternFill, Font
-import difflib
-
-def get_text_from_source_url(url, headless=True):
+import socket
+import subprocess
+import sys
+import threading
+from collections import deque
+from functools import partial
+from diff_engine import DIFF_MODES, LineDiff
+from driver_pool import DriverPool
+from extraction import EXTRACT_BACKENDS, extract_source_text, extract_destination_text
+from async_browser import AsyncBrowser
+from cpu_pool import CpuPool, compare_texts
+from fetch_plan import FetchPlan, SharedFetches, StreamingFetchPlan, planned_input
+from fetch_cache import FetchCache, content_hash
+from fetch_resilience import FetchError, FetchResilience, classify
+from http_fetcher import HttpFetcher
+from page_ready import wait_for_content
+from pipeline import Pipeline
+from rate_limiter import HostRateLimiter
+from resource_filter import TRANSFER_SCRIPT, ResourceFilter
+from similarity import SIMILARITY_METRICS, iter_saved_texts, read_saved_texts
+from run_journal import RunJournal, parse_shard, saved_name, select_shard
+from results_store import ResultsStore
+from run_manifest import RunManifest
+from work_queue import WorkQueue
+import stage_timer
+
+# Containers the parsers read, in the order they try them
+SOURCE_READY_SELECTORS = ('div.journal-content-article', 'div.journey-content-article')
+DESTINATION_READY_SELECTORS = ('main div.contentWrapper', 'main')
+
+def load_page_source(url, headless=True, driver_pool=None, ready_selectors=('body',), ready_timeout=20):
     """
-    Parser specifically for the source URL
+    Load a page in a pooled Chrome driver and return its rendered HTML
+    once one of ready_selectors has content and the page has settled
     """
-    print(f"Fetching source URL: {url}")
-    
-    # Set up Chrome options
-    options = Options()
-    if headless:
-        options.add_argument('--headless')  # Run in background if headless=True
-    
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--window-size=1920,1080')
-    
-    # Set a realistic user agent
-    user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-    options.add_argument(f'user-agent={user_agent}')
-    
-    # Initialize the driver
-    options = Options()
-    if headless:
-        options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-
-    # Use the system ChromeDriver
-    driver = webdriver.Chrome(options=options)
+    # Fall back to a single-use pool when called outside compare_url_pairs
+    owns_pool = driver_pool is None
+    if owns_pool:
+        driver_pool = DriverPool(size=1, headless=headless)
     
+    resource_filter = driver_pool.resource_filter
     try:
-        # Load the page
-        driver.get(url)
-        
-        # Wait for the page to load completely
-        wait = WebDriverWait(driver, 20)
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
-        
-        # Give extra time for JavaScript content
-        time.sleep(5)
-        
-        # Get the page source
-        page_source = driver.page_source
-        
-        # Use BeautifulSoup to parse and clean
-        soup = BeautifulSoup(page_source, 'html.parser')
-        
-        # UPDATED: Look for the div with class 'journal-content-article'
-        # This matches the structure in the alabama.html file
-        main_content = soup.find('div', class_='journal-content-article')
-        
-        if main_content:
-            print(f"✅ Found main content using 'journal-content-article' class")
-            # Remove specific unwanted elements
-            for tag in main_content.find_all(["script", "style", "div", "a"], class_="hidden-print"):
-                tag.decompose()
+        with driver_pool.driver() as driver:
+            if resource_filter:
+                block_resources(driver, resource_filter, url)
+            start = time.time()
             
-            # Get text from the cleaned main content
-            text = main_content.get_text(separator='\n', strip=True)
+            # Load the page
+            with stage_timer.span('page_load', url):
+                driver.get(url)
             
-            # Save a debug copy of the HTML content
-            if not os.environ.get('GITHUB_ACTIONS'):  # Avoid writing debug files in GitHub Actions
-                with open("source_html_debug.html", "w", encoding="utf-8") as f:
-                    f.write(str(main_content))
-                
-        else:
-            print(f"❌ Main content not found using 'journal-content-article'")
-            # Try alternate class as fallback
-            main_content = soup.find('div', class_='journey-content-article')
+            # Wait for the content the parser needs instead of a fixed sleep
+            with stage_timer.span('ready_wait', url):
+                wait_for_content(driver, ready_selectors, timeout=ready_timeout)
             
-            if main_content:
-                print(f"✅ Found main content using 'journey-content-article' class")
-                # Remove specific unwanted elements
-                for tag in main_content.find_all(["script", "style", "div", "a"], class_="hidden-print"):
-                    tag.decompose()
-                
-                # Get text from the cleaned main content
-                text = main_content.get_text(separator='\n', strip=True)
-            else:
-                print(f"❌ Main content not found for {url}")
-                # If we can't find the specific content, fall back to the entire page
-                # but still clean up unwanted elements
-                for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
-                    script_or_style.decompose()
-                    
-                text = soup.get_text(separator='\n', strip=True)
-        
-        # Clean up text
-        text = re.sub(r'\n+', '\n', text)
-        
-        return text
-    except Exception as e:
-        print(f"Error with Selenium: {str(e)}")
-        return f"Error fetching {url} with Selenium: {str(e)}"
+            if resource_filter:
+                transferred, requests = driver.execute_script(TRANSFER_SCRIPT)
+                resource_filter.record_page(url, time.time() - start, transferred, requests)
+            
+            # Get the page source
+            return driver.page_source
     finally:
-        # Always close the driver
-        driver.quit()
+        if owns_pool:
+            driver_pool.close()
 
-def get_text_from_destination_url(url, headless=True):
+def block_resources(driver, resource_filter, url):
     """
-    Parser specifically for the destination URL in the main tag
+    Block the filter's resource types and third-party domains for the
+    next page load, allowing the domains allowlisted for its host
     """
-    print(f"Fetching destination URL: {url}")
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': resource_filter.url_patterns(url)})
+    except Exception as e:
+        print(f"Could not set up resource blocking: {str(e)}")
+
+def fetch_static_text(url, kind, http_fetcher, extract, cache=None, entry=None):
+    """
+    Try to extract a page's text from its plain HTML without a browser.
+    A cached entry is revalidated with a conditional request and its text
+    reused when the page is unchanged.
+    Returns None when the page needs to be rendered in the browser.
+    Timeouts, connection errors and 5xx answers are raised as a FetchError
+    instead, since the browser would fail on the same host.
+    """
+    headers = {}
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
     
-    # Set up Chrome options
-    options = Options()
-    if headless:
-        options.add_argument('--headless')  # Run in background if headless=True
+    start = time.time()
+    try:
+        with stage_timer.span('http_fetch', url):
+            response = http_fetcher.fetch(url, headers)
+    except Exception as e:
+        error = classify(url, e)
+        if error.transient:
+            raise error
+        print(f"HTTP fetch failed, falling back to the browser: {str(e)}")
+        return None
+    etag = response.headers.get('ETag')
+    last_modified = response.headers.get('Last-Modified')
     
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-blink-features=AutomationControlled')
-    options.add_argument('--window-size=1920,1080')
+    if entry and (response.status_code == 304 or entry['content_hash'] == content_hash(response.text)):
+        print(f"Page unchanged since last fetch, reusing cached text")
+        cache.count('revalidated')
+        cache.refresh(kind, url, entry, etag, last_modified)
+        http_fetcher.record_tier(url, 'http', time.time() - start)
+        return entry['text']
+    if response.status_code == 304:
+        return None
     
-    # Set a realistic user agent
-    user_agent = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
-    options.add_argument(f'user-agent={user_agent}')
+    page_source = response.text
+    text, found = extract(page_source, url)
+    if not found:
+        print(f"Policy content not in static HTML, falling back to the browser")
+        return None
     
-    # Initialize the driver
-    options = Options()
-    if headless:
-        options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
+    if cache:
+        cache.count('misses')
+        cache.put(kind, url, page_source, text, 'http', etag, last_modified)
+    http_fetcher.record_tier(url, 'http', time.time() - start)
+    return text
 
-    # Use the system ChromeDriver
-    driver = webdriver.Chrome(options=options)
+def fetch_text(url, kind, extract, ready_selectors, headless=True, driver_pool=None, ready_timeout=20,
+               http_fetcher=None, cache=None, async_browser=None):
+    """
+    Fetch a page's text, trying plain HTTP first when an http_fetcher is
+    given and falling back to a pooled browser, or to a tab of the
+    async_browser when one is given.
+    With a cache, recently fetched pages are served from disk and older
+    ones reuse their cached text when the page has not changed.
+    """
+    entry = cache.get(kind, url) if cache else None
+    if entry and cache.is_fresh(entry):
+        print(f"Using cached text fetched {time.time() - entry['fetched_at']:.0f}s ago")
+        cache.count('hits')
+        return entry['text']
+    
+    # Pages that needed the browser last time will need it again
+    if http_fetcher and not (entry and entry['tier'] == 'browser'):
+        text = fetch_static_text(url, kind, http_fetcher, extract, cache, entry)
+        if text is not None:
+            return text
+    
+    start = time.time()
+    # Borrow a warm browser and load the page
+    if async_browser:
+        page_source = async_browser.load_page_source(url, ready_selectors, ready_timeout)
+    else:
+        page_source = load_page_source(url, headless, driver_pool, ready_selectors, ready_timeout)
+    if entry and entry['content_hash'] == content_hash(page_source):
+        print(f"Page unchanged since last fetch, reusing cached text")
+        cache.count('revalidated')
+        cache.refresh(kind, url, entry)
+        text = entry['text']
+    else:
+        text, _ = extract(page_source, url)
+        if cache:
+            cache.count('misses')
+            cache.put(kind, url, page_source, text, 'browser')
+    if http_fetcher:
+        http_fetcher.record_tier(url, 'browser', time.time() - start)
+    return text
+
+def fetch_page_text(url, kind, extract, ready_selectors, rate_limiter=None, resilience=None, **fetch_options):
+    """
+    fetch_text behind the host's rate limiter; with a FetchResilience,
+    transient failures are retried and hosts whose circuit is open fail
+    fast. Returns the text, or the FetchError if the page could not be
+    fetched.
+    """
+    def attempt():
+        # Retries wait for the rate limiter like any other request
+        if rate_limiter:
+            with stage_timer.span('rate_limit_wait', url):
+                rate_limiter.acquire(url)
+        return fetch_text(url, kind, extract, ready_selectors, **fetch_options)
     
     try:
-        # Load the page
-        driver.get(url)
-        
-        # Wait for the page to load completely
-        wait = WebDriverWait(driver, 20)
-        wait.until(EC.presence_of_element_located((By.TAG_NAME, 'body')))
-        
-        # Give extra time for JavaScript content
-        time.sleep(5)
-        
-        # Get the page source
-        page_source = driver.page_source
-        
-        # Use BeautifulSoup to parse and clean
-        soup = BeautifulSoup(page_source, 'html.parser')
-        
-        # SPECIFIC PARSING FOR DESTINATION URL - FIND MAIN TAG
-        main_tag = soup.find('main')
-        
-        if main_tag:
-            print(f"✅ Found main tag in destination URL")
-            
-            # Extract content from within the main tag
-            content_wrapper_divs = main_tag.find_all('div', class_='contentWrapper')
-            
-            if content_wrapper_divs:
-                all_text = []
-                
-                # Process each content wrapper div
-                for div in content_wrapper_divs:
-                    # Remove any scripts, styles, etc.
-                    for element in div.find_all(['script', 'style']):
-                        element.decompose()
-                    
-                    # Get the text from this div
-                    div_text = div.get_text(separator='\n', strip=True)
-                    all_text.append(div_text)
-                
-                # Combine all text from content wrappers
-                text = '\n\n'.join(all_text)
-            else:
-                # If no content wrapper divs, get all text from main tag
-                for element in main_tag.find_all(['script', 'style']):
-                    element.decompose()
-                text = main_tag.get_text(separator='\n', strip=True)
-        else:
-            print(f"❌ Main tag not found for {url}")
-            # If we can't find the main tag, fall back to the entire page
-            for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
-                script_or_style.decompose()
-                
-            text = soup.get_text(separator='\n', strip=True)
-        
-        # Clean up text
-        text = re.sub(r'\n+', '\n', text)
-        
-        return text
+        return resilience.call(url, attempt) if resilience else attempt()
     except Exception as e:
-        print(f"Error with Selenium: {str(e)}")
-        return f"Error fetching {url} with Selenium: {str(e)}"
-    finally:
-        # Always close the driver
-        driver.quit()
+        error = classify(url, e)
+        print(f"Error after {error.attempts} attempt(s) ({error.reason}): {error.message}")
+        return error
+
+def get_text_from_source_url(url, headless=True, driver_pool=None, ready_timeout=20, http_fetcher=None, cache=None,
+                             extract_backend='fast', cpu_pool=None, async_browser=None, rate_limiter=None,
+                             resilience=None):
+    """
+    Parser specifically for the source URL
+    """
+    print(f"Fetching source URL: {url}")
+    
+    extract = partial(extract_source_text, backend=extract_backend)
+    if cpu_pool:
+        extract = partial(cpu_pool.run, extract)
+    return fetch_page_text(url, 'source', extract, SOURCE_READY_SELECTORS, rate_limiter, resilience,
+                           headless=headless, driver_pool=driver_pool, ready_timeout=ready_timeout,
+                           http_fetcher=http_fetcher, cache=cache, async_browser=async_browser)
+
+def get_text_from_destination_url(url, headless=True, driver_pool=None, ready_timeout=20, http_fetcher=None, cache=None,
+                                  extract_backend='fast', cpu_pool=None, async_browser=None, rate_limiter=None,
+                                  resilience=None):
+    """
+    Parser specifically for the destination URL in the main tag
+    """
+    print(f"Fetching destination URL: {url}")
+    
+    extract = partial(extract_destination_text, backend=extract_backend)
+    if cpu_pool:
+        extract = partial(cpu_pool.run, extract)
+    return fetch_page_text(url, 'destination', extract, DESTINATION_READY_SELECTORS, rate_limiter, resilience,
+                           headless=headless, driver_pool=driver_pool, ready_timeout=ready_timeout,
+                           http_fetcher=http_fetcher, cache=cache, async_browser=async_browser)
 
 def extract_policy_number(url):
     """
@@ -225,11 +241,151 @@ def extract_policy_number(url):
     # If no pattern matches, return 'Unknown'
     return 'Unknown'
 
-def create_comparison_excel(url_pairs_results, output_file="policy_comparisons.xlsx"):
+def diff_rows_for_result(result, diff_mode='fast'):
+    """
+    The result's report rows as a LineDiff: its 'diff_rows', computed on
+    the compare stage or carried forward by the manifest, or else a diff
+    of its texts with diff_mode
+    """
+    diff_rows = result.get('diff_rows')
+    if diff_rows is None:
+        diff_rows = LineDiff.from_texts(result['source_text'], result['dest_text'], diff_mode)
+    return diff_rows
+
+def compact_result(result):
+    """
+    Drop the texts of a result whose LineDiff is computed; the diff holds
+    every line of both and rebuilds them when needed
+    """
+    if result.get('diff_rows') is not None:
+        result.pop('source_text', None)
+        result.pop('dest_text', None)
+    return result
+
+def policy_result_record(result, diff_rows):
+    """
+    A compared policy's similarity and report rows as a JSON-serializable
+    dict, as saved to output/ or pushed to a work queue
+    """
+    return {
+        'policy_number': result['policy_number'],
+        'source_url': result['source_url'],
+        'dest_url': result['dest_url'],
+        'similarity': result['similarity'],
+        'error': result.get('error', False),
+        'diff': diff_rows.to_json(),
+    }
+
+def policy_result_from_record(record, pair):
+    """
+    The result a record made by policy_result_record stands for
+    """
+    if 'diff' in record:
+        record['diff_rows'] = LineDiff.from_json(record.pop('diff'))
+    else:
+        # Written before results were saved compactly
+        record['diff_rows'] = LineDiff.from_rows(record['diff_rows'])
+    record['pair'] = pair
+    return record
+
+def save_policy_result(result, diff_rows, output_dir='output'):
+    """
+    Write a compared policy's similarity and report rows to
+    output_dir/result_<saved name>.json, named by run_journal.saved_name
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    name = saved_name(result['policy_number'], result['source_url'], result['dest_url'])
+    path = os.path.join(output_dir, f"result_{name}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(policy_result_record(result, diff_rows), f)
+    os.replace(tmp_path, path)
+
+def load_policy_result(pair, output_dir='output'):
+    """
+    Load a policy written by an earlier, interrupted run from
+    output_dir/result_<saved name>.json
+    Returns None when the file is missing or belongs to other URLs
+    """
+    name = saved_name(extract_policy_number(pair['source_url']), pair['source_url'], pair['dest_url'])
+    path = os.path.join(output_dir, f"result_{name}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved['source_url'] != pair['source_url'] or saved['dest_url'] != pair['dest_url']:
+        return None
+    saved = policy_result_from_record(saved, pair)
+    saved['resumed'] = True
+    return saved
+
+def write_streaming_report(url_pairs_results, output_file, run_stats=None, manifest=None, diff_mode='fast',
+                           flush_dir=None, journal=None, store=None, keep_archives=None):
+    """
+    Write results to a fresh write-only report as they arrive
+    url_pairs_results may be any iterable, such as iter_url_pair_results;
+    with flush_dir every policy is also saved there by save_policy_result
+    as soon as it is written, and marked written in the journal, if given.
+    With a ResultsStore, every written policy is recorded in its run.
+    If the run fails or is interrupted, the iterator is closed and the
+    policies written so far are still saved.
+    Results loaded by load_policy_result are written as they are.
+    keep_archives is the number of previous reports kept, by default
+    report_writer.ARCHIVES_KEPT; 0 replaces the report without archiving it
+    """
+    # openpyxl is only imported once there is a report to write
+    from report_writer import StreamingReportWriter
+    
+    writer = StreamingReportWriter(output_file, keep_archives)
+    try:
+        for result in url_pairs_results:
+            with stage_timer.span('report_write', policy=result['policy_number']):
+                diff_rows = diff_rows_for_result(result, diff_mode)
+                writer.write_policy(result, diff_rows)
+            if store is not None:
+                store.record(result, diff_rows)
+            if result.get('resumed'):
+                continue
+            if flush_dir:
+                save_policy_result(result, diff_rows, flush_dir)
+            if journal is not None and not result['error']:
+                journal.record(result['pair'], 'written')
+            if manifest is not None:
+                manifest.record(result, diff_rows)
+    finally:
+        # Stop the pipeline first so its run stats are complete
+        close = getattr(url_pairs_results, 'close', None)
+        if close:
+            close()
+        with stage_timer.span('report_save'):
+            writer.close(run_stats)
+
+def create_comparison_excel(url_pairs_results, output_file="policy_comparisons.xlsx", run_stats=None, manifest=None,
+                            diff_mode='fast', report_mode='streaming', store=None, keep_archives=None):
     """
     Create an Excel file with comparisons for multiple URL pairs
+    run_stats, if given, are written to a "Run Stats" sheet replacing the
+    previous run's
+    Results carrying 'diff_rows' from a previous run are written without
+    re-diffing; every written policy is recorded in the manifest and the
+    ResultsStore, if given
+    diff_mode selects the diff backend, 'fast' or 'precise' (difflib.Differ)
+    report_mode 'streaming' writes a fresh write-only workbook and archives
+    any existing report, keeping keep_archives of them; 'append' loads the
+    existing report and appends to it
     """
-    print(f"Creating Excel file with comparisons for {len(url_pairs_results)} policy pairs...")
+    count = len(url_pairs_results) if hasattr(url_pairs_results, '__len__') else 'streamed'
+    print(f"Creating Excel file with comparisons for {count} policy pairs...")
+    
+    if report_mode == 'streaming':
+        write_streaming_report(url_pairs_results, output_file, run_stats, manifest, diff_mode, store=store,
+                               keep_archives=keep_archives)
+        return
+    
+    import openpyxl
+    from openpyxl.styles import PatternFill, Font
+    from report_writer import write_run_stats_sheet
     
     # Create the output directory if it doesn't exist
     os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
@@ -263,11 +419,10 @@ def create_comparison_excel(url_pairs_results, output_file="policy_comparisons.x
     
     # Process each URL pair result
     for result in url_pairs_results:
+        policy_start = time.perf_counter()
         policy_number = result['policy_number']
         source_url = result['source_url']
         dest_url = result['dest_url']
-        source_text = result['source_text']
-        dest_text = result['dest_text']
         similarity = result['similarity']
         
         # Add policy info
@@ -276,43 +431,37 @@ def create_comparison_excel(url_pairs_results, output_file="policy_comparisons.x
         ws.cell(row=row, column=2, value=source_url)
         ws.cell(row=row, column=3, value=dest_url)
         
-        # Split text into lines
-        source_lines = source_text.split('\n')
-        dest_lines = dest_text.split('\n')
-        
-        # Use difflib to compare lines
-        differ = difflib.Differ()
-        diff = list(differ.compare(source_lines, dest_lines))
+        # Reuse the rows carried forward from the previous run when the
+        # content is unchanged, otherwise diff the two texts
+        diff_rows = diff_rows_for_result(result, diff_mode)
         
         # Process the differences
-        for line in diff:
-            prefix = line[0:2]
-            content = line[2:]
+        for status, source_content, dest_content in diff_rows:
             # ✅ Repeat metadata in every row
             ws.cell(row=row, column=1, value=policy_number)
             ws.cell(row=row, column=2, value=source_url)
             ws.cell(row=row, column=3, value=dest_url)
             
-            if prefix == '  ':  # Line in both files
-                ws.cell(row=row, column=4, value=content)
-                ws.cell(row=row, column=5, value=content)
+            if status == "Match":  # Line in both files
+                ws.cell(row=row, column=4, value=source_content)
+                ws.cell(row=row, column=5, value=dest_content)
                 ws.cell(row=row, column=6, value="Match")
                 
                 # Apply white background
                 ws.cell(row=row, column=4).fill = match_fill
                 ws.cell(row=row, column=5).fill = match_fill
                 
-            elif prefix == '- ':  # Line only in source
-                ws.cell(row=row, column=4, value=content)
+            elif status == "Only in Source":  # Line only in source
+                ws.cell(row=row, column=4, value=source_content)
                 ws.cell(row=row, column=5, value="")
                 ws.cell(row=row, column=6, value="Only in Source")
                 
                 # Apply light red background
                 ws.cell(row=row, column=4).fill = source_only_fill
                 
-            elif prefix == '+ ':  # Line only in destination
+            elif status == "Only in Destination":  # Line only in destination
                 ws.cell(row=row, column=4, value="")
-                ws.cell(row=row, column=5, value=content)
+                ws.cell(row=row, column=5, value=dest_content)
                 ws.cell(row=row, column=6, value="Only in Destination")
                 
                 # Apply light green background
@@ -326,6 +475,12 @@ def create_comparison_excel(url_pairs_results, output_file="policy_comparisons.x
         
         # Update last_row for the next policy
         last_row = row + 1
+        
+        if manifest is not None:
+            manifest.record(result, diff_rows)
+        if store is not None:
+            store.record(result, diff_rows)
+        stage_timer.record('report_write', time.perf_counter() - policy_start, policy=policy_number)
     
     # Add a legend at the end
     row = last_row + 2  # Add some space
@@ -355,157 +510,739 @@ def create_comparison_excel(url_pairs_results, output_file="policy_comparisons.x
     ws.column_dimensions['F'].width = 20
     ws.column_dimensions['G'].width = 15
     
+    if run_stats:
+        write_run_stats_sheet(wb, run_stats)
+    
     # Save the workbook
-    wb.save(output_file)
+    with stage_timer.span('report_save'):
+        wb.save(output_file)
     print(f"Excel file updated: {output_file}")
 
 # NEW FUNCTION: Load URL pairs from XLSX file
-def load_url_pairs_from_xlsx(xlsx_path):
+def iter_url_pairs_from_xlsx(xlsx_path):
     """
-    Load URL pairs from an XLSX file
+    Yield URL pairs from an XLSX file as its rows are read
+    The workbook is opened read-only, so rows stream from the file instead
+    of the whole workbook being loaded with its styles first
     """
-    url_pairs = []
+    import openpyxl
+    
+    try:
+        wb = openpyxl.load_workbook(xlsx_path, read_only=True)
+    except Exception as e:
+        print(f"Error loading XLSX file: {str(e)}")
+        return
     
     try:
-        # Load the workbook
-        wb = openpyxl.load_workbook(xlsx_path)
         ws = wb.active
+        rows = ws.iter_rows(values_only=True)
         
         # Get the column indices (assuming first row contains headers)
-        headers = [cell.value for cell in ws[1]]
-        policy_col = headers.index("Policy Number") + 1 if "Policy Number" in headers else None
-        source_col = headers.index("Source URL") + 1 if "Source URL" in headers else None
-        dest_col = headers.index("Destination URL") + 1 if "Destination URL" in headers else None
+        headers = list(next(rows, ()))
+        source_col = headers.index("Source URL") if "Source URL" in headers else None
+        dest_col = headers.index("Destination URL") if "Destination URL" in headers else None
         
         # Check if required columns exist
-        if not all([source_col, dest_col]):
+        if source_col is None or dest_col is None:
             print("Error: XLSX file must contain 'Source URL' and 'Destination URL' columns")
-            return []
+            return
         
         # Read data from each row (skip header row)
-        for row_idx in range(2, ws.max_row + 1):
-            source_url = ws.cell(row=row_idx, column=source_col).value
-            dest_url = ws.cell(row=row_idx, column=dest_col).value
+        for values in rows:
+            # Read-only rows stop at their last non-empty cell
+            source_url = values[source_col] if source_col < len(values) else None
+            dest_url = values[dest_col] if dest_col < len(values) else None
             
             # Skip rows with missing URLs
             if not source_url or not dest_url:
                 continue
             
-            url_pairs.append({
+            yield {
                 'source_url': source_url.strip() if isinstance(source_url, str) else source_url,
                 'dest_url': dest_url.strip() if isinstance(dest_url, str) else dest_url
-            })
-        
-        print(f"Loaded {len(url_pairs)} URL pairs from XLSX file")
-        return url_pairs
-        
+            }
     except Exception as e:
         print(f"Error loading XLSX file: {str(e)}")
-        return []
+    finally:
+        wb.close()
 
-# The original load_url_pairs_from_config function is kept for backward compatibility
-def load_url_pairs_from_config(config_path):
+def load_url_pairs_from_xlsx(xlsx_path):
     """
-    Load URL pairs from a configuration file (JSON or text)
+    Load URL pairs from an XLSX file
+    """
+    url_pairs = list(iter_url_pairs_from_xlsx(xlsx_path))
+    print(f"Loaded {len(url_pairs)} URL pairs from XLSX file")
+    return url_pairs
+
+def iter_url_pairs_from_csv(csv_path):
+    """
+    Yield URL pairs from a CSV file, either with 'Source URL' and
+    'Destination URL' header columns or with source,destination rows
+    """
+    with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+        rows = csv.reader(f)
+        first = next(rows, None)
+        if first is None:
+            return
+        if "Source URL" in first and "Destination URL" in first:
+            source_col, dest_col = first.index("Source URL"), first.index("Destination URL")
+        else:
+            source_col, dest_col = 0, 1
+            rows = itertools.chain([first], rows)
+        for values in rows:
+            if len(values) <= max(source_col, dest_col):
+                continue
+            source_url, dest_url = values[source_col].strip(), values[dest_col].strip()
+            if source_url and dest_url:
+                yield {'source_url': source_url, 'dest_url': dest_url}
+
+def iter_url_pairs_from_jsonl(jsonl_path):
+    """
+    Yield URL pairs from a JSON lines file of {"source_url": ..., "dest_url": ...}
+    objects, one per line
+    """
+    with open(jsonl_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_url_pairs(config_path):
+    """
+    Yield the URL pairs of a configuration file as it is read: XLSX, CSV,
+    JSON lines (.jsonl), JSON or text with source,destination lines
+    A .json file is one document and is parsed whole; large inventories
+    should use one of the other formats
     """
     if config_path.endswith('.xlsx'):
-        return load_url_pairs_from_xlsx(config_path)
+        yield from iter_url_pairs_from_xlsx(config_path)
+    elif config_path.endswith('.csv'):
+        yield from iter_url_pairs_from_csv(config_path)
+    elif config_path.endswith('.jsonl'):
+        yield from iter_url_pairs_from_jsonl(config_path)
     elif config_path.endswith('.json'):
         with open(config_path, 'r') as f:
             config = json.load(f)
-            return config['url_pairs']
+        yield from config['url_pairs']
     else:
         # Assume it's a text file with source,destination format
-        url_pairs = []
         with open(config_path, 'r') as f:
             for line in f:
                 if line.strip() and ',' in line:
                     source, dest = line.strip().split(',', 1)
-                    url_pairs.append({
+                    yield {
                         'source_url': source.strip(),
                         'dest_url': dest.strip()
-                    })
-        return url_pairs
+                    }
+
+# The original load_url_pairs_from_config function is kept for backward compatibility
+def load_url_pairs_from_config(config_path):
+    """
+    Load URL pairs from a configuration file (JSON or text)
+    """
+    return list(iter_url_pairs(config_path))
 
-def compare_url_pairs(url_pairs, headless=True, max_pairs=None):
+def compare_url_pairs(url_pairs, headless=True, max_pairs=None, pool_size=1, max_pages_per_driver=50, workers=1,
+                      rate_limit=1.0, rate_burst=2, ready_timeout=20, http_first=True, cache_dir=None,
+                      run_stats=None, manifest=None, journal=None, extract_backend='fast', cpu_workers=0,
+                      browser_backend='selenium', tabs=16, resource_filter=None, similarity_metric='word_jaccard',
+                      diff_mode=None, connect_timeout=5, load_timeout=30, resilience=None):
     """
-    Compare multiple URL pairs and return the results
+    Compare multiple URL pairs and return the results in input order
+    Takes the same options as iter_url_pair_results, which streams the
+    results instead of holding all of them until the end; with a diff_mode
+    the results held hold LineDiffs instead of both texts
+    """
+    results = iter_url_pair_results(url_pairs, headless, max_pairs, pool_size, max_pages_per_driver, workers,
+                                    rate_limit, rate_burst, ready_timeout, http_first, cache_dir,
+                                    run_stats, manifest, journal=journal, extract_backend=extract_backend,
+                                    cpu_workers=cpu_workers, browser_backend=browser_backend, tabs=tabs,
+                                    resource_filter=resource_filter, similarity_metric=similarity_metric,
+                                    diff_mode=diff_mode, connect_timeout=connect_timeout, load_timeout=load_timeout,
+                                    resilience=resilience, indexed=True)
+    return [result for _, result in sorted(results, key=lambda item: item[0])]
+
+def iter_url_pair_results(url_pairs, headless=True, max_pairs=None, pool_size=1, max_pages_per_driver=50, workers=1,
+                          rate_limit=1.0, rate_burst=2, ready_timeout=20, http_first=True, cache_dir=None,
+                          run_stats=None, manifest=None, diff_mode=None, journal=None, extract_backend='fast',
+                          cpu_workers=0, browser_backend='selenium', tabs=16, resource_filter=None,
+                          similarity_metric='word_jaccard', connect_timeout=5, load_timeout=30, resilience=None,
+                          indexed=False):
+    """
+    Compare multiple URL pairs, yielding each result as soon as it is ready
     Added max_pairs parameter to limit the number of pairs processed
+    Browsers come from a DriverPool of pool_size warm drivers that lives for
+    the whole run; each driver is recycled after max_pages_per_driver pages
+    Pairs are fetched by `workers` threads, each with its own browser, and
+    compared on a separate thread, so results arrive in completion order;
+    with indexed=True (index, result) tuples are yielded instead
+    Identical pairs are compared once and repeated URLs fetched once, see
+    FetchPlan; every input pair still gets a result of its own
+    url_pairs may also be a lazy iterator, such as iter_url_pairs over a
+    large workbook: pairs are then fetched as they are read, and only pairs
+    and pages in flight at the same time are shared (StreamingFetchPlan)
+    Requests are throttled per host to rate_limit requests per second
+    With http_first, pages are tried over plain HTTP before using a browser
+    With a cache_dir, fetched pages are cached on disk and revalidated on
+    later runs
+    If a run_stats dict is given it is filled with the run's counters once
+    the results are exhausted or the iterator is closed
+    With a manifest, unchanged pairs carry their previous result forward
+    With a diff_mode, the report rows are computed on the compare thread
+    and stored as a LineDiff in each result's 'diff_rows', in place of its
+    'source_text' and 'dest_text'
+    With a journal, every pair's fetched, compared or failed state is
+    recorded as it happens
+    extract_backend selects the HTML extraction backend, 'fast' (lxml) or
+    'bs4' (BeautifulSoup html.parser)
+    With cpu_workers > 0, extraction, similarity and diffing run on that
+    many processes and as many pairs are compared at once; with 0 they run
+    in the fetch and compare threads
+    With browser_backend 'cdp', pages that need a browser open as tabs of
+    one Chromium driven over the DevTools protocol, up to `tabs` at once,
+    instead of a Selenium driver per worker; workers is raised to at least
+    `tabs`, since each fetch thread loads one page at a time
+    With a ResourceFilter, browsers skip the filter's resources and every
+    browser page load reports its load time and bytes transferred
+    similarity_metric selects the similarity.SIMILARITY_METRICS score
+    reported for each pair
+    HTTP requests give up after connect_timeout seconds without a
+    connection and both tiers after load_timeout seconds of loading a page;
+    transient failures are retried and failing hosts cut off by the
+    FetchResilience, a default one if not given. A page that still fails
+    leaves a FetchError in place of its text.
     """
-    results = []
-    
+    streaming = not hasattr(url_pairs, '__len__')
     # Limit the number of pairs if specified
     if max_pairs is not None and max_pairs > 0:
-        url_pairs = url_pairs[:max_pairs]
+        url_pairs = itertools.islice(url_pairs, max_pairs) if streaming else url_pairs[:max_pairs]
     
-    for idx, pair in enumerate(url_pairs):
-        source_url = pair['source_url']
-        dest_url = pair['dest_url']
-        policy_number = extract_policy_number(source_url)
-        
-        print(f"\nProcessing Policy #{policy_number} ({idx+1}/{len(url_pairs)})")
-        print("=" * 80)
-        
-        # Fetch source content
-        print("Fetching source URL...")
-        source_text = get_text_from_source_url(source_url, headless)
-        
-        # Add a delay to avoid being rate-limited
-        time.sleep(3)
-        
-        # Fetch destination content
-        print("Fetching destination URL...")
-        dest_text = get_text_from_destination_url(dest_url, headless)
-        
-        # Save the extracted text to files (optional)
-        os.makedirs('output', exist_ok=True)
-        with open(f"output/source_{policy_number}.txt", "w", encoding="utf-8") as f:
-            f.write(source_text)
+    workers = max(1, workers)
+    if browser_backend == 'cdp' and workers < tabs:
+        # Each fetch thread loads one page at a time, so fewer threads than tabs would leave tabs idle
+        print(f"Raising the fetch workers from {workers} to {tabs} to keep the cdp backend's {tabs} tabs busy")
+        workers = tabs
+    if streaming:
+        shared = SharedFetches()
+        plan = StreamingFetchPlan(url_pairs, shared)
+        total = None
+    else:
+        plan = FetchPlan(url_pairs)
+        plan.print_stats()
+        shared = SharedFetches(plan.uses)
+        total = len(url_pairs)
+    
+    # Every worker needs a browser of its own, unless they share tabs of one
+    driver_pool_size = pool_size if browser_backend == 'cdp' else max(pool_size, workers)
+    driver_pool = DriverPool(size=driver_pool_size, headless=headless,
+                             max_pages_per_driver=max_pages_per_driver, resource_filter=resource_filter,
+                             page_load_timeout=load_timeout)
+    async_browser = (AsyncBrowser(max_tabs=tabs, headless=headless, navigation_timeout=load_timeout,
+                                  resource_filter=resource_filter)
+                     if browser_backend == 'cdp' else None)
+    rate_limiter = HostRateLimiter(rate=rate_limit, burst=rate_burst)
+    resilience = resilience or FetchResilience()
+    http_fetcher = (HttpFetcher(pool_size=max(10, 2 * workers), timeout=load_timeout, connect_timeout=connect_timeout)
+                    if http_first else None)
+    cache = FetchCache(cache_dir) if cache_dir else None
+    cpu_pool = CpuPool(cpu_workers) if cpu_workers else None
+    fetch_options = {
+        'headless': headless,
+        'driver_pool': driver_pool,
+        'ready_timeout': ready_timeout,
+        'http_fetcher': http_fetcher,
+        'cache': cache,
+        'extract_backend': extract_backend,
+        'cpu_pool': cpu_pool,
+        'async_browser': async_browser,
+        'resilience': resilience,
+    }
+    
+    def fetch(idx, pair):
+        fetch_start = time.time()
+        policy_number = extract_policy_number(pair['source_url'])
+        with stage_timer.tagged(policy=policy_number), stage_timer.span('pair_fetch'):
+            fetched = fetch_url_pair(pair, idx, None if streaming else len(plan.comparisons), fetch_options,
+                                     rate_limiter, shared)
+        if journal is not None:
+            seconds = round(time.time() - fetch_start, 2)
+            errors = [text for text in (fetched['source_text'], fetched['dest_text']) if isinstance(text, FetchError)]
+            if errors:
+                journal.record(pair, 'failed', seconds=seconds, **errors[0].details())
+            else:
+                journal.record(pair, 'fetched', seconds=seconds)
+        fetched['pair'] = pair
+        return fetched
+    
+    def compare(idx, fetched):
+        compare_start = time.time()
+        with stage_timer.tagged(policy=fetched['policy_number']), stage_timer.span('pair_compare'):
+            result = score_url_pair(fetched, manifest, cpu_pool, diff_mode, similarity_metric)
+            if diff_mode and result.get('diff_rows') is None:
+                with stage_timer.span('diff'):
+                    result['diff_rows'] = LineDiff.from_texts(result['source_text'], result['dest_text'], diff_mode)
+        compact_result(result)
+        result['pair'] = fetched['pair']
+        if journal is not None and not result['error']:
+            journal.record(fetched['pair'], 'compared', seconds=round(time.time() - compare_start, 2),
+                           similarity=round(result['similarity'], 4))
+        return result
+    
+    pipeline = Pipeline(fetch, compare, fetch_workers=workers, compare_workers=max(1, cpu_workers))
+    if workers > 1:
+        print(f"Comparing {total or 'streamed'} URL pairs with {workers} workers")
+    start = time.time()
+    completed = 0
+    stages = pipeline.run(plan.comparisons)
+    try:
+        for idx, result in stages:
+            # Report the comparison once for every input row it stands for
+            for row_idx, pair in plan.take_rows(idx):
+                if pair is not result['pair']:
+                    result = dict(result, pair=pair, source_url=pair['source_url'], dest_url=pair['dest_url'],
+                                  policy_number=extract_policy_number(pair['source_url']))
+                completed += 1
+                yield (row_idx, result) if indexed else result
+    finally:
+        # Stop the stage threads before closing what they use
+        stages.close()
+        driver_pool.close()
+        if streaming:
+            plan.print_stats()
+        driver_pool.print_stats()
+        if async_browser:
+            async_browser.close()
+            async_browser.print_stats()
+        if resource_filter:
+            resource_filter.print_stats()
+        if cpu_pool:
+            cpu_pool.close()
+            cpu_pool.print_stats()
+        rate_limiter.print_stats()
+        resilience.print_stats()
+        pipeline.print_stats()
+        if http_fetcher:
+            http_fetcher.print_stats()
+        if cache:
+            cache.prune()
+            cache.print_stats()
+        if manifest is not None:
+            manifest.print_stats()
+        if journal is not None:
+            journal.print_stats()
         
-        with open(f"output/dest_{policy_number}.txt", "w", encoding="utf-8") as f:
-            f.write(dest_text)
+        elapsed = time.time() - start
+        if completed:
+            print(f"Compared {completed} of {total or plan.stats['input_pairs']} URL pairs in {elapsed:.1f}s with {workers} worker(s) "
+                  f"({elapsed / completed:.1f}s per pair, {completed * 60 / elapsed if elapsed else 0:.1f} pairs/min)")
         
-        # Calculate similarity if we have valid content
-        if not source_text.startswith("Error") and not dest_text.startswith("Error"):
-            # Simple word-based comparison
-            source_words = set(source_text.lower().split())
-            dest_words = set(dest_text.lower().split())
-            
-            common_words = source_words.intersection(dest_words)
-            
-            print(f"Source URL has approximately {len(source_words)} unique words")
-            print(f"Destination URL has approximately {len(dest_words)} unique words")
-            print(f"They share approximately {len(common_words)} unique words in common")
-            
-            # Calculate similarity
-            similarity = len(common_words) / (len(source_words.union(dest_words)))
-            print(f"Simple similarity score: {similarity:.2f}")
-            
-            results.append({
+        if run_stats is not None:
+            run_stats['pairs'] = completed
+            run_stats['workers'] = workers
+            run_stats['elapsed_seconds'] = round(elapsed, 2)
+            for name, value in driver_pool.stats.items():
+                run_stats[f'driver_pool_{name}'] = value
+            if async_browser:
+                for name, value in async_browser.stats.items():
+                    run_stats[f'async_browser_{name}'] = value
+            if resource_filter:
+                for name, value in resource_filter.stats.items():
+                    run_stats[f'resource_filter_{name}'] = value
+            for name, value in rate_limiter.stats.items():
+                run_stats[f'rate_limiter_{name}'] = value
+            for name, value in resilience.stats.items():
+                run_stats[f'resilience_{name}'] = value
+            for name, value in pipeline.stats.items():
+                run_stats[f'pipeline_{name}'] = value
+            for name, value in plan.stats.items():
+                run_stats[f'plan_{name}'] = value
+            run_stats['plan_pages_shared'] = shared.stats['shared']
+            if http_fetcher:
+                for tier, pages in http_fetcher.tier_totals().items():
+                    run_stats[f'{tier}_tier_pages'] = pages
+            if cache:
+                for name, value in cache.stats.items():
+                    run_stats[f'cache_{name}'] = value
+            if manifest is not None:
+                for name, value in manifest.stats.items():
+                    run_stats[f'incremental_{name}'] = value
+
+def fetch_url_pair(pair, idx, total, fetch_options=None, rate_limiter=None, shared=None):
+    """
+    Fetch the text of both pages of a URL pair
+    With SharedFetches, a page already fetched for another pair is reused
+    Returns a dict with the policy number, both URLs and both texts, or a
+    FetchError in place of a text that could not be fetched
+    """
+    fetch_options = fetch_options or {}
+    source_url = pair['source_url']
+    dest_url = pair['dest_url']
+    policy_number = extract_policy_number(source_url)
+    
+    print(f"\nProcessing Policy #{policy_number} ({idx+1}/{total or '?'})")
+    print("=" * 80)
+    
+    def load_source():
+        return get_text_from_source_url(source_url, rate_limiter=rate_limiter, **fetch_options)
+    
+    def load_destination():
+        # Throttled only if its host needs it
+        return get_text_from_destination_url(dest_url, rate_limiter=rate_limiter, **fetch_options)
+    
+    # Fetch source content
+    print("Fetching source URL...")
+    source_text = shared.fetch('source', source_url, load_source) if shared else load_source()
+    
+    # Fetch destination content
+    print("Fetching destination URL...")
+    dest_text = shared.fetch('destination', dest_url, load_destination) if shared else load_destination()
+    
+    # Save the extracted text to files (optional)
+    os.makedirs('output', exist_ok=True)
+    name = saved_name(policy_number, source_url, dest_url)
+    with open(f"output/source_{name}.txt", "w", encoding="utf-8") as f:
+        f.write(str(source_text))
+    
+    with open(f"output/dest_{name}.txt", "w", encoding="utf-8") as f:
+        f.write(str(dest_text))
+    
+    return {
+        'policy_number': policy_number,
+        'source_url': source_url,
+        'dest_url': dest_url,
+        'source_text': source_text,
+        'dest_text': dest_text,
+    }
+
+def score_url_pair(fetched, manifest=None, cpu_pool=None, diff_mode=None, similarity_metric='word_jaccard'):
+    """
+    Compute the similarity of a fetched URL pair and return its result
+    With a manifest, a pair whose content is unchanged since the previous
+    run gets the previous similarity and report rows instead of a new diff
+    With a diff_mode the report rows are computed too, as a LineDiff in
+    'diff_rows'
+    With a cpu_pool the similarity and diff run on a worker process
+    similarity_metric is one of similarity.SIMILARITY_METRICS
+    """
+    policy_number = fetched['policy_number']
+    source_url = fetched['source_url']
+    dest_url = fetched['dest_url']
+    source_text = fetched['source_text']
+    dest_text = fetched['dest_text']
+    
+    # Carry the previous result forward if nothing changed
+    fetch_failed = isinstance(source_text, FetchError) or isinstance(dest_text, FetchError)
+    if manifest is not None and not fetch_failed:
+        previous = manifest.lookup(policy_number, source_url, dest_url, source_text, dest_text)
+        if previous:
+            print(f"Content unchanged since the last run, reusing similarity score {previous['similarity']:.2f}")
+            return {
                 'policy_number': policy_number,
                 'source_url': source_url,
                 'dest_url': dest_url,
                 'source_text': source_text,
                 'dest_text': dest_text,
-                'similarity': similarity
-            })
+                'similarity': previous['similarity'],
+                'diff_rows': previous['diff'],
+                'error': False
+            }
+    
+    # Calculate similarity if we have valid content
+    if not fetch_failed:
+        if cpu_pool:
+            similarity, diff_rows = cpu_pool.run(compare_texts, source_text, dest_text, diff_mode, similarity_metric)
         else:
-            if source_text.startswith("Error"):
-                print(f"Couldn't process source URL: {source_text}")
-            if dest_text.startswith("Error"):
-                print(f"Couldn't process destination URL: {dest_text}")
-            
-            # Still add to results for tracking
-            results.append({
-                'policy_number': policy_number,
-                'source_url': source_url,
-                'dest_url': dest_url,
-                'source_text': "Error fetching source URL" if source_text.startswith("Error") else source_text,
-                'dest_text': "Error fetching destination URL" if dest_text.startswith("Error") else dest_text,
-                'similarity': 0.0
-            })
+            similarity, diff_rows = compare_texts(source_text, dest_text, diff_mode, similarity_metric)
+        
+        result = {
+            'policy_number': policy_number,
+            'source_url': source_url,
+            'dest_url': dest_url,
+            'source_text': source_text,
+            'dest_text': dest_text,
+            'similarity': similarity,
+            'error': False
+        }
+        if diff_rows is not None:
+            result['diff_rows'] = diff_rows
+        return result
+    else:
+        if isinstance(source_text, FetchError):
+            print(f"Couldn't process source URL: {source_text}")
+        if isinstance(dest_text, FetchError):
+            print(f"Couldn't process destination URL: {dest_text}")
+        
+        # Still add to results for tracking
+        return {
+            'policy_number': policy_number,
+            'source_url': source_url,
+            'dest_url': dest_url,
+            'source_text': "Error fetching source URL" if isinstance(source_text, FetchError) else source_text,
+            'dest_text': "Error fetching destination URL" if isinstance(dest_text, FetchError) else dest_text,
+            'similarity': 0.0,
+            'error': True
+        }
+
+def run_queue_worker(work_queue, worker, headless=True, diff_mode='fast', compare_options=None, poll_interval=2.0):
+    """
+    Claim pairs from a WorkQueue until it is drained, compare them with
+    iter_url_pair_results and push every result back
+    While pairs are in flight their leases are renewed every third of the
+    lease time; when only other workers' pairs are left to claim, the
+    worker waits in case one of their leases runs out
+    compare_options are passed to iter_url_pair_results; its run_stats are
+    stored in the queue for the coordinator
+    """
+    compare_options = dict(compare_options or {})
+    run_stats = compare_options.setdefault('run_stats', {})
+    work_queue.register(worker)
+    held = set()
+    held_lock = threading.Lock()
+    stop = threading.Event()
+    
+    def claimed_pairs():
+        while not stop.is_set():
+            claimed = work_queue.claim(worker)
+            if not claimed:
+                # Pairs this worker holds are finished by its own pipeline, which waits for this input to end
+                if not work_queue.unfinished(other_than=worker):
+                    return
+                time.sleep(poll_interval)
+                continue
+            for pair_id, pair in claimed:
+                with held_lock:
+                    held.add(pair_id)
+                yield dict(pair, queue_id=pair_id)
+    
+    def heartbeat():
+        while not stop.wait(work_queue.lease_seconds / 3):
+            with held_lock:
+                pair_ids = list(held)
+            work_queue.heartbeat(worker, pair_ids)
+    
+    heartbeat_thread = threading.Thread(target=heartbeat, name="queue-heartbeat", daemon=True)
+    heartbeat_thread.start()
+    print(f"Worker {worker} pulling URL pairs from {work_queue.path}")
+    results = iter_url_pair_results(claimed_pairs(), headless, diff_mode=diff_mode, **compare_options)
+    pushed = 0
+    try:
+        for result in results:
+            pair_id = result['pair']['queue_id']
+            work_queue.complete(worker, pair_id, policy_result_record(result, diff_rows_for_result(result, diff_mode)))
+            with held_lock:
+                held.discard(pair_id)
+            pushed += 1
+    finally:
+        stop.set()
+        results.close()
+        heartbeat_thread.join()
+        work_queue.finish_worker(worker, run_stats)
+        print(f"Worker {worker} pushed {pushed} results")
+
+def queue_results(work_queue):
+    """
+    The results stored in a WorkQueue in input order; a pair that failed
+    or never finished gets an error result
+    """
+    for pair, state, record, error in work_queue.results():
+        if record is not None:
+            yield policy_result_from_record(record, pair)
+            continue
+        yield {
+            'policy_number': extract_policy_number(pair['source_url']),
+            'source_url': pair['source_url'],
+            'dest_url': pair['dest_url'],
+            'source_text': f"Error processing URL pair: {error or state}",
+            'dest_text': "",
+            'similarity': 0.0,
+            'error': True,
+            'pair': pair,
+        }
+
+def run_queue_coordinator(work_queue, output_file, run_stats=None, manifest=None, diff_mode='fast',
+                          report_mode='streaming', local_workers=(), poll_interval=10.0, store=None,
+                          keep_archives=None):
+    """
+    Wait until the workers have drained the WorkQueue, then merge every
+    result into a single report with create_comparison_excel
+    local_workers are worker subprocesses started by this coordinator; if
+    they all exit with pairs left, the report is written without them
+    The workers' run stats are summed into run_stats
+    """
+    start = time.time()
+    while work_queue.unfinished():
+        if local_workers and all(process.poll() is not None for process in local_workers):
+            print("⚠️ Every local worker exited with URL pairs left; writing the report without them")
+            break
+        work_queue.print_progress()
+        time.sleep(poll_interval)
+    work_queue.print_progress()
+    
+    if run_stats is not None:
+        workers = [worker['run_stats'] for worker in work_queue.workers().values() if worker['run_stats']]
+        for stats in workers:
+            for name, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and name != 'elapsed_seconds':
+                    run_stats[name] = run_stats.get(name, 0) + value
+        run_stats['queue_runners'] = len(workers)
+        for state, count in work_queue.counts().items():
+            run_stats[f'queue_{state}'] = count
+        run_stats['elapsed_seconds'] = round(time.time() - start, 2)
     
-    return results
+    create_comparison_excel(queue_results(work_queue), output_file, run_stats, manifest, diff_mode, report_mode, store,
+                            keep_archives)
+
+def spawn_local_workers(work_queue_path, count, argv):
+    """
+    Start `count` worker processes of this script on the work queue, each
+    logging to <queue>_<worker>.log; argv are the coordinator's options,
+    passed on without the coordinator-only ones
+    """
+    skip = {'--queue-role', '--worker-name', '--spawn-workers'}
+    worker_argv = []
+    args = iter(argv)
+    for arg in args:
+        if arg in skip:
+            next(args, None)
+        elif arg.split('=', 1)[0] not in skip:
+            worker_argv.append(arg)
+    
+    processes = []
+    for n in range(1, count + 1):
+        worker = f"{socket.gethostname()}-local-{n}"
+        log_path = f"{os.path.splitext(work_queue_path)[0]}_{worker}.log"
+        with open(log_path, 'w', encoding='utf-8') as log:
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__)] + worker_argv
+                + ['--queue-role', 'worker', '--worker-name', worker],
+                stdout=log, stderr=subprocess.STDOUT))
+        print(f"Started worker {worker}, logging to {log_path}")
+    return processes
+
+def compare_saved_texts(source_text, dest_text, diff_mode='fast', metric='word_jaccard', extract_backend=None):
+    """
+    compare_texts for a pair fetched by an earlier run; with an
+    extract_backend the two are cached HTML and their text is extracted
+    first
+    """
+    if extract_backend:
+        source_text, _ = extract_source_text(source_text, backend=extract_backend)
+        dest_text, _ = extract_destination_text(dest_text, backend=extract_backend)
+    return compare_texts(source_text, dest_text, diff_mode, metric)
+
+def iter_offline_results(url_pairs=None, output_dir=None, cache_dir=None, diff_mode='fast',
+                         similarity_metric='word_jaccard', extract_backend='fast', cpu_workers=0, max_pairs=None,
+                         run_stats=None):
+    """
+    Compare again the pairs an earlier run fetched, without a browser or
+    the network, yielding results in input order
+    With an output_dir the texts saved there are compared; with a cache_dir
+    each pair's cached HTML is extracted again with extract_backend first
+    url_pairs, such as iter_url_pairs over the config, pick the pairs and
+    give their URLs; without them every policy saved in output_dir is
+    compared. Pairs with nothing saved are skipped; at most max_pairs are
+    compared.
+    If a run_stats dict is given it is filled with the run's counters once
+    the results are exhausted or the iterator is closed
+    """
+    stats = {'pairs': 0, 'skipped': 0}
+    cache = FetchCache(cache_dir) if cache_dir else None
+    
+    def saved_pairs():
+        if url_pairs is None:
+            for _, policy_number, source_text, dest_text in iter_saved_texts(output_dir):
+                yield {'policy_number': policy_number, 'source_url': '', 'dest_url': ''}, source_text, dest_text
+            return
+        for pair in url_pairs:
+            if cache is not None:
+                texts = (cache.get_html('source', pair['source_url']), cache.get_html('destination', pair['dest_url']))
+                texts = None if None in texts else texts
+            else:
+                texts = read_saved_texts(output_dir, saved_name(extract_policy_number(pair['source_url']),
+                                                                pair['source_url'], pair['dest_url']))
+            if texts is None:
+                stats['skipped'] += 1
+                continue
+            yield (pair,) + tuple(texts)
+    
+    # Pairs whose comparison is on the CPU pool, oldest first
+    in_flight = deque()
+    
+    def calls():
+        pairs = saved_pairs()
+        if max_pairs:
+            pairs = itertools.islice(pairs, max_pairs)
+        for pair, source, dest in pairs:
+            in_flight.append(pair)
+            yield source, dest, diff_mode, similarity_metric, extract_backend if cache is not None else None
+    
+    start = time.time()
+    cpu_pool = CpuPool(cpu_workers)
+    try:
+        for similarity, diff_rows in cpu_pool.imap(compare_saved_texts, calls()):
+            pair = in_flight.popleft()
+            stats['pairs'] += 1
+            yield {
+                'policy_number': pair.get('policy_number') or extract_policy_number(pair['source_url']),
+                'source_url': pair['source_url'],
+                'dest_url': pair['dest_url'],
+                'similarity': similarity,
+                'error': False,
+                'diff_rows': diff_rows,
+                'pair': pair,
+            }
+    finally:
+        cpu_pool.close()
+        elapsed = time.time() - start
+        print(f"Compared {stats['pairs']} saved pairs offline in {elapsed:.2f}s, "
+              f"skipped {stats['skipped']} with nothing saved")
+        cpu_pool.print_stats()
+        if run_stats is not None:
+            run_stats['elapsed_seconds'] = round(elapsed, 2)
+            for name, value in stats.items():
+                run_stats[f'offline_{name}'] = value
+            for name, value in cpu_pool.stats.items():
+                run_stats[f'cpu_pool_{name}'] = value
+
+def report_timings(timings_path, summary_path, baseline=None):
+    """
+    Summarize the run's timing spans, save the summary and point out the
+    stages whose p95 regressed against the baseline summary
+    """
+    stage_timer.stop()
+    summary = stage_timer.summarize(timings_path)
+    if not summary:
+        return
+    stage_timer.print_summary(summary)
+    stage_timer.save_summary(summary, summary_path)
+    for stage, before, after in stage_timer.regressions(summary, baseline):
+        print(f"⚠️ {stage} p95 regressed from {before:.3f}s to {after:.3f}s")
+
+def run_offline_report(args, shard=None):
+    """
+    Rerun only the similarity and report stages on what an earlier run
+    fetched, for --from-output and --from-cache
+    The pairs come from the config when it exists; --from-output without one
+    reports every saved policy. Offline runs are not recorded in the results
+    store, since nothing new was observed on the sites.
+    """
+    url_pairs = None
+    if os.path.exists(args.config):
+        rows = ({**pair, 'row': pair.get('row', row)} for row, pair in enumerate(iter_url_pairs(args.config)))
+        url_pairs = select_shard(rows, shard) if shard else rows
+    elif args.from_cache:
+        print(f"Configuration file {args.config} not found; --from-cache needs it to know which pages to use")
+        return
+    else:
+        print(f"Configuration file {args.config} not found, reporting every policy saved in {args.from_output}")
+    source = f"pages cached in {args.cache_dir}" if args.from_cache else f"texts saved in {args.from_output}"
+    print(f"Comparing the {source} offline")
+    run_stats = {}
+    results = iter_offline_results(url_pairs, args.from_output, args.cache_dir if args.from_cache else None,
+                                   args.diff_mode, args.similarity_metric, args.extract_backend, args.cpu_workers,
+                                   args.max if args.max > 0 else None, run_stats)
+    create_comparison_excel(results, args.output, run_stats, diff_mode=args.diff_mode, report_mode=args.report_mode,
+                            keep_archives=args.keep_archives)
+    print(f"\nComparison complete. Results saved to {args.output}")
 
 def main():
     parser = argparse.ArgumentParser(description='Compare text content from multiple website pairs')
@@ -517,13 +1254,139 @@ def main():
                         help='Configuration file with URL pairs (XLSX, JSON, or CSV)')
     parser.add_argument('--max', type=int, default=0,
                         help='Maximum number of URL pairs to process (0 = all)')
+    parser.add_argument('--plan-limit', type=int, default=20000,
+                        help='Inputs of up to this many URL pairs are read whole before fetching, so every '
+                             'repeated page and pair is fetched once; larger inputs are streamed into the fetchers '
+                             'as they are read and only share pages between pairs in flight (0 = always stream)')
+    parser.add_argument('--rate-limit', type=float, default=1.0,
+                        help='Maximum requests per second to any single host (0 = unlimited)')
+    parser.add_argument('--rate-burst', type=int, default=2,
+                        help='Requests allowed back to back before a host is throttled')
+    parser.add_argument('--ready-timeout', type=float, default=20,
+                        help='Seconds to wait for page content to render before parsing anyway')
+    parser.add_argument('--connect-timeout', type=float, default=5,
+                        help='Seconds to wait for an HTTP connection before the attempt fails')
+    parser.add_argument('--load-timeout', type=float, default=30,
+                        help='Seconds to wait for a page to load, over HTTP or in the browser, before the attempt fails')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='Retries of a page after a timeout, connection error or 429/5xx answer')
+    parser.add_argument('--retry-backoff', type=float, default=1.0,
+                        help='Seconds before the first retry, doubled for each further retry, with jitter')
+    parser.add_argument('--breaker-threshold', type=int, default=5,
+                        help='Consecutive failed attempts on a host before its fetches fail fast')
+    parser.add_argument('--breaker-cooldown', type=float, default=60,
+                        help='Seconds a failing host is skipped before a trial fetch is let through')
+    offline = parser.add_mutually_exclusive_group()
+    offline.add_argument('--from-output', default=None,
+                         help='Rebuild the report from the texts an earlier run saved in this directory (e.g. output), '
+                              'without a browser or the network')
+    offline.add_argument('--from-cache', action='store_true',
+                         help='Rebuild the report by extracting the pages in --cache-dir again, '
+                              'without a browser or the network')
+    parser.add_argument('--no-http-first', action='store_true',
+                        help='Always render pages in the browser instead of trying plain HTTP first')
+    parser.add_argument('--cache-dir', default='.fetch_cache',
+                        help='Directory for the persistent page cache')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Fetch every page from scratch without using the page cache')
+    parser.add_argument('--diff-mode', choices=DIFF_MODES, default='fast',
+                        help="Line diff backend: 'fast' patience diff or 'precise' difflib.Differ")
+    parser.add_argument('--similarity-metric', choices=SIMILARITY_METRICS, default='word_jaccard',
+                        help="Similarity score in the report: 'word_jaccard' shared unique words, 'shingle_jaccard' "
+                             "shared 3-word shingles, 'tfidf_cosine' TF-IDF cosine or 'line_ratio' shared lines. "
+                             "Pairs are scored one at a time, so tfidf_cosine takes its IDF over the pair's two "
+                             "texts only; similarity.py scores saved texts with the IDF of the whole run")
+    parser.add_argument('--extract-backend', choices=EXTRACT_BACKENDS, default='fast',
+                        help="HTML extraction backend: 'fast' lxml or 'bs4' BeautifulSoup html.parser")
+    parser.add_argument('--report-mode', choices=['streaming', 'append'], default='streaming',
+                        help="'streaming' writes a fresh report and archives the previous one; "
+                             "'append' loads the existing report and appends to it")
+    parser.add_argument('--keep-archives', type=int, default=None,
+                        help="Previous reports kept as <output>_<timestamp>.xlsx by the streaming report mode "
+                             "(default: 5; 0 replaces the report without archiving it)")
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only recompare policies whose content changed since the previous run')
+    parser.add_argument('--manifest', default=None,
+                        help='Manifest of the previous run for --incremental (default: next to --output)')
+    parser.add_argument('--results-store', default=None,
+                        help='SQLite store keeping every run\'s per-policy results for queries and trends '
+                             '(default: next to --output)')
+    parser.add_argument('--no-results-store', action='store_true',
+                        help='Do not record this run in the results store')
+    parser.add_argument('--journal', default=None,
+                        help='Run journal recording each pair\'s progress (default: next to --output)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip pairs the journal records as already written by an interrupted run')
+    parser.add_argument('--shard', default=None,
+                        help='Only process shard i of n of the input rows, as i/n (e.g. 2/4)')
+    parser.add_argument('--queue', default=None,
+                        help='SQLite work queue shared by a coordinator and its workers, on a filesystem '
+                             'every runner can reach')
+    parser.add_argument('--queue-role', choices=['coordinator', 'worker'], default='coordinator',
+                        help="'coordinator' loads the queue and writes the report once it is drained; "
+                             "'worker' compares pairs claimed from the queue")
+    parser.add_argument('--worker-name', default=None,
+                        help='Name of this worker in the queue (default: hostname and process id)')
+    parser.add_argument('--lease', type=float, default=300,
+                        help='Seconds a worker holds a claimed pair without heartbeating before it is handed out again')
+    parser.add_argument('--spawn-workers', type=int, default=0,
+                        help='Worker processes the coordinator starts on this machine')
+    parser.add_argument('--timings', default=None,
+                        help='JSON lines file of per-stage timing spans (default: next to --output); '
+                             'a p50/p95/max summary is written next to it')
+    parser.add_argument('--timings-baseline', default=None,
+                        help='Timing summary to compare stage p95s against '
+                             '(default: the summary left by the previous run)')
+    parser.add_argument('--profile', default=None,
+                        help='Profile the run with cProfile, threads included, and save the stats to this file')
+    parser.add_argument('--cpu-workers', type=int, default=0,
+                        help='Processes for HTML extraction, similarity and diffing (default: 0, in the main '
+                             'process); check with benchmark.py cpu that more processes help on your machine')
+    parser.add_argument('--browser-backend', choices=['selenium', 'cdp'], default='selenium',
+                        help="'selenium' drives a Chrome per worker; 'cdp' opens tabs of one Chromium "
+                             "over the DevTools protocol (needs Playwright)")
+    parser.add_argument('--tabs', type=int, default=16,
+                        help='Pages loaded at once by the cdp backend; --workers is raised to at least this many, '
+                             'since each fetch worker loads one page at a time')
+    parser.add_argument('--resource-profile', default=None,
+                        help='JSON resource-filtering profile: resource types, extensions and domains to block '
+                             'and per-host allowlists (default: built-in profile)')
+    parser.add_argument('--no-resource-blocking', action='store_true',
+                        help='Let browsers load every resource; load time and bytes are still reported')
+    parser.add_argument('--pool-size', type=int, default=1,
+                        help='Number of warm Chrome drivers kept open for the run')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of URL pairs compared concurrently, each with its own browser '
+                             '(with --browser-backend cdp, at least --tabs)')
+    parser.add_argument('--recycle-after', type=int, default=50,
+                        help='Restart a pooled Chrome driver after this many pages (0 = never)')
     args = parser.parse_args()
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.queue and (args.resume or shard):
+        parser.error("--queue cannot be combined with --resume or --shard; rerun the coordinator to continue a queue")
+    worker = None
+    if args.queue and args.queue_role == 'worker':
+        worker = args.worker_name or f"{socket.gethostname()}-{os.getpid()}"
+    
+    if args.from_output or args.from_cache:
+        if args.queue or args.resume or args.incremental:
+            parser.error("--from-output and --from-cache cannot be combined with --queue, --resume or --incremental")
+        run_offline_report(args, shard)
+        return
     
     # Check if config file exists, if not create a sample XLSX
-    if not os.path.exists(args.config):
+    if worker is None and not os.path.exists(args.config):
         print(f"Configuration file {args.config} not found. Creating a sample file...")
         
         # Create a sample XLSX file
+        import openpyxl
+        from openpyxl.styles import Font
+        
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "URL Pairs"
@@ -556,19 +1419,166 @@ def main():
         print(f"Created sample configuration file {args.config}. Please edit it with your URL pairs and run again.")
         return
     
-    # Load URL pairs from config
-    url_pairs = load_url_pairs_from_config(args.config)
-    print(f"Loaded {len(url_pairs)} URL pairs from {args.config}")
+    # The work queue records every pair's progress in place of the journal
+    journal = None
+    if not args.queue:
+        journal_path = args.journal or os.path.splitext(args.output)[0] + '_journal.jsonl'
+        journal = RunJournal(journal_path, resume=args.resume)
+    
+    timings_path = args.timings or os.path.splitext(args.output)[0] + '_timings.jsonl'
+    if worker:
+        # Workers on one machine must not replace each other's spans
+        timings_path = f"{os.path.splitext(timings_path)[0]}_{worker}.jsonl"
+    timings_summary_path = os.path.splitext(timings_path)[0] + '_summary.json'
+    timings_baseline = stage_timer.load_summary(args.timings_baseline or timings_summary_path)
+    stage_timer.start(timings_path)
+    
+    # Pairs an interrupted run already wrote are reloaded from output/
+    # instead of being fetched again
+    resumed = deque()
+    input_stats = {'read': 0, 'resumed': 0, 'remaining': 0}
+    
+    def input_pairs():
+        """
+        Stream the URL pairs from the config into the fetch stage as they
+        are read, so the first fetch starts with the first row
+        """
+        # Remember each pair's input row for the journal and sharding
+        rows = ({**pair, 'row': pair.get('row', row)} for row, pair in enumerate(iter_url_pairs(args.config)))
+        for pair in (select_shard(rows, shard) if shard else rows):
+            input_stats['read'] += 1
+            if args.resume and journal.is_done(pair):
+                saved = args.report_mode == 'append' or load_policy_result(pair)
+                if saved:
+                    if saved is not True:
+                        resumed.append(saved)
+                    input_stats['resumed'] += 1
+                    continue
+            input_stats['remaining'] += 1
+            if journal is not None:
+                journal.record(pair, 'pending')
+            yield pair
+        where = f" in shard {shard[0]}/{shard[1]}" if shard else ""
+        print(f"Read {input_stats['read']} URL pairs{where} from {args.config}")
+        if args.resume:
+            print(f"Resuming: {input_stats['resumed']} URL pairs already written, {input_stats['remaining']} left")
     
+    url_pairs = input_pairs() if worker is None else None
     # Compare URL pairs (with max limit if specified)
     max_pairs = args.max if args.max > 0 else None
-    if max_pairs:
+    if max_pairs and worker is None:
         print(f"Processing only the first {max_pairs} URL pairs")
+        url_pairs = itertools.islice(url_pairs, max_pairs)
+    if url_pairs is not None:
+        # Small inputs are read whole so repeated pages are shared across the entire run
+        url_pairs = planned_input(url_pairs, args.plan_limit)
+    
+    manifest = None
+    if args.incremental:
+        manifest_path = args.manifest or os.path.splitext(args.output)[0] + '_manifest.json'
+        manifest = RunManifest(manifest_path, args.similarity_metric)
+    
+    if args.no_resource_blocking:
+        # Block nothing but keep measuring page loads
+        resource_filter = ResourceFilter(block_types=(), block_extensions=(), block_domains=())
+    elif args.resource_profile:
+        resource_filter = ResourceFilter.from_file(args.resource_profile)
+    else:
+        resource_filter = ResourceFilter()
     
-    results = compare_url_pairs(url_pairs, args.headless, max_pairs)
+    run_stats = {}
+    compare_options = {
+        'journal': journal,
+        'extract_backend': args.extract_backend,
+        'cpu_workers': args.cpu_workers,
+        'browser_backend': args.browser_backend,
+        'tabs': args.tabs,
+        'resource_filter': resource_filter,
+        'similarity_metric': args.similarity_metric,
+        'pool_size': args.pool_size,
+        'max_pages_per_driver': args.recycle_after,
+        'workers': args.workers,
+        'rate_limit': args.rate_limit,
+        'rate_burst': args.rate_burst,
+        'ready_timeout': args.ready_timeout,
+        'connect_timeout': args.connect_timeout,
+        'load_timeout': args.load_timeout,
+        'resilience': FetchResilience(retries=args.retries, backoff=args.retry_backoff,
+                                      threshold=args.breaker_threshold, cooldown=args.breaker_cooldown),
+        'http_first': not args.no_http_first,
+        'cache_dir': None if args.no_cache else args.cache_dir,
+        'run_stats': run_stats,
+        'manifest': manifest,
+    }
     
-    # Create or update Excel report
-    create_comparison_excel(results, args.output)
+    profiling = contextlib.ExitStack()
+    if args.profile:
+        profiling.enter_context(stage_timer.profiled(args.profile))
+    
+    store = None
+    if worker is None and not args.no_results_store:
+        store = ResultsStore(args.results_store or os.path.splitext(args.output)[0] + '_results.db')
+        store.start_run(args.output, args.similarity_metric, args.diff_mode)
+    
+    work_queue = None
+    try:
+        if args.queue:
+            work_queue = WorkQueue(args.queue, lease_seconds=args.lease)
+            if worker:
+                run_queue_worker(work_queue, worker, args.headless, args.diff_mode, compare_options)
+                return
+            work_queue.load(url_pairs)
+            local_workers = spawn_local_workers(args.queue, args.spawn_workers, sys.argv[1:])
+            try:
+                run_queue_coordinator(work_queue, args.output, run_stats, manifest, args.diff_mode,
+                                      args.report_mode, local_workers, store=store,
+                                      keep_archives=args.keep_archives)
+            finally:
+                for process in local_workers:
+                    process.wait()
+        elif args.report_mode == 'streaming':
+            # Write each policy to the report and to output/ as soon as it is compared
+            def all_results():
+                # Resumed policies are written as the input reaches them, between the new ones
+                results = iter_url_pair_results(url_pairs, args.headless, diff_mode=args.diff_mode,
+                                                **compare_options)
+                try:
+                    for result in results:
+                        while resumed:
+                            yield resumed.popleft()
+                        yield result
+                    while resumed:
+                        yield resumed.popleft()
+                finally:
+                    # Closing this generator also stops the pipeline
+                    results.close()
+            
+            write_streaming_report(all_results(), args.output, run_stats, manifest, args.diff_mode,
+                                   flush_dir='output', journal=journal, store=store,
+                                   keep_archives=args.keep_archives)
+        else:
+            # Resumed pairs are already in the report being appended to
+            results = compare_url_pairs(url_pairs, args.headless, diff_mode=args.diff_mode, **compare_options)
+            
+            # Create or update Excel report
+            create_comparison_excel(results, args.output, run_stats, manifest, args.diff_mode, args.report_mode,
+                                    store)
+            for result in results:
+                if not result['error']:
+                    journal.record(result['pair'], 'written')
+    finally:
+        # Keep the policies compared so far even if the run was interrupted
+        if manifest is not None and worker is None:
+            manifest.save()
+        if journal is not None:
+            journal.close()
+        if work_queue is not None:
+            work_queue.close()
+        if store is not None:
+            store.finish_run(run_stats)
+            store.close()
+        profiling.close()
+        report_timings(timings_path, timings_summary_path, timings_baseline)
     
     print(f"\nComparison complete. Results saved to {args.output}")
 
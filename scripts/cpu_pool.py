@@ -0,0 +1,128 @@
+"""
+Process pool for the CPU-bound parts of a comparison run
+
+HTML extraction, the word-set similarity and the line diff are pure Python
+and hold the GIL, so threads cannot spread them over more than one core.
+The fetch and compare threads hand this work to a ProcessPoolExecutor and
+block on the result, while network I/O stays in the main process.
+
+Everything submitted must be picklable: module-level functions, or
+functools.partial objects wrapping them.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import stage_timer
+from diff_engine import LineDiff
+from similarity import score_pair, tokenize
+
+
+def default_cpu_workers():
+    return os.cpu_count() or 1
+
+
+def compare_texts(source_text, dest_text, diff_mode=None, metric='word_jaccard'):
+    """
+    Similarity of two texts by one of the similarity.SIMILARITY_METRICS and,
+    with a diff_mode, their report rows; returns (similarity, LineDiff or None)
+    """
+    source_tokens = tokenize(source_text, [metric])
+    dest_tokens = tokenize(dest_text, [metric])
+
+    source_words = source_tokens.words.keys()
+    dest_words = dest_tokens.words.keys()
+    print(f"Source URL has approximately {len(source_words)} unique words")
+    print(f"Destination URL has approximately {len(dest_words)} unique words")
+    print(f"They share approximately {len(source_words & dest_words)} unique words in common")
+
+    # Calculate similarity
+    with stage_timer.span('similarity'):
+        similarity = score_pair(source_tokens, dest_tokens, [metric])[metric]
+    if metric == 'word_jaccard':
+        print(f"Simple similarity score: {similarity:.2f}")
+    else:
+        print(f"Similarity score ({metric}): {similarity:.2f}")
+
+    diff_rows = None
+    if diff_mode:
+        with stage_timer.span('diff'):
+            diff_rows = LineDiff.from_texts(source_text, dest_text, diff_mode)
+    return similarity, diff_rows
+
+
+def _run_tagged(tags, fn, *args, **kwargs):
+    # Runs on a worker process with the submitting thread's span tags
+    with stage_timer.tagged(**tags):
+        return fn(*args, **kwargs)
+
+
+class CpuPool:
+    """
+    Runs functions on `workers` processes, or in the calling thread when
+    workers is 0; worker processes record their stage timing spans to the
+    same file as the main process
+    """
+
+    def __init__(self, workers=None):
+        self.workers = default_cpu_workers() if workers is None else max(0, workers)
+        self._executor = (ProcessPoolExecutor(max_workers=self.workers, initializer=stage_timer.start_worker,
+                                              initargs=(stage_timer.path(),))
+                          if self.workers else None)
+        self._lock = threading.Lock()
+        self.stats = {
+            'tasks': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def run(self, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) on a worker process and wait for the result
+        """
+        start = time.time()
+        if self._executor is None:
+            result = fn(*args, **kwargs)
+        else:
+            result = self._executor.submit(_run_tagged, stage_timer.current_tags(), fn, *args, **kwargs).result()
+        with self._lock:
+            self.stats['tasks'] += 1
+            self.stats['wait_seconds'] += time.time() - start
+        return result
+
+    def imap(self, fn, calls, window=None):
+        """
+        Yield fn(*args) for every args tuple of calls, in order, with up to
+        `window` calls on the worker processes at a time; calls may be a
+        lazy iterator
+        """
+        if self._executor is None:
+            for args in calls:
+                yield self.run(fn, *args)
+            return
+        window = window or 2 * self.workers
+        pending = deque()
+        for args in calls:
+            pending.append((time.time(), self._executor.submit(_run_tagged, stage_timer.current_tags(), fn, *args)))
+            if len(pending) >= window:
+                yield self._collect(*pending.popleft())
+        while pending:
+            yield self._collect(*pending.popleft())
+
+    def _collect(self, start, future):
+        result = future.result()
+        with self._lock:
+            self.stats['tasks'] += 1
+            self.stats['wait_seconds'] += time.time() - start
+        return result
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def print_stats(self):
+        where = f"{self.workers} processes" if self.workers else "the main process"
+        print(f"CPU pool: {self.stats['tasks']} tasks on {where} "
+              f"({self.stats['wait_seconds']:.2f}s total)")
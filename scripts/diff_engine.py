@@ -0,0 +1,328 @@
+"""
+Line diff backends for the comparison report
+
+The "fast" backend runs a patience diff over lines interned to integers:
+lines that occur exactly once on both sides anchor the alignment and only
+the gaps between anchors are diffed further, which stays close to linear on
+long policies. The "precise" backend is difflib.Differ, whose intraline
+fuzzy matching is roughly quadratic on large documents.
+
+Both backends stream (status, source content, destination content) rows with
+the statuses used in the report. A LineDiff holds the same rows compactly
+until the report is written: each distinct line once in a single string,
+both texts as arrays of line ids and the diff as opcode ranges over them.
+"""
+
+import difflib
+from array import array
+from bisect import bisect_left
+
+MATCH = "Match"
+ONLY_IN_SOURCE = "Only in Source"
+ONLY_IN_DESTINATION = "Only in Destination"
+
+DIFF_MODES = ('fast', 'precise')
+
+
+def _intern_lines(source_lines, dest_lines):
+    # Map every distinct line to a small int so comparisons are int compares;
+    # the ids dict lists the distinct lines in id order
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in source_lines]
+    b = [ids.setdefault(line, len(ids)) for line in dest_lines]
+    return a, b, ids
+
+
+def _unique_anchors(a, b, alo, ahi, blo, bhi):
+    """
+    Longest increasing run of lines that occur exactly once in both ranges,
+    as a list of (i, j) index pairs
+    """
+    counts = {}
+    for i in range(alo, ahi):
+        count, _ = counts.get(a[i], (0, None))
+        counts[a[i]] = (count + 1, i)
+    b_counts = {}
+    for j in range(blo, bhi):
+        line = b[j]
+        if counts.get(line, (0, None))[0] == 1:
+            count, _ = b_counts.get(line, (0, None))
+            b_counts[line] = (count + 1, j)
+
+    candidates = sorted((counts[line][1], j) for line, (count, j) in b_counts.items() if count == 1)
+    if not candidates:
+        return []
+
+    # Patience sorting: longest increasing subsequence of j over i order
+    tails = []
+    tail_idx = []
+    back = [None] * len(candidates)
+    for k, (_, j) in enumerate(candidates):
+        pos = bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        back[k] = tail_idx[pos - 1] if pos > 0 else None
+
+    anchors = []
+    k = tail_idx[-1]
+    while k is not None:
+        anchors.append(candidates[k])
+        k = back[k]
+    anchors.reverse()
+    return anchors
+
+
+def _matching_pairs(a, b):
+    """
+    Matched (i, j) line pairs between a and b in increasing order
+    """
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+
+        # Common prefix and suffix match trivially
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_anchors(a, b, alo, ahi, blo, bhi)
+        if anchors:
+            prev_i, prev_j = alo, blo
+            for i, j in anchors:
+                stack.append((prev_i, i, prev_j, j))
+                matches.append((i, j))
+                prev_i, prev_j = i + 1, j + 1
+            stack.append((prev_i, ahi, prev_j, bhi))
+        else:
+            # Only repeated lines left in this gap, diff it the classic way
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                matches.extend((alo + i + k, blo + j + k) for k in range(size))
+
+    matches.sort()
+    return matches
+
+
+def fast_opcodes(source_lines, dest_lines):
+    """
+    Yield SequenceMatcher style (tag, i1, i2, j1, j2) opcodes from a
+    patience diff of the two line lists
+    """
+    a, b, _ = _intern_lines(source_lines, dest_lines)
+    return _opcodes(a, b)
+
+
+def _opcodes(a, b):
+    i = j = 0
+    run_start = None
+    for mi, mj in _matching_pairs(a, b) + [(len(a), len(b))]:
+        if run_start is not None and (mi, mj) == (i, j) and mi < len(a):
+            # Extends the current run of equal lines
+            i += 1
+            j += 1
+            continue
+        if run_start is not None:
+            yield ('equal', run_start[0], i, run_start[1], j)
+            run_start = None
+        if i < mi and j < mj:
+            yield ('replace', i, mi, j, mj)
+        elif i < mi:
+            yield ('delete', i, mi, j, j)
+        elif j < mj:
+            yield ('insert', i, i, j, mj)
+        if mi < len(a):
+            run_start = (mi, mj)
+            i, j = mi + 1, mj + 1
+
+
+def rows_from_opcodes(opcodes, source_lines, dest_lines):
+    """
+    Turn opcodes into report rows
+    """
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == 'equal':
+            for line in source_lines[i1:i2]:
+                yield (MATCH, line, line)
+            continue
+        for line in source_lines[i1:i2]:
+            yield (ONLY_IN_SOURCE, line, "")
+        for line in dest_lines[j1:j2]:
+            yield (ONLY_IN_DESTINATION, "", line)
+
+
+def _precise_rows(source_lines, dest_lines):
+    for line in difflib.Differ().compare(source_lines, dest_lines):
+        prefix = line[0:2]
+        content = line[2:]
+        if prefix == '  ':
+            yield (MATCH, content, content)
+        elif prefix == '- ':
+            yield (ONLY_IN_SOURCE, content, "")
+        elif prefix == '+ ':
+            yield (ONLY_IN_DESTINATION, "", content)
+        # '? ' lines are intraline hints, not content
+
+
+# Opcode tags of a LineDiff; a replace is stored as a delete and an insert
+_EQUAL, _DELETE, _INSERT = 0, 1, 2
+
+
+class LineDiff:
+    """
+    Report rows of one policy stored as offsets rather than strings
+
+    Every distinct line is kept once, however often it occurs on either
+    side, in one newline-joined buffer with an array of line offsets; the
+    two texts are arrays of line ids and the diff is a flat array of
+    (tag, start, end) runs over them. Iterating yields the same (status,
+    source content, destination content) rows as iter_diff_rows, as often
+    as needed, and source_text()/dest_text() rebuild the compared texts
+    exactly.
+    """
+
+    __slots__ = ('buffer', 'offsets', 'source_ids', 'dest_ids', 'opcodes', 'rows')
+
+    def __init__(self, lines, source_ids, dest_ids, opcodes):
+        self.buffer = '\n'.join(lines)
+        offsets = array('I', [0])
+        for line in lines:
+            offsets.append(offsets[-1] + len(line) + 1)
+        self.offsets = offsets
+        self.source_ids = array('I', source_ids)
+        self.dest_ids = array('I', dest_ids)
+        self.opcodes = array('I', opcodes)
+        self.rows = sum(self.opcodes[k + 2] - self.opcodes[k + 1] for k in range(0, len(self.opcodes), 3))
+
+    @classmethod
+    def from_texts(cls, source_text, dest_text, mode='fast'):
+        """
+        Diff two texts with the 'fast' or 'precise' backend
+        """
+        source_lines = source_text.split('\n')
+        dest_lines = dest_text.split('\n')
+        if mode == 'precise':
+            return cls.from_rows(_precise_rows(source_lines, dest_lines))
+        if mode != 'fast':
+            raise ValueError(f"Unknown diff mode: {mode}")
+
+        a, b, ids = _intern_lines(source_lines, dest_lines)
+        opcodes = []
+        for tag, i1, i2, j1, j2 in _opcodes(a, b):
+            if tag == 'equal':
+                opcodes += (_EQUAL, i1, i2)
+                continue
+            if i1 < i2:
+                opcodes += (_DELETE, i1, i2)
+            if j1 < j2:
+                opcodes += (_INSERT, j1, j2)
+        return cls(ids, a, b, opcodes)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Pack (status, source content, destination content) rows, such as
+        those saved by an earlier run
+        """
+        ids = {}
+        source_ids = []
+        dest_ids = []
+        opcodes = []
+        for status, source_content, dest_content in rows:
+            if status == MATCH:
+                tag, side, line = _EQUAL, source_ids, source_content
+                dest_ids.append(ids.setdefault(dest_content, len(ids)))
+            elif status == ONLY_IN_SOURCE:
+                tag, side, line = _DELETE, source_ids, source_content
+            elif status == ONLY_IN_DESTINATION:
+                tag, side, line = _INSERT, dest_ids, dest_content
+            else:
+                continue
+            position = len(side)
+            side.append(ids.setdefault(line, len(ids)))
+            if opcodes and opcodes[-3] == tag and opcodes[-1] == position:
+                opcodes[-1] += 1  # Extends the previous run
+            else:
+                opcodes += (tag, position, position + 1)
+        return cls(ids, source_ids, dest_ids, opcodes)
+
+    def __len__(self):
+        return self.rows
+
+    def line(self, line_id):
+        return self.buffer[self.offsets[line_id]:self.offsets[line_id + 1] - 1]
+
+    def lines(self):
+        return self.buffer.split('\n') if self.offsets[-1] else []
+
+    def __iter__(self):
+        lines = self.lines()
+        opcodes = self.opcodes
+        for k in range(0, len(opcodes), 3):
+            tag, start, end = opcodes[k:k + 3]
+            if tag == _EQUAL:
+                for line_id in self.source_ids[start:end]:
+                    line = lines[line_id]
+                    yield (MATCH, line, line)
+            elif tag == _DELETE:
+                for line_id in self.source_ids[start:end]:
+                    yield (ONLY_IN_SOURCE, lines[line_id], "")
+            else:
+                for line_id in self.dest_ids[start:end]:
+                    yield (ONLY_IN_DESTINATION, "", lines[line_id])
+
+    def counts(self):
+        """
+        Number of rows of each status, without building the rows
+        """
+        counts = {MATCH: 0, ONLY_IN_SOURCE: 0, ONLY_IN_DESTINATION: 0}
+        status = {_EQUAL: MATCH, _DELETE: ONLY_IN_SOURCE, _INSERT: ONLY_IN_DESTINATION}
+        opcodes = self.opcodes
+        for k in range(0, len(opcodes), 3):
+            counts[status[opcodes[k]]] += opcodes[k + 2] - opcodes[k + 1]
+        return counts
+
+    def source_text(self):
+        return '\n'.join(map(self.line, self.source_ids))
+
+    def dest_text(self):
+        return '\n'.join(map(self.line, self.dest_ids))
+
+    def to_json(self):
+        return {
+            'lines': self.lines(),
+            'source': self.source_ids.tolist(),
+            'dest': self.dest_ids.tolist(),
+            'opcodes': self.opcodes.tolist(),
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['lines'], data['source'], data['dest'], data['opcodes'])
+
+
+def iter_diff_rows(source_text, dest_text, mode='fast'):
+    """
+    Stream the line diff of two texts as (status, source content,
+    destination content) rows
+    """
+    # Split text into lines
+    source_lines = source_text.split('\n')
+    dest_lines = dest_text.split('\n')
+
+    if mode == 'precise':
+        return _precise_rows(source_lines, dest_lines)
+    if mode != 'fast':
+        raise ValueError(f"Unknown diff mode: {mode}")
+    return rows_from_opcodes(fast_opcodes(source_lines, dest_lines), source_lines, dest_lines)
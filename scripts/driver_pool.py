@@ -0,0 +1,215 @@
+"""
+Pool of warm Chrome WebDriver instances shared across a comparison run
+
+Starting Chrome is the most expensive part of fetching a policy page, so
+instead of launching a new browser for every URL the fetchers borrow a driver
+from this pool and hand it back when they are done.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import stage_timer
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
+
+
+def build_chrome_options(headless=True, block_images=False):
+    """
+    Build the Chrome options used by every driver in the pool
+    """
+    # Selenium is imported on the first driver start, not by runs that never open a browser
+    from selenium.webdriver.chrome.options import Options
+
+    options = Options()
+    if headless:
+        options.add_argument('--headless')  # Run in background if headless=True
+
+    if block_images:
+        # Only text is read from the page, so never download images
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--window-size=1920,1080')
+
+    # Set a realistic user agent
+    options.add_argument(f'user-agent={USER_AGENT}')
+    return options
+
+
+class DriverPool:
+    """
+    Hands out warm Chrome drivers and recycles them after a number of pages
+    or after a crash.
+
+    Drivers are started lazily, so a pool of size 4 used by a single fetcher
+    only ever starts one browser.
+
+    With a ResourceFilter, drivers start with images disabled and the
+    fetchers block the filter's other resources on every page load.
+
+    With a page_load_timeout, a page that has not loaded after that many
+    seconds raises a TimeoutException instead of blocking the driver.
+    """
+
+    def __init__(self, size=1, headless=True, max_pages_per_driver=50, resource_filter=None, page_load_timeout=None):
+        self.size = max(1, size)
+        self.page_load_timeout = page_load_timeout
+        self.headless = headless
+        self.max_pages_per_driver = max_pages_per_driver
+        self.resource_filter = resource_filter
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._pages = {}
+        self._closed = False
+        self.stats = {
+            'acquired': 0,
+            'hits': 0,
+            'started': 0,
+            'recycled': 0,
+            'crashed': 0,
+            'startup_seconds': 0.0,
+        }
+
+    def _start_driver(self):
+        start = time.time()
+        from selenium import webdriver
+
+        block_images = self.resource_filter is not None and self.resource_filter.block_images
+        with stage_timer.span('driver_startup'):
+            driver = webdriver.Chrome(options=build_chrome_options(self.headless, block_images))
+            if self.page_load_timeout:
+                driver.set_page_load_timeout(self.page_load_timeout)
+        elapsed = time.time() - start
+        with self._lock:
+            self.stats['started'] += 1
+            self.stats['startup_seconds'] += elapsed
+            self._pages[id(driver)] = 0
+        print(f"Started Chrome driver in {elapsed:.2f}s")
+        return driver
+
+    def _quit_driver(self, driver):
+        with self._lock:
+            self._pages.pop(id(driver), None)
+            self._started -= 1
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Error closing Chrome driver: {str(e)}")
+        # Wake up any fetch waiting for a free slot
+        self._idle.put(None)
+
+    def _is_healthy(self, driver):
+        try:
+            # Any round trip to the browser fails once the session is gone
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """
+        Borrow a driver, starting a new one if the pool is not yet full
+        """
+        if self._closed:
+            raise RuntimeError("Driver pool is closed")
+
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+
+            if driver is None:
+                with self._lock:
+                    can_start = self._started < self.size
+                    if can_start:
+                        self._started += 1
+                if can_start:
+                    try:
+                        driver = self._start_driver()
+                    except Exception:
+                        with self._lock:
+                            self._started -= 1
+                        raise
+                    with self._lock:
+                        self.stats['acquired'] += 1
+                    return driver
+                # Pool is full, wait for another fetch to hand a driver back
+                driver = self._idle.get()
+                if driver is None:
+                    # A driver was quit, so there is room to start another
+                    continue
+
+            if self._is_healthy(driver):
+                with self._lock:
+                    self.stats['acquired'] += 1
+                    self.stats['hits'] += 1
+                return driver
+
+            print("Chrome driver failed health check, replacing it")
+            with self._lock:
+                self.stats['crashed'] += 1
+            self._quit_driver(driver)
+
+    def release(self, driver, failed=False):
+        """
+        Return a driver to the pool, recycling it if it crashed or has
+        served enough pages
+        """
+        with self._lock:
+            pages = self._pages.get(id(driver), 0) + 1
+            self._pages[id(driver)] = pages
+
+        if failed and not self._is_healthy(driver):
+            with self._lock:
+                self.stats['crashed'] += 1
+            self._quit_driver(driver)
+        elif self._closed or (self.max_pages_per_driver and pages >= self.max_pages_per_driver):
+            if not self._closed:
+                with self._lock:
+                    self.stats['recycled'] += 1
+            self._quit_driver(driver)
+        else:
+            self._idle.put(driver)
+
+    @contextmanager
+    def driver(self):
+        """
+        Context manager that borrows a driver for a single page fetch
+        """
+        driver = self.acquire()
+        failed = False
+        try:
+            yield driver
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.release(driver, failed=failed)
+
+    def close(self):
+        """
+        Quit every idle driver; drivers still in use are quit on release
+        """
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if driver is not None:
+                self._quit_driver(driver)
+
+    def print_stats(self):
+        stats = self.stats
+        avg_startup = stats['startup_seconds'] / stats['started'] if stats['started'] else 0.0
+        print(f"Driver pool: {stats['acquired']} fetches, {stats['hits']} served by a warm driver, "
+              f"{stats['started']} started ({stats['startup_seconds']:.2f}s total, {avg_startup:.2f}s avg), "
+              f"{stats['recycled']} recycled, {stats['crashed']} replaced after a crash")
@@ -0,0 +1,278 @@
+"""
+Text extraction for the source and destination policy pages
+
+Both fetch tiers (plain HTTP and the browser) run the same extraction so the
+text they produce is identical. Each extractor returns the cleaned text and
+whether the policy container was found with content in it, which tells the
+HTTP tier when it has to escalate to the browser.
+
+The "fast" backend parses the page with lxml and only walks the policy
+container, collecting the same strings as BeautifulSoup's
+get_text(separator='\n', strip=True). The "bs4" backend is the original
+BeautifulSoup html.parser code. Pages where the container is missing, and
+installs without lxml, always use the bs4 backend.
+"""
+
+import os
+import re
+
+import stage_timer
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # pragma: no cover - lxml is optional
+    lxml = None
+
+EXTRACT_BACKENDS = ('fast', 'bs4')
+
+# Strings inside these tags are not NavigableStrings in BeautifulSoup
+# (Script, Stylesheet, TemplateString, ...) and get_text() skips them
+NON_TEXT_CONTAINERS = frozenset(['script', 'style', 'template', 'rt', 'rp'])
+
+
+def _class_xpath(tag, class_name):
+    # Matches a class anywhere in a multi-valued class attribute, like bs4's class_
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')]"
+
+
+def _has_class(element, class_name):
+    return class_name in (element.get('class') or '').split()
+
+
+def _lxml_text(root, drop=None):
+    """
+    The equivalent of BeautifulSoup's get_text(separator='\n', strip=True)
+    for an lxml element; elements for which drop(element) is true are left
+    out like decompose() would, keeping the text that follows them
+    """
+    skipped = any(ancestor.tag in NON_TEXT_CONTAINERS for ancestor in root.iterancestors())
+    strings = []
+    # Walk iteratively: policy pages can nest deeper than the recursion limit
+    stack = [(root, skipped)]
+    while stack:
+        node, parent_skipped = stack.pop()
+        if isinstance(node, str):
+            if not parent_skipped:
+                node = node.strip()
+                if node:
+                    strings.append(node)
+            continue
+        if not isinstance(node.tag, str) or (drop is not None and drop(node)):
+            # Comments and processing instructions have no text of their own
+            continue
+        skipped = parent_skipped or node.tag in NON_TEXT_CONTAINERS
+        for child in reversed(node):
+            if child.tail:
+                stack.append((child.tail, skipped))
+            stack.append((child, skipped))
+        if node.text and not skipped:
+            text = node.text.strip()
+            if text:
+                strings.append(text)
+    return '\n'.join(strings)
+
+
+def _parse_lxml(page_source):
+    """
+    Parse a page with lxml, or return None to fall back to BeautifulSoup
+    """
+    if lxml is None or not page_source:
+        return None
+    if '<![CDATA[' in page_source:
+        # html.parser keeps CDATA sections as text while libxml2 drops them
+        return None
+    try:
+        with stage_timer.span('html_parse'):
+            return lxml.html.document_fromstring(page_source)
+    except (etree.ParserError, ValueError):
+        return None
+
+
+def _drop_hidden_print(element):
+    return element.tag in ('script', 'style', 'div', 'a') and _has_class(element, 'hidden-print')
+
+
+def _drop_script_style(element):
+    return element.tag in ('script', 'style')
+
+
+def extract_source_text(page_source, url='', backend='fast'):
+    """
+    Parser specifically for the source URL
+    """
+    with stage_timer.span('extraction', url):
+        return _extract_source_text(page_source, url, backend)
+
+
+def _extract_source_text(page_source, url, backend):
+    if backend == 'fast':
+        document = _parse_lxml(page_source)
+        if document is not None:
+            for class_name in ('journal-content-article', 'journey-content-article'):
+                containers = document.xpath(_class_xpath('div', class_name))
+                if containers:
+                    if class_name != 'journal-content-article':
+                        print(f"❌ Main content not found using 'journal-content-article'")
+                    return _fast_source_text(containers[0], class_name)
+    # The bs4 parser reports what it finds, or does not find, itself
+    return _bs4_source_text(page_source, url)
+
+
+def _fast_source_text(main_content, class_name):
+    print(f"✅ Found main content using '{class_name}' class")
+    text = _lxml_text(main_content, _drop_hidden_print)
+
+    # Save a debug copy of the HTML content
+    if class_name == 'journal-content-article' and not os.environ.get('GITHUB_ACTIONS'):
+        with open("source_html_debug.html", "w", encoding="utf-8") as f:
+            f.write(lxml.html.tostring(main_content, encoding='unicode'))
+
+    # Clean up text
+    text = re.sub(r'\n+', '\n', text)
+
+    return text, bool(text)
+
+
+def _bs4_source_text(page_source, url=''):
+    # Use BeautifulSoup to parse and clean; imported here, as the fast backend rarely needs it
+    from bs4 import BeautifulSoup
+    with stage_timer.span('html_parse'):
+        soup = BeautifulSoup(page_source, 'html.parser')
+
+    # UPDATED: Look for the div with class 'journal-content-article'
+    # This matches the structure in the alabama.html file
+    main_content = soup.find('div', class_='journal-content-article')
+
+    if main_content:
+        print(f"✅ Found main content using 'journal-content-article' class")
+        # Remove specific unwanted elements
+        for tag in main_content.find_all(["script", "style", "div", "a"], class_="hidden-print"):
+            tag.decompose()
+
+        # Get text from the cleaned main content
+        text = main_content.get_text(separator='\n', strip=True)
+        found = bool(text)
+
+        # Save a debug copy of the HTML content
+        if not os.environ.get('GITHUB_ACTIONS'):  # Avoid writing debug files in GitHub Actions
+            with open("source_html_debug.html", "w", encoding="utf-8") as f:
+                f.write(str(main_content))
+
+    else:
+        print(f"❌ Main content not found using 'journal-content-article'")
+        # Try alternate class as fallback
+        main_content = soup.find('div', class_='journey-content-article')
+
+        if main_content:
+            print(f"✅ Found main content using 'journey-content-article' class")
+            # Remove specific unwanted elements
+            for tag in main_content.find_all(["script", "style", "div", "a"], class_="hidden-print"):
+                tag.decompose()
+
+            # Get text from the cleaned main content
+            text = main_content.get_text(separator='\n', strip=True)
+            found = bool(text)
+        else:
+            print(f"❌ Main content not found for {url}")
+            # If we can't find the specific content, fall back to the entire page
+            # but still clean up unwanted elements
+            for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
+                script_or_style.decompose()
+
+            text = soup.get_text(separator='\n', strip=True)
+            found = False
+
+    # Clean up text
+    text = re.sub(r'\n+', '\n', text)
+
+    return text, found
+
+
+def extract_destination_text(page_source, url='', backend='fast'):
+    """
+    Parser specifically for the destination URL in the main tag
+    """
+    with stage_timer.span('extraction', url):
+        return _extract_destination_text(page_source, url, backend)
+
+
+def _extract_destination_text(page_source, url, backend):
+    if backend == 'fast':
+        document = _parse_lxml(page_source)
+        if document is not None:
+            main_tags = document.xpath('.//main')
+            if main_tags:
+                return _fast_destination_text(main_tags[0])
+    return _bs4_destination_text(page_source, url)
+
+
+def _fast_destination_text(main_tag):
+    print(f"✅ Found main tag in destination URL")
+    found = False
+
+    content_wrapper_divs = main_tag.xpath(_class_xpath('div', 'contentWrapper'))
+    if content_wrapper_divs:
+        # Combine all text from content wrappers
+        all_text = [_lxml_text(div, _drop_script_style) for div in content_wrapper_divs]
+        text = '\n\n'.join(all_text)
+        found = any(all_text)
+    else:
+        # If no content wrapper divs, get all text from main tag
+        text = _lxml_text(main_tag, _drop_script_style)
+
+    # Clean up text
+    text = re.sub(r'\n+', '\n', text)
+
+    return text, found
+
+
+def _bs4_destination_text(page_source, url=''):
+    # Use BeautifulSoup to parse and clean; imported here, as the fast backend rarely needs it
+    from bs4 import BeautifulSoup
+    with stage_timer.span('html_parse'):
+        soup = BeautifulSoup(page_source, 'html.parser')
+
+    # SPECIFIC PARSING FOR DESTINATION URL - FIND MAIN TAG
+    main_tag = soup.find('main')
+    found = False
+
+    if main_tag:
+        print(f"✅ Found main tag in destination URL")
+
+        # Extract content from within the main tag
+        content_wrapper_divs = main_tag.find_all('div', class_='contentWrapper')
+
+        if content_wrapper_divs:
+            all_text = []
+
+            # Process each content wrapper div
+            for div in content_wrapper_divs:
+                # Remove any scripts, styles, etc.
+                for element in div.find_all(['script', 'style']):
+                    element.decompose()
+
+                # Get the text from this div
+                div_text = div.get_text(separator='\n', strip=True)
+                all_text.append(div_text)
+
+            # Combine all text from content wrappers
+            text = '\n\n'.join(all_text)
+            found = any(all_text)
+        else:
+            # If no content wrapper divs, get all text from main tag
+            for element in main_tag.find_all(['script', 'style']):
+                element.decompose()
+            text = main_tag.get_text(separator='\n', strip=True)
+    else:
+        print(f"❌ Main tag not found for {url}")
+        # If we can't find the main tag, fall back to the entire page
+        for script_or_style in soup(['script', 'style', 'header', 'footer', 'nav']):
+            script_or_style.decompose()
+
+        text = soup.get_text(separator='\n', strip=True)
+
+    # Clean up text
+    text = re.sub(r'\n+', '\n', text)
+
+    return text, found
@@ -0,0 +1,176 @@
+"""
+Persistent on-disk cache of fetched policy pages
+
+Entries are keyed by the normalized URL and hold the raw HTML, the extracted
+text, the HTTP validators (ETag/Last-Modified) and a hash of the HTML. A
+later run revalidates an entry with a conditional request or by comparing
+the content hash, and reuses the cached extraction when the page has not
+changed.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Normalize a URL so trivially different spellings share a cache entry:
+    lowercase scheme and host, drop default ports and fragments, and sort
+    the query parameters
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+def content_hash(page_source):
+    return hashlib.sha256(page_source.encode('utf-8')).hexdigest()
+
+
+class FetchCache:
+    """
+    Directory of cached pages with TTL and size based eviction.
+
+    Entries younger than max_age seconds are served without touching the
+    network; older ones are revalidated. Entries not used for ttl seconds
+    are evicted, as are the least recently used ones once the cache grows
+    beyond max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_age=12 * 3600, ttl=30 * 24 * 3600, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_age = max_age
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'revalidated': 0,
+            'misses': 0,
+            'stored': 0,
+            'evicted': 0,
+        }
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, kind, url, suffix):
+        key = hashlib.sha256(f"{kind}:{normalize_url(url)}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + suffix)
+
+    def count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def get(self, kind, url):
+        """
+        Return the cached entry for a URL, or None
+        """
+        path = self._path(kind, url, '.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Touch the entry so size based eviction drops the least recently used first
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get('fetched_at', 0) < self.max_age
+
+    def get_html(self, kind, url):
+        try:
+            with open(self._path(kind, url, '.html'), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, kind, url, page_source, text, tier, etag=None, last_modified=None):
+        """
+        Store a fetched page and its extracted text
+        """
+        entry = {
+            'url': normalize_url(url),
+            'tier': tier,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_hash': content_hash(page_source),
+            'fetched_at': time.time(),
+            'text': text,
+        }
+        html_path = self._path(kind, url, '.html')
+        os.makedirs(os.path.dirname(html_path), exist_ok=True)
+        # Write to a temporary file first so concurrent readers never see half an entry
+        self._write_atomic(html_path, page_source)
+        self._write_atomic(self._path(kind, url, '.json'), json.dumps(entry))
+        self.count('stored')
+        return entry
+
+    def refresh(self, kind, url, entry, etag=None, last_modified=None):
+        """
+        Mark an unchanged entry as freshly validated
+        """
+        entry['fetched_at'] = time.time()
+        entry['etag'] = etag or entry.get('etag')
+        entry['last_modified'] = last_modified or entry.get('last_modified')
+        self._write_atomic(self._path(kind, url, '.json'), json.dumps(entry))
+
+    def _write_atomic(self, path, data):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """
+        Evict expired entries, then the least recently used ones until the
+        cache fits in max_bytes
+        """
+        now = time.time()
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                json_path = os.path.join(root, name)
+                html_path = json_path[:-len('.json')] + '.html'
+                try:
+                    mtime = os.path.getmtime(json_path)
+                    size = os.path.getsize(json_path)
+                    if os.path.exists(html_path):
+                        size += os.path.getsize(html_path)
+                except OSError:
+                    continue
+                entries.append((mtime, size, json_path, html_path))
+
+        entries.sort()
+        total = sum(size for _, size, _, _ in entries)
+        for mtime, size, json_path, html_path in entries:
+            if now - mtime < self.ttl and total <= self.max_bytes:
+                break
+            for path in (json_path, html_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+            self.count('evicted')
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"Fetch cache: {stats['hits']} fresh hits, {stats['revalidated']} revalidated unchanged, "
+              f"{stats['misses']} misses, {stats['stored']} stored, {stats['evicted']} evicted")
@@ -0,0 +1,219 @@
+"""
+Planning stage between loading the URL pairs and fetching them
+
+Input workbooks often repeat rows, or compare one source page against
+several destination pages (one per ?lob= line of business). The planner
+normalizes every URL and collapses:
+
+  - identical pairs into a single comparison whose result is reported for
+    every input row that asked for it
+  - repeated source or destination URLs into a single fetch whose text is
+    shared by every pair that needs it
+
+Shared texts are only kept until the last pair using them has been fetched.
+
+A list of pairs is planned up front. Pairs read lazily from a large input
+go through a StreamingFetchPlan instead, which hands each comparison to the
+fetchers as soon as its row is read and only collapses repeats of the
+pairs still in flight. planned_input picks between the two: an input of up
+to `limit` pairs is read whole and planned.
+"""
+
+import itertools
+import threading
+
+from fetch_cache import normalize_url
+
+
+def pair_identity(pair):
+    return normalize_url(pair['source_url']), normalize_url(pair['dest_url'])
+
+
+def planned_input(url_pairs, limit):
+    """
+    Read url_pairs into a list, to be planned whole by a FetchPlan, if it
+    holds at most `limit` pairs; otherwise return an iterator over every
+    pair, to be streamed. A limit of 0 always streams.
+    """
+    url_pairs = iter(url_pairs)
+    head = list(itertools.islice(url_pairs, limit + 1)) if limit > 0 else []
+    if limit > 0 and len(head) <= limit:
+        return head
+    return itertools.chain(head, url_pairs)
+
+
+class FetchPlan:
+    """
+    The unique comparisons of a list of URL pairs
+
+    comparisons[i] is the pair to fetch and compare, and rows[i] lists the
+    (input index, pair) of every input row it stands for
+    """
+
+    def __init__(self, url_pairs):
+        self.comparisons = []
+        self.rows = []
+        by_identity = {}
+        for idx, pair in enumerate(url_pairs):
+            identity = pair_identity(pair)
+            if identity not in by_identity:
+                by_identity[identity] = len(self.comparisons)
+                self.comparisons.append(pair)
+                self.rows.append([])
+            self.rows[by_identity[identity]].append((idx, pair))
+
+        # How many comparisons need each page
+        self.uses = {}
+        for pair in self.comparisons:
+            for key in (('source', normalize_url(pair['source_url'])), ('destination', normalize_url(pair['dest_url']))):
+                self.uses[key] = self.uses.get(key, 0) + 1
+
+        self.stats = {
+            'input_pairs': len(url_pairs),
+            'comparisons': len(self.comparisons),
+            'fetches': len(self.uses),
+            'fetches_saved': 2 * len(url_pairs) - len(self.uses),
+        }
+
+    def take_rows(self, idx):
+        """
+        The input rows comparison idx stands for
+        """
+        return self.rows[idx]
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"Fetch plan: {stats['input_pairs']} URL pairs, {stats['comparisons']} unique comparisons, "
+              f"{stats['fetches']} unique pages to fetch ({stats['fetches_saved']} fetches saved)")
+
+
+class StreamingFetchPlan:
+    """
+    The comparisons of URL pairs read lazily, for inputs too large to plan
+    up front
+
+    Iterating comparisons reads the input and yields each new comparison
+    right away. A pair identical to one still in flight is folded into it.
+    A pair repeating one whose result was already reported by take_rows is
+    compared again, since keeping every result for late repeats would hold
+    the whole run in memory. Each yielded comparison registers its pages
+    with the SharedFetches, so pages are shared between the comparisons in
+    flight at the same time.
+    """
+
+    def __init__(self, url_pairs, shared):
+        self._url_pairs = url_pairs
+        self._shared = shared
+        self._lock = threading.Lock()
+        # identity -> comparison index, for comparisons not yet reported
+        self._in_flight = {}
+        self._rows = {}
+        self.stats = {
+            'input_pairs': 0,
+            'comparisons': 0,
+            'fetches': 0,
+            'fetches_saved': 0,
+        }
+
+    @property
+    def comparisons(self):
+        for idx, pair in enumerate(self._url_pairs):
+            identity = pair_identity(pair)
+            with self._lock:
+                self.stats['input_pairs'] += 1
+                comparison = self._in_flight.get(identity)
+                if comparison is not None:
+                    self._rows[comparison].append((idx, pair))
+                    continue
+                comparison = self.stats['comparisons']
+                self.stats['comparisons'] += 1
+                self._in_flight[identity] = comparison
+                self._rows[comparison] = [(idx, pair)]
+            self._shared.add_uses(pair)
+            yield pair
+
+    def take_rows(self, idx):
+        """
+        The input rows comparison idx stands for; later repeats of the pair
+        start a new comparison
+        """
+        with self._lock:
+            rows = self._rows.pop(idx)
+            self._in_flight.pop(pair_identity(rows[0][1]), None)
+        return rows
+
+    def print_stats(self):
+        stats = self.stats
+        # Only the shared fetches know how many pages were actually requested
+        stats['fetches'] = self._shared.stats['fetched']
+        stats['fetches_saved'] = 2 * stats['input_pairs'] - stats['fetches']
+        print(f"Fetch plan: streaming, {stats['input_pairs']} URL pairs read, "
+              f"{stats['comparisons']} comparisons, {stats['fetches']} pages fetched "
+              f"({stats['fetches_saved']} fetches saved)")
+
+
+class SharedFetches:
+    """
+    Fetches each planned page once and hands its text to every comparison
+    that needs it; concurrent requests for a page wait for the first one
+    """
+
+    def __init__(self, uses=None):
+        self._uses = dict(uses or {})
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'fetched': 0,
+            'shared': 0,
+        }
+
+    def add_uses(self, pair):
+        """
+        Count one more comparison needing both pages of pair
+        """
+        with self._lock:
+            for key in (('source', normalize_url(pair['source_url'])), ('destination', normalize_url(pair['dest_url']))):
+                self._uses[key] = self._uses.get(key, 0) + 1
+
+    def fetch(self, kind, url, load):
+        """
+        Return the text of a page, calling load() only for its first use;
+        if that call raised, its error is kept on the entry and each waiting
+        use calls load() again, unless it was interrupted
+        """
+        key = (kind, normalize_url(url))
+        with self._lock:
+            entry = self._entries.get(key)
+            owner = entry is None
+            if owner:
+                entry = self._entries[key] = {'ready': threading.Event(), 'text': None, 'error': None}
+
+        loaded = owner
+        try:
+            if owner:
+                try:
+                    entry['text'] = load()
+                except BaseException as e:
+                    entry['error'] = e
+                    raise
+                finally:
+                    entry['ready'].set()
+                return entry['text']
+            entry['ready'].wait()
+            error = entry['error']
+            if error is None:
+                return entry['text']
+            if not isinstance(error, Exception):
+                # Ctrl-C or exit in the first fetch stops this pair too
+                raise error
+            # The first fetch raised, so try again for this pair
+            loaded = True
+            return load()
+        finally:
+            with self._lock:
+                self.stats['fetched' if loaded else 'shared'] += 1
+                # Drop the entry once every comparison that needs it is done with it
+                self._uses[key] = self._uses.get(key, 1) - 1
+                if self._uses[key] <= 0:
+                    self._entries.pop(key, None)
+                    del self._uses[key]
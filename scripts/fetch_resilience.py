@@ -0,0 +1,201 @@
+"""
+Retries and per-host circuit breakers for page fetches
+
+A fetch that fails is classified into a FetchError with a reason:
+
+    timeout       the connection, page load or navigation timed out
+    connection    the host refused or dropped the connection, or its name
+                  did not resolve
+    http          the server answered with an error status
+    browser       the browser failed for another reason
+    circuit_open  the host's circuit breaker is open, nothing was requested
+
+Timeouts, connection errors, 429 and 5xx answers are transient and retried
+with exponential backoff and jitter. Every failed attempt also counts
+against the host's circuit breaker: after `threshold` consecutive failures
+the circuit opens and every fetch from that host fails at once, without a
+request, for `cooldown` seconds. The next fetch after that is let through
+as a trial; success closes the circuit and failure opens it again.
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+REASONS = ('timeout', 'connection', 'http', 'browser', 'circuit_open')
+
+# Substrings of the browsers' network errors that mean the host could not be reached
+_CONNECTION_ERRORS = ('ERR_CONNECTION', 'ERR_NAME_NOT_RESOLVED', 'ERR_ADDRESS_UNREACHABLE', 'ERR_INTERNET_DISCONNECTED',
+                      'ERR_EMPTY_RESPONSE', 'ERR_TUNNEL_CONNECTION_FAILED', 'ERR_SSL', 'ERR_CERT')
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+
+class FetchError(Exception):
+    """
+    A page that could not be fetched; str() gives the "Error fetching ..."
+    message saved in place of the page's text
+    """
+
+    def __init__(self, url, reason, message, transient=False, status=None, attempts=1):
+        super().__init__(message)
+        self.url = url
+        self.reason = reason
+        self.message = message
+        self.transient = transient
+        self.status = status
+        self.attempts = attempts
+
+    def __str__(self):
+        return f"Error fetching {self.url}: {self.message}"
+
+    def details(self):
+        """
+        Fields recorded in the run journal for a failed pair
+        """
+        details = {'error': str(self), 'reason': self.reason, 'attempts': self.attempts}
+        if self.status is not None:
+            details['status'] = self.status
+        return details
+
+
+def classify(url, error):
+    """
+    Wrap any exception raised while fetching url in a FetchError
+    """
+    if isinstance(error, FetchError):
+        return error
+    # Matched by name so Selenium and Playwright need not be imported here
+    names = {cls.__name__ for cls in type(error).__mro__}
+    message = str(error).strip().splitlines()[0] if str(error).strip() else type(error).__name__
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None)
+
+    if status is not None:
+        return FetchError(url, 'http', message, transient=status == 429 or status >= 500, status=status)
+    if names & {'Timeout', 'TimeoutException', 'TimeoutError', 'ReadTimeout', 'ConnectTimeout'}:
+        return FetchError(url, 'timeout', message, transient=True)
+    if names & {'ConnectionError', 'ConnectionRefusedError', 'ConnectionResetError'} or any(
+            marker in message for marker in _CONNECTION_ERRORS):
+        return FetchError(url, 'connection', message, transient=True)
+    return FetchError(url, 'browser', message)
+
+
+class FetchResilience:
+    """
+    Runs page fetches with retries and a circuit breaker per host
+    """
+
+    def __init__(self, retries=2, backoff=1.0, max_backoff=30.0, jitter=0.5, threshold=5, cooldown=60.0):
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        # host -> {'failures': consecutive failures, 'opened_at': time or None, 'trial': trial in flight}
+        self._hosts = {}
+        self.stats = {
+            'attempts': 0,
+            'retries': 0,
+            'failed': 0,
+            'fast_failed': 0,
+            'circuits_opened': 0,
+            'backoff_seconds': 0.0,
+        }
+
+    def _admit(self, host):
+        """
+        Whether a request to host may go out; an open circuit admits a
+        single trial once its cooldown has passed
+        """
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or state['opened_at'] is None:
+                return True
+            if not state['trial'] and time.time() - state['opened_at'] >= self.cooldown:
+                state['trial'] = True
+                return True
+            self.stats['fast_failed'] += 1
+            return False
+
+    def _record(self, host, ok):
+        with self._lock:
+            state = self._hosts.setdefault(host, {'failures': 0, 'opened_at': None, 'trial': False})
+            trial = state['trial']
+            state['trial'] = False
+            if ok:
+                if state['opened_at'] is not None:
+                    print(f"Circuit for {host} closed again")
+                state['failures'] = 0
+                state['opened_at'] = None
+                return
+            state['failures'] += 1
+            if trial or (state['opened_at'] is None and state['failures'] >= self.threshold):
+                if state['opened_at'] is None:
+                    self.stats['circuits_opened'] += 1
+                    print(f"Circuit for {host} opened after {state['failures']} consecutive failures, "
+                          f"failing its fetches fast for {self.cooldown:.0f}s")
+                state['opened_at'] = time.time()
+
+    def delay(self, attempt):
+        """
+        Seconds to wait before retry number `attempt` (1-based)
+        """
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def call(self, url, fetch):
+        """
+        Return fetch(), retrying transient failures; raises a FetchError
+        once the retries are used up, the failure is permanent or the
+        host's circuit is open
+        """
+        host = _host(url)
+        attempt = 0
+        while True:
+            attempt += 1
+            if not self._admit(host):
+                with self._lock:
+                    self.stats['failed'] += 1
+                raise FetchError(url, 'circuit_open', f"{host} is failing, skipped while its circuit is open",
+                                 attempts=attempt - 1)
+            with self._lock:
+                self.stats['attempts'] += 1
+            try:
+                result = fetch()
+            except Exception as e:
+                error = classify(url, e)
+                error.attempts = attempt
+                # Only failures of the host count against its circuit, not 404s
+                self._record(host, not error.transient)
+                if not error.transient or attempt > self.retries:
+                    with self._lock:
+                        self.stats['failed'] += 1
+                    raise error
+                wait = self.delay(attempt)
+                print(f"Attempt {attempt} failed ({error.reason}: {error.message}), retrying in {wait:.1f}s")
+                with self._lock:
+                    self.stats['retries'] += 1
+                    self.stats['backoff_seconds'] += wait
+                time.sleep(wait)
+            else:
+                self._record(host, True)
+                return result
+
+    def open_circuits(self):
+        with self._lock:
+            return sorted(host for host, state in self._hosts.items() if state['opened_at'] is not None)
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"Fetch resilience: {stats['attempts']} attempts, {stats['retries']} retries "
+              f"({stats['backoff_seconds']:.1f}s backoff), {stats['failed']} pages failed, "
+              f"{stats['fast_failed']} failed fast on {stats['circuits_opened']} opened circuits")
+        open_hosts = self.open_circuits()
+        if open_hosts:
+            print(f"  Circuits still open: {', '.join(open_hosts)}")
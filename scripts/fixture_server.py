@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Local HTTP server serving synthetic or recorded policy pages
+
+Mimics the two production sites so the whole pipeline can run without
+network access:
+
+    /portal/web/medical-policies/-/mp-<policy>       source page, policy text in
+                                                     div.journal-content-article
+    /policy/<plan>/<policy>?lob=...                  destination page, policy text in
+                                                     main > div.contentWrapper
+
+Every policy number gets its own synthetic text of about `lines` lines, and
+its destination page carries the same text with `mutation_rate` of the lines
+edited, deleted or inserted. Pages saved as source_<policy>.html and
+dest_<policy>.html in a recorded pages directory are served instead of the
+synthetic ones. Responses can be delayed to model a slow site, and a share
+of the pages can render their policy text from a script, so that the plain
+HTTP tier has to fall back to the browser.
+
+Run it on its own with
+
+    python3 scripts/fixture_server.py --port 8765 --lines 300 --delay 0.2
+
+and point a workbook at it with test_data_generator.py --base-url.
+"""
+
+import argparse
+import contextlib
+import http.server
+import json
+import os
+import random
+import re
+import threading
+import time
+from functools import lru_cache, partial
+
+from test_data_generator import generate_policy_page, generate_policy_text, mutate_policy_text
+
+SOURCE_PATH = re.compile(r'/portal/web/medical-policies/-/mp-(\d+)$')
+DESTINATION_PATH = re.compile(r'/policy/\d+/(\d+)$')
+
+
+def _render_with_script(page):
+    """
+    Move the policy container's content into a script that writes it after
+    load, like a single-page app; the static HTML then has an empty container
+    """
+    match = (re.search(r'(<div class="journal-content-article[^"]*"[^>]*>)(.*?)(</div></div>)', page, re.S)
+             or re.search(r'(<main[^>]*>)(.*)(</main>)', page, re.S))
+    if not match:
+        return page
+    opening, content, closing = match.groups()
+    container_id = 'policy-content'
+    # Escaped so the policy's own script tags do not end this one
+    content = json.dumps(content).replace('</', '<\\/')
+    script = (f"<script>document.addEventListener('DOMContentLoaded', function () {{"
+              f"document.getElementById('{container_id}').innerHTML = {content};}});</script>")
+    opening = re.sub(r'^<(\w+)', rf'<\1 id="{container_id}"', opening.replace(' id="content"', ''))
+    page = page[:match.start()] + opening + closing + page[match.end():]
+    return page.replace('</body>', script + '\n</body>')
+
+
+class PolicyPages:
+    """
+    Builds the page for a request path, or None for unknown paths
+    """
+
+    def __init__(self, lines=300, mutation_rate=0.02, js_fraction=0.0, pages_dir=None):
+        self.lines = lines
+        self.mutation_rate = mutation_rate
+        self.js_fraction = js_fraction
+        self.pages_dir = pages_dir
+        # Both pages of a policy start from the same text
+        self._source_text = lru_cache(maxsize=1024)(partial(generate_policy_text, line_count=lines))
+
+    def _text(self, policy_num, kind):
+        text = self._source_text(policy_num)
+        return text if kind == 'source' else mutate_policy_text(text, self.mutation_rate, seed=policy_num)
+
+    def _recorded(self, policy_num, kind):
+        if not self.pages_dir:
+            return None
+        path = os.path.join(self.pages_dir, f"{'source' if kind == 'source' else 'dest'}_{policy_num}.html")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def page(self, path):
+        path = path.split('?', 1)[0]
+        for kind, pattern in (('source', SOURCE_PATH), ('destination', DESTINATION_PATH)):
+            match = pattern.search(path)
+            if match:
+                policy_num = int(match.group(1))
+                page = self._recorded(policy_num, kind)
+                if page is None:
+                    page = generate_policy_page(policy_num, kind, text=self._text(policy_num, kind))
+                    if random.Random(policy_num).random() < self.js_fraction:
+                        page = _render_with_script(page)
+                return page
+        return None
+
+
+def _handler(pages, delay=0.0, jitter=0.0):
+    """
+    Request handler class serving pages, a PolicyPages or a dict of
+    {path: html or bytes}
+    """
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if delay:
+                time.sleep(delay * (1 + random.uniform(-jitter, jitter)))
+            body = pages.page(self.path) if isinstance(pages, PolicyPages) else pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            if isinstance(body, bytes):
+                data, content_type = body, 'application/octet-stream'
+            else:
+                data, content_type = body.encode('utf-8'), 'text/html; charset=utf-8'
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@contextlib.contextmanager
+def serve(pages, host='127.0.0.1', port=0, delay=0.0, jitter=0.0):
+    """
+    Serve pages from a server thread; yields the base URL
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _handler(pages, delay, jitter))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve synthetic or recorded policy pages for offline runs')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Port to listen on (0 = any free port)')
+    parser.add_argument('--lines', type=int, default=300,
+                        help='Approximate number of lines per synthetic policy')
+    parser.add_argument('--mutation-rate', type=float, default=0.02,
+                        help='Fraction of lines edited, deleted or inserted on the destination pages')
+    parser.add_argument('--delay', type=float, default=0.0,
+                        help='Seconds to wait before answering each request')
+    parser.add_argument('--jitter', type=float, default=0.5,
+                        help='Random variation of the delay, as a fraction of it')
+    parser.add_argument('--js-fraction', type=float, default=0.0,
+                        help='Share of pages whose policy text is written by a script, forcing the browser tier')
+    parser.add_argument('--pages-dir', default=None,
+                        help='Directory of recorded source_<policy>.html and dest_<policy>.html pages')
+    args = parser.parse_args()
+
+    pages = PolicyPages(args.lines, args.mutation_rate, args.js_fraction, args.pages_dir)
+    with serve(pages, args.host, args.port, args.delay, args.jitter) as base_url:
+        # The benchmark reads the URL from this first line
+        print(f"Serving policy pages on {base_url}", flush=True)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Plain HTTP fetch tier used before falling back to the browser
+
+Many policy pages serve their text in the initial HTML, so a pooled
+keep-alive HTTP request followed by the normal extraction is enough and the
+browser is only needed when the policy container is missing or empty.
+"""
+
+import threading
+from urllib.parse import urlparse
+
+from driver_pool import USER_AGENT
+
+
+class HttpFetcher:
+    """
+    Keep-alive HTTP client plus per-host statistics on which tier (http or
+    browser) served each page. Requests give up after connect_timeout
+    seconds without a connection or timeout seconds without data.
+    """
+
+    def __init__(self, pool_size=10, timeout=15, connect_timeout=5):
+        self.timeout = (connect_timeout, timeout)
+        # Imported here so runs that never fetch start without requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+        self._lock = threading.Lock()
+        self.host_stats = {}
+
+    def fetch(self, url, headers=None):
+        """
+        Fetch a URL and return the response, raising on HTTP errors.
+        A 304 Not Modified answer to a conditional request is not an error.
+        """
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code != 304:
+            response.raise_for_status()
+        if 'charset' not in response.headers.get('Content-Type', '').lower():
+            # requests assumes ISO-8859-1 without a charset, the policy sites are UTF-8
+            response.encoding = 'utf-8'
+        return response
+
+    def get(self, url):
+        """
+        Fetch the raw HTML of a URL, raising on HTTP errors
+        """
+        return self.fetch(url).text
+
+    def tier_totals(self):
+        """
+        Number of pages served by each tier across all hosts
+        """
+        return {
+            'http': sum(s['http'] for s in self.host_stats.values()),
+            'browser': sum(s['browser'] for s in self.host_stats.values()),
+        }
+
+    def record_tier(self, url, tier, seconds):
+        """
+        Record that a page was served by the 'http' or 'browser' tier
+        """
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            stats = self.host_stats.setdefault(host, {
+                'http': 0,
+                'browser': 0,
+                'http_seconds': 0.0,
+                'browser_seconds': 0.0,
+            })
+            stats[tier] += 1
+            stats[f'{tier}_seconds'] += seconds
+
+    def print_stats(self):
+        if not self.host_stats:
+            return
+
+        total_browser = sum(s['browser'] for s in self.host_stats.values())
+        total_browser_seconds = sum(s['browser_seconds'] for s in self.host_stats.values())
+        overall_avg = total_browser_seconds / total_browser if total_browser else 0.0
+
+        print("Fetch tiers per host:")
+        for host, stats in sorted(self.host_stats.items()):
+            # Estimate the saving from this host's own browser loads when we have any
+            avg_browser = stats['browser_seconds'] / stats['browser'] if stats['browser'] else overall_avg
+            avg_http = stats['http_seconds'] / stats['http'] if stats['http'] else 0.0
+            saved = stats['http'] * max(0.0, avg_browser - avg_http)
+            print(f"  {host}: {stats['http']} via HTTP, {stats['browser']} via browser, "
+                  f"~{saved:.1f}s of browser time saved")
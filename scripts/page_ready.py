@@ -0,0 +1,118 @@
+"""
+Adaptive readiness detection for pages loaded in Chrome
+
+Instead of sleeping a fixed number of seconds after <body> appears, poll the
+page until the content container the parser needs is present and the DOM and
+network activity have settled, bounded by a hard timeout.
+
+wait_for_content polls a Selenium driver; wait_for_content_async does the
+same for a page driven over the DevTools protocol by async_browser.
+"""
+
+import asyncio
+import time
+
+# Returns [readyState, element count, target text length or -1, resource count]
+_SNAPSHOT_BODY = """
+var length = -1;
+for (var i = 0; i < selectors.length; i++) {
+    var el = document.querySelector(selectors[i]);
+    if (el && el.textContent.trim().length) {
+        length = el.textContent.length;
+        break;
+    }
+}
+var resources = (window.performance && performance.getEntriesByType)
+    ? performance.getEntriesByType('resource').length : 0;
+return [document.readyState, document.getElementsByTagName('*').length, length, resources];
+"""
+
+# Selenium passes arguments positionally, DevTools evaluates a function
+_SNAPSHOT_SCRIPT = "var selectors = arguments[0];" + _SNAPSHOT_BODY
+_SNAPSHOT_FUNCTION = "(selectors) => {" + _SNAPSHOT_BODY + "}"
+
+
+class _Readiness:
+    """
+    Decides from successive page snapshots whether the page is ready.
+
+    The page counts as stable once the element count, the target's text
+    length and the number of network resources stay the same for stable_for
+    seconds. If none of the selectors match, the wait gives up missing_grace
+    seconds after the document finished loading and stopped changing, so
+    pages that need the whole-page fallback do not burn the full timeout.
+    """
+
+    def __init__(self, timeout, stable_for, missing_grace):
+        self.timeout = timeout
+        self.stable_for = stable_for
+        self.missing_grace = missing_grace
+        self.deadline = time.time() + timeout
+        self.last_snapshot = None
+        self.stable_since = time.time()
+
+    def check(self, ready_state, elements, length, resources):
+        """
+        Returns True or False once the wait is over, None to keep polling
+        """
+        now = time.time()
+        snapshot = (elements, length, resources)
+        if snapshot != self.last_snapshot:
+            self.last_snapshot = snapshot
+            self.stable_since = now
+        quiet_for = now - self.stable_since
+
+        if ready_state != 'loading':
+            if length > 0 and quiet_for >= self.stable_for:
+                return True
+            if length < 0 and ready_state == 'complete' and quiet_for >= self.missing_grace:
+                return False
+
+        if now >= self.deadline:
+            print(f"Page not ready after {self.timeout}s, using what has rendered so far")
+            return length > 0
+        return None
+
+
+def wait_for_content(driver, selectors, timeout=20, stable_for=0.5, missing_grace=3.0, poll_interval=0.1):
+    """
+    Wait until one of the CSS selectors matches a non-empty element and the
+    page has stopped changing.
+
+    Returns True if a selector matched, False otherwise. Never raises on
+    timeout; the caller parses whatever has rendered so far.
+    """
+    readiness = _Readiness(timeout, stable_for, missing_grace)
+
+    while True:
+        try:
+            snapshot = driver.execute_script(_SNAPSHOT_SCRIPT, list(selectors))
+        except Exception:
+            # Page is navigating or the script was interrupted, try again
+            snapshot = ('loading', -1, -1, -1)
+
+        ready = readiness.check(*snapshot)
+        if ready is not None:
+            return ready
+
+        time.sleep(poll_interval)
+
+
+async def wait_for_content_async(page, selectors, timeout=20, stable_for=0.5, missing_grace=3.0, poll_interval=0.1):
+    """
+    wait_for_content for an async DevTools page, such as a Playwright Page
+    """
+    readiness = _Readiness(timeout, stable_for, missing_grace)
+
+    while True:
+        try:
+            snapshot = await page.evaluate(_SNAPSHOT_FUNCTION, list(selectors))
+        except Exception:
+            # Page is navigating or the script was interrupted, try again
+            snapshot = ('loading', -1, -1, -1)
+
+        ready = readiness.check(*snapshot)
+        if ready is not None:
+            return ready
+
+        await asyncio.sleep(poll_interval)
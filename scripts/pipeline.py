@@ -0,0 +1,158 @@
+"""
+Bounded producer/consumer pipeline for a comparison run
+
+Pairs flow through three stages connected by bounded queues:
+
+    fetch (N threads) -> compare (M threads) -> caller (report writer)
+
+Fetching and extraction wait on the network and the browser while the
+compare stage computes similarity and diff rows, so CPU work overlaps with
+network waits. The queues are bounded, so at most a few policies' texts are
+in memory at once however large the input is, and a slow report writer
+holds the fetchers back instead of letting results pile up.
+"""
+
+import queue
+import threading
+
+_DONE = object()
+
+
+def _put(q, item, stop):
+    """
+    Put onto a bounded queue, giving up once the pipeline is stopping;
+    returns whether the item was queued
+    """
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    """
+    Take from a queue, returning _DONE once the pipeline is stopping
+    """
+    while True:
+        try:
+            return q.get(timeout=0.5)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
+
+
+class Pipeline:
+    """
+    Runs fetch(idx, item) on fetch_workers threads and compare(idx, fetched)
+    on compare_workers threads, yielding (idx, result) tuples in completion
+    order.
+
+    An exception in any stage stops the pipeline and is re-raised to the
+    consumer; closing the iterator early, for example on Ctrl-C in the
+    report writer, stops the stages and waits for them to finish.
+    """
+
+    def __init__(self, fetch, compare, fetch_workers=1, compare_workers=1, queue_size=None):
+        self.fetch = fetch
+        self.compare = compare
+        self.fetch_workers = max(1, fetch_workers)
+        self.compare_workers = max(1, compare_workers)
+        self.queue_size = queue_size or 2 * max(self.fetch_workers, self.compare_workers)
+        self.stats = {
+            'fetched': 0,
+            'compared': 0,
+            'max_fetched_queued': 0,
+            'max_compared_queued': 0,
+        }
+
+    def run(self, items):
+        stop = threading.Event()
+        errors = []
+        lock = threading.Lock()
+        # Reading the input may block, e.g. while waiting for more work, so
+        # it has a lock of its own that the compare stage never needs
+        input_lock = threading.Lock()
+        pending = iter(enumerate(items))
+        fetched_q = queue.Queue(maxsize=self.queue_size)
+        compared_q = queue.Queue(maxsize=self.queue_size)
+        # Stages still running; the last thread of a stage out tells the next one
+        running = {'fetch': self.fetch_workers, 'compare': self.compare_workers}
+
+        def finish(stage, q, consumers):
+            with lock:
+                running[stage] -= 1
+                last = running[stage] == 0
+            if last:
+                for _ in range(consumers):
+                    _put(q, _DONE, stop)
+
+        def note_queued(stat, q):
+            with lock:
+                self.stats[stat] = max(self.stats[stat], q.qsize())
+
+        def fetch_stage():
+            try:
+                while not stop.is_set():
+                    with input_lock:
+                        item = next(pending, None)
+                    if item is None:
+                        break
+                    idx, value = item
+                    fetched = self.fetch(idx, value)
+                    if not _put(fetched_q, (idx, fetched), stop):
+                        break
+                    with lock:
+                        self.stats['fetched'] += 1
+                    note_queued('max_fetched_queued', fetched_q)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                finish('fetch', fetched_q, self.compare_workers)
+
+        def compare_stage():
+            try:
+                while True:
+                    item = _get(fetched_q, stop)
+                    if item is _DONE:
+                        break
+                    idx, fetched = item
+                    if not _put(compared_q, (idx, self.compare(idx, fetched)), stop):
+                        break
+                    with lock:
+                        self.stats['compared'] += 1
+                    note_queued('max_compared_queued', compared_q)
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                finish('compare', compared_q, 1)
+
+        threads = [threading.Thread(target=fetch_stage, name=f"fetch-{n}", daemon=True)
+                   for n in range(self.fetch_workers)]
+        threads += [threading.Thread(target=compare_stage, name=f"compare-{n}", daemon=True)
+                    for n in range(self.compare_workers)]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = _get(compared_q, stop)
+                if item is _DONE:
+                    break
+                yield item
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"Pipeline: {stats['fetched']} pairs fetched, {stats['compared']} compared, "
+              f"at most {stats['max_fetched_queued']} waiting for comparison and "
+              f"{stats['max_compared_queued']} waiting for the report")
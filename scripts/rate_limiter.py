@@ -0,0 +1,64 @@
+"""
+Per-host token bucket rate limiter
+
+Replaces the fixed sleep between fetches: a request only waits when its host
+has used up its burst allowance, and requests to different hosts never wait
+on each other.
+"""
+
+import threading
+import time
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host allowing `rate` requests per second with bursts of
+    up to `burst` requests. A rate of 0 disables throttling.
+    """
+
+    def __init__(self, rate=1.0, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'throttled': 0,
+            'wait_seconds': 0.0,
+        }
+
+    def acquire(self, url):
+        """
+        Block until a request to the URL's host is allowed and return the
+        number of seconds waited
+        """
+        host = urlparse(url).netloc.lower()
+
+        with self._lock:
+            self.stats['requests'] += 1
+            if self.rate <= 0:
+                return 0.0
+
+            now = time.time()
+            tokens, last = self._buckets.get(host, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+
+            # Reserve a token now, even if it only becomes available later,
+            # so concurrent callers queue up behind each other
+            tokens -= 1
+            self._buckets[host] = (tokens, now)
+            wait = -tokens / self.rate if tokens < 0 else 0.0
+
+            if wait > 0:
+                self.stats['throttled'] += 1
+                self.stats['wait_seconds'] += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def print_stats(self):
+        stats = self.stats
+        print(f"Rate limiter: {stats['requests']} requests, {stats['throttled']} throttled "
+              f"({stats['wait_seconds']:.2f}s total wait)")
@@ -0,0 +1,190 @@
+"""
+Streaming Excel writer for the comparison report
+
+Uses openpyxl's write-only mode, so rows go straight to a temporary file as
+each policy's diff is produced instead of building the whole report in
+memory. Styles are registered once as named styles and shared by every cell.
+A write-only workbook cannot be appended to, so the new report is saved to
+a temporary file first; only once that save succeeds is an existing report
+archived next to it and the new one moved into its place. Only the newest
+ARCHIVES_KEPT archives are kept.
+"""
+
+import glob
+import os
+import time
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle, PatternFill
+
+from diff_engine import MATCH, ONLY_IN_DESTINATION, ONLY_IN_SOURCE
+
+REPORT_HEADERS = ["Policy Number", "Source URL", "Destination URL", "Source Content",
+                  "Destination Content", "Status", "Similarity Score"]
+COLUMN_WIDTHS = {'A': 15, 'B': 60, 'C': 60, 'D': 80, 'E': 80, 'F': 20, 'G': 15}
+
+# Archived reports kept next to the report, newest first
+ARCHIVES_KEPT = 5
+
+
+def report_styles():
+    """
+    Named styles shared by every cell of the report; a NamedStyle binds to
+    a single workbook, so each writer builds its own set
+    """
+    return [
+        NamedStyle(name="report_bold", font=Font(bold=True)),
+        NamedStyle(name="report_match", fill=PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")),  # White
+        NamedStyle(name="report_source_only", fill=PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")),  # Light red
+        NamedStyle(name="report_dest_only", fill=PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")),  # Light green
+    ]
+
+
+def archive_existing_report(output_file, keep=ARCHIVES_KEPT):
+    """
+    Move an existing report aside so the new run gets a fresh file and
+    delete all but the newest `keep` archives; with keep=0 the report is
+    left to be replaced. Returns the archive path or None
+    """
+    if keep <= 0 or not os.path.exists(output_file):
+        return None
+    base, ext = os.path.splitext(output_file)
+    stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(os.path.getmtime(output_file)))
+    archive_path = f"{base}_{stamp}{ext}"
+    os.replace(output_file, archive_path)
+    print(f"Archived previous report to {archive_path}")
+
+    # The timestamps sort in time order
+    archives = sorted(glob.glob(f"{glob.escape(base)}_{'[0-9]' * 8}_{'[0-9]' * 6}{glob.escape(ext)}"))
+    for old in archives[:-keep]:
+        os.remove(old)
+        print(f"Removed old archived report {old}")
+    return archive_path
+
+
+def write_run_stats_sheet(wb, run_stats):
+    """
+    Write the counters of the latest run to the "Run Stats" sheet
+    """
+    if "Run Stats" in wb.sheetnames:
+        del wb["Run Stats"]
+    ws = wb.create_sheet("Run Stats")
+    ws.column_dimensions['A'].width = 30
+    ws.column_dimensions['B'].width = 15
+
+    header = []
+    for title in ("Statistic", "Value"):
+        cell = WriteOnlyCell(ws, title)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    ws.append(header)
+    for name, value in run_stats.items():
+        ws.append([name, round(value, 2) if isinstance(value, float) else value])
+
+
+class StreamingReportWriter:
+    """
+    Writes the comparison report one policy at a time
+    """
+
+    def __init__(self, output_file, keep_archives=None):
+        self.output_file = output_file
+        self.keep_archives = ARCHIVES_KEPT if keep_archives is None else keep_archives
+        self.rows_written = 0
+        self.policies_written = 0
+        self.started = time.time()
+
+        # Set when a write stopped midway, which leaves the write-only sheet unable to take more rows
+        self.interrupted = False
+
+        # Create the output directory if it doesn't exist
+        os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+
+        self.wb = openpyxl.Workbook(write_only=True)
+        for style in report_styles():
+            self.wb.add_named_style(style)
+        self.ws = self.wb.create_sheet("Policy Comparisons")
+
+        # Column widths must be set before the first row is written
+        for column, width in COLUMN_WIDTHS.items():
+            self.ws.column_dimensions[column].width = width
+        self.ws.append([self._cell(title, "report_bold") for title in REPORT_HEADERS])
+
+    def _cell(self, value, style):
+        cell = WriteOnlyCell(self.ws, value)
+        cell.style = style
+        return cell
+
+    def write_policy(self, result, diff_rows):
+        """
+        Append one policy's rows; diff_rows may be any iterable of
+        (status, source content, destination content)
+        """
+        try:
+            self._write_rows(result, diff_rows)
+        except BaseException:
+            self.interrupted = True
+            raise
+        self.policies_written += 1
+
+    def _write_rows(self, result, diff_rows):
+        policy_number = result['policy_number']
+        source_url = result['source_url']
+        dest_url = result['dest_url']
+        similarity = f"{result['similarity']:.2f}"
+
+        first = True
+        for status, source_content, dest_content in diff_rows:
+            # ✅ Repeat metadata in every row
+            row = [self._cell(policy_number, "report_bold") if first else policy_number, source_url, dest_url]
+
+            if status == MATCH:  # Line in both files
+                row += [self._cell(source_content, "report_match"), self._cell(dest_content, "report_match"), MATCH]
+            elif status == ONLY_IN_SOURCE:  # Line only in source
+                row += [self._cell(source_content, "report_source_only"), "", ONLY_IN_SOURCE]
+            elif status == ONLY_IN_DESTINATION:  # Line only in destination
+                row += ["", self._cell(dest_content, "report_dest_only"), ONLY_IN_DESTINATION]
+            else:
+                row += [None, None, None]
+
+            # Add similarity score only for the first row of this policy
+            if first:
+                row.append(similarity)
+                first = False
+
+            self.ws.append(row)
+            self.rows_written += 1
+
+        # Leave a blank row between policies
+        self.ws.append([])
+
+    def close(self, run_stats=None):
+        """
+        Add the legend and run stats and save the workbook, replacing the
+        previous report only once the new one is saved
+        """
+        # An interrupt inside openpyxl's append closes the sheet's row stream,
+        # so after an interrupted write the rows so far are saved without the legend
+        if not self.interrupted:
+            self.ws.append([])
+            self.ws.append([self._cell("Legend:", "report_bold")])
+            self.ws.append([self._cell("White", "report_match"), "Content matches in both"])
+            self.ws.append([self._cell("Light Red", "report_source_only"), "Content only in Source"])
+            self.ws.append([self._cell("Light Green", "report_dest_only"), "Content only in Destination"])
+
+        if run_stats:
+            write_run_stats_sheet(self.wb, run_stats)
+
+        tmp_path = f"{self.output_file}.tmp"
+        try:
+            self.wb.save(tmp_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        archive_existing_report(self.output_file, self.keep_archives)
+        os.replace(tmp_path, self.output_file)
+        elapsed = time.time() - self.started
+        print(f"Wrote {self.rows_written} rows for {self.policies_written} policies to {self.output_file} "
+              f"in {elapsed:.2f}s")
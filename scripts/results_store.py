@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+Indexed SQLite store of every run's results
+
+The Excel report shows one run; the store keeps them all. Every comparison
+run is a row of `runs`, and every policy it wrote a row of `results` with
+its URLs, similarity, error flag, the number of matching, source-only and
+destination-only report rows, and the SHA-256 hashes of both texts, indexed
+by policy number and run. Questions such as "which policies dropped below
+0.8 since last month" or "what changed since last week" are then a query
+instead of a trawl through old workbooks:
+
+    python3 scripts/results_store.py --store results/policy_comparisons_results.db runs
+    python3 scripts/results_store.py --store ... history 573
+    python3 scripts/results_store.py --store ... dropped 0.8 --since 2026-09-01
+    python3 scripts/results_store.py --store ... deltas --csv deltas.csv
+    python3 scripts/results_store.py --store ... render --output report.xlsx
+
+The report rows themselves are kept, zlib-compressed, for the last
+`keep_diffs` runs only, so `render` can rebuild their reports while the
+store stays small enough to carry from run to run; older runs keep their
+summary rows only.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from diff_engine import MATCH, ONLY_IN_DESTINATION, ONLY_IN_SOURCE, LineDiff
+from run_manifest import text_hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    finished TEXT,
+    output TEXT,
+    similarity_metric TEXT,
+    diff_mode TEXT,
+    run_stats TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    policy_number TEXT NOT NULL,
+    source_url TEXT NOT NULL,
+    dest_url TEXT NOT NULL,
+    similarity REAL,
+    error INTEGER NOT NULL DEFAULT 0,
+    matched INTEGER,
+    only_in_source INTEGER,
+    only_in_destination INTEGER,
+    source_hash TEXT,
+    dest_hash TEXT,
+    recorded TEXT NOT NULL,
+    diff BLOB
+);
+CREATE INDEX IF NOT EXISTS results_policy ON results (policy_number, run_id);
+CREATE INDEX IF NOT EXISTS results_run ON results (run_id, similarity);
+"""
+
+_RESULT_COLUMNS = ('run_id', 'policy_number', 'source_url', 'dest_url', 'similarity', 'error', 'matched',
+                   'only_in_source', 'only_in_destination', 'source_hash', 'dest_hash', 'recorded')
+
+
+def _now():
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class ResultsStore:
+    """
+    Runs and their per-policy results in a SQLite database; record() may
+    be called from any thread
+    """
+
+    def __init__(self, path, keep_diffs=4, batch_size=100):
+        self.path = path
+        self.keep_diffs = keep_diffs
+        self.batch_size = batch_size
+        self.run_id = None
+        self._lock = threading.Lock()
+        self._pending = []
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+        self.stats = {
+            'recorded': 0,
+        }
+
+    def start_run(self, output=None, similarity_metric=None, diff_mode=None):
+        with self._lock:
+            cursor = self._db.execute('INSERT INTO runs (started, output, similarity_metric, diff_mode) '
+                                      'VALUES (?, ?, ?, ?)', (_now(), output, similarity_metric, diff_mode))
+            self._db.commit()
+            self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def record(self, result, diff_rows):
+        """
+        Add a written result and its LineDiff to the current run; results
+        are committed a batch at a time
+        """
+        # The texts are rebuilt from the diff if the result no longer holds them
+        source_text = result.get('source_text')
+        dest_text = result.get('dest_text')
+        counts = diff_rows.counts()
+        row = (self.run_id, str(result['policy_number']), result['source_url'], result['dest_url'],
+               result['similarity'], int(bool(result.get('error'))), counts[MATCH], counts[ONLY_IN_SOURCE],
+               counts[ONLY_IN_DESTINATION],
+               text_hash(diff_rows.source_text() if source_text is None else source_text),
+               text_hash(diff_rows.dest_text() if dest_text is None else dest_text),
+               _now(), zlib.compress(json.dumps(diff_rows.to_json()).encode('utf-8')))
+        with self._lock:
+            self._pending.append(row)
+            self.stats['recorded'] += 1
+            if len(self._pending) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self._db.executemany(f"INSERT INTO results ({', '.join(_RESULT_COLUMNS)}, diff) "
+                                 f"VALUES ({', '.join('?' * (len(_RESULT_COLUMNS) + 1))})", self._pending)
+            self._db.commit()
+            self._pending = []
+
+    def finish_run(self, run_stats=None):
+        """
+        Commit the remaining results, store the run's stats and drop the
+        report rows of runs older than the last keep_diffs
+        """
+        with self._lock:
+            self._flush()
+            self._db.execute('UPDATE runs SET finished = ?, run_stats = ? WHERE id = ?',
+                             (_now(), json.dumps(run_stats or {}), self.run_id))
+            if self.keep_diffs:
+                self._db.execute('UPDATE results SET diff = NULL WHERE diff IS NOT NULL AND run_id NOT IN '
+                                 '(SELECT id FROM runs ORDER BY id DESC LIMIT ?)', (self.keep_diffs,))
+            self._db.commit()
+        print(f"Recorded {self.stats['recorded']} results as run {self.run_id} in {self.path}")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    def runs(self):
+        """
+        Every run, newest first, with its number of results and failures
+        """
+        return self._query('SELECT runs.id, started, finished, output, similarity_metric, '
+                           'COUNT(results.id) AS results, COALESCE(SUM(results.error), 0) AS errors, '
+                           'AVG(CASE WHEN results.error = 0 THEN results.similarity END) AS mean_similarity '
+                           'FROM runs LEFT JOIN results ON results.run_id = runs.id '
+                           'GROUP BY runs.id ORDER BY runs.id DESC')
+
+    def latest_run(self, before=None):
+        """
+        Id of the newest finished run, or of the newest one before run id
+        `before`; None if there is none
+        """
+        if before is None:
+            rows = self._query('SELECT MAX(id) AS id FROM runs WHERE finished IS NOT NULL')
+        else:
+            rows = self._query('SELECT MAX(id) AS id FROM runs WHERE finished IS NOT NULL AND id < ?', (before,))
+        return rows[0]['id']
+
+    def history(self, policy_number):
+        """
+        A policy's results in every run, oldest first
+        """
+        return self._query(f"SELECT runs.started, {', '.join(_RESULT_COLUMNS[:-1])} FROM results "
+                           'JOIN runs ON runs.id = results.run_id WHERE policy_number = ? ORDER BY run_id',
+                           (str(policy_number),))
+
+    def dropped(self, threshold, since):
+        """
+        Policies whose latest result since `since` (an ISO date) is below
+        threshold while their latest result before it was not
+        """
+        return self._query(
+            'WITH before AS (SELECT policy_number, source_url, dest_url, MAX(run_id) AS run_id FROM results '
+            '                JOIN runs ON runs.id = results.run_id WHERE runs.started < ? AND error = 0 '
+            '                GROUP BY policy_number, source_url, dest_url), '
+            '     after AS (SELECT policy_number, source_url, dest_url, MAX(run_id) AS run_id FROM results '
+            '               JOIN runs ON runs.id = results.run_id WHERE runs.started >= ? AND error = 0 '
+            '               GROUP BY policy_number, source_url, dest_url) '
+            'SELECT old.policy_number, old.source_url, old.dest_url, old.similarity AS previous, '
+            '       new.similarity AS current, new.run_id '
+            'FROM before JOIN after USING (policy_number, source_url, dest_url) '
+            'JOIN results old ON old.run_id = before.run_id AND old.policy_number = before.policy_number '
+            '                AND old.source_url = before.source_url AND old.dest_url = before.dest_url '
+            'JOIN results new ON new.run_id = after.run_id AND new.policy_number = after.policy_number '
+            '                AND new.source_url = after.source_url AND new.dest_url = after.dest_url '
+            'WHERE old.similarity >= ? AND new.similarity < ? ORDER BY new.similarity',
+            (since, since, threshold, threshold))
+
+    def deltas(self, run_id=None, previous_id=None):
+        """
+        Per-pair changes between two runs, by default the two newest: the
+        similarity before and after, which text changed, and pairs that
+        only one of the runs compared (None on the other side)
+        """
+        run_id = run_id or self.latest_run()
+        if run_id is None:
+            return None, None, []
+        previous_id = previous_id or self.latest_run(before=run_id)
+        columns = 'policy_number, source_url, dest_url, similarity, error, source_hash, dest_hash'
+        pairs = {}
+        for side, run in (('previous', previous_id), ('current', run_id)):
+            for row in self._query(f'SELECT {columns} FROM results WHERE run_id = ? ORDER BY id', (run,)):
+                key = (row['policy_number'], row['source_url'], row['dest_url'])
+                pairs.setdefault(key, {'previous': None, 'current': None})[side] = row
+
+        deltas = []
+        for (policy_number, source_url, dest_url), sides in pairs.items():
+            old, new = sides['previous'], sides['current']
+            deltas.append({
+                'policy_number': policy_number,
+                'source_url': source_url,
+                'dest_url': dest_url,
+                'previous': old['similarity'] if old else None,
+                'current': new['similarity'] if new else None,
+                'delta': new['similarity'] - old['similarity'] if old and new else None,
+                'source_changed': bool(old and new and old['source_hash'] != new['source_hash']),
+                'dest_changed': bool(old and new and old['dest_hash'] != new['dest_hash']),
+                'error': bool(new and new['error']),
+            })
+        return previous_id, run_id, deltas
+
+    def pruned_results(self, run_id):
+        """
+        Number of results of a run whose report rows were dropped
+        """
+        return self._query('SELECT COUNT(*) AS pruned FROM results WHERE run_id = ? AND diff IS NULL',
+                           (run_id,))[0]['pruned']
+
+    def iter_results(self, run_id):
+        """
+        Yield the stored results of a run, with their LineDiff as
+        'diff_rows', in the order they were written; raises ValueError on a
+        result whose rows were dropped, rather than yield it with no rows
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(f"SELECT id, {', '.join(_RESULT_COLUMNS)}, diff FROM results "
+                                        'WHERE run_id = ? AND id > ? ORDER BY id LIMIT 100',
+                                        (run_id, last_id)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                diff = row['diff']
+                if diff is None:
+                    raise ValueError(f"The report rows of policy {row['policy_number']} in run {run_id} "
+                                     "are no longer stored")
+                yield {
+                    'policy_number': row['policy_number'],
+                    'source_url': row['source_url'],
+                    'dest_url': row['dest_url'],
+                    'similarity': row['similarity'],
+                    'error': bool(row['error']),
+                    'diff_rows': LineDiff.from_json(json.loads(zlib.decompress(diff))),
+                }
+            last_id = rows[-1]['id']
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.close()
+
+
+def _format_similarity(value):
+    return f"{value:.3f}" if value is not None else '-'
+
+
+def main():
+    import argparse
+    import csv
+
+    parser = argparse.ArgumentParser(description='Query the results store kept by compare_urls.py')
+    parser.add_argument('--store', default='results/policy_comparisons_results.db',
+                        help='Results store written by compare_urls.py')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('runs', help='List the stored runs')
+    history_parser = subparsers.add_parser('history', help="A policy's similarity in every run")
+    history_parser.add_argument('policy_number')
+    dropped_parser = subparsers.add_parser('dropped', help='Policies that fell below a similarity since a date')
+    dropped_parser.add_argument('threshold', type=float)
+    dropped_parser.add_argument('--since', required=True,
+                                help='ISO date, e.g. 2026-09-01')
+    deltas_parser = subparsers.add_parser('deltas', help='Changes between two runs')
+    deltas_parser.add_argument('--run', type=int, default=None,
+                               help='Run to compare (default: the newest)')
+    deltas_parser.add_argument('--against', type=int, default=None,
+                               help='Run to compare it with (default: the one before it)')
+    deltas_parser.add_argument('--min-change', type=float, default=0.0,
+                               help='Only list pairs whose similarity moved by more than this, or whose text changed')
+    deltas_parser.add_argument('--csv', default=None,
+                               help='Also write the deltas to this CSV file')
+    render_parser = subparsers.add_parser('render', help='Write the Excel report of a stored run')
+    render_parser.add_argument('--run', type=int, default=None,
+                               help='Run to render (default: the newest)')
+    render_parser.add_argument('--output', required=True,
+                               help='Excel file to write')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        parser.error(f"No results store at {args.store}")
+    store = ResultsStore(args.store)
+    try:
+        if args.command == 'runs':
+            print(f"{'run':>5s}  {'started':19s}  {'results':>7s}  {'errors':>6s}  {'mean':>6s}  output")
+            for run in store.runs():
+                print(f"{run['id']:5d}  {run['started']:19s}  {run['results']:7d}  {run['errors']:6d}  "
+                      f"{_format_similarity(run['mean_similarity']):>6s}  {run['output'] or ''}")
+        elif args.command == 'history':
+            for row in store.history(args.policy_number):
+                changed = f"+{row['only_in_destination']} -{row['only_in_source']}" if not row['error'] else 'error'
+                print(f"run {row['run_id']:4d}  {row['started']}  {_format_similarity(row['similarity'])}  "
+                      f"{changed:>12s}  {row['dest_url']}")
+        elif args.command == 'dropped':
+            rows = store.dropped(args.threshold, args.since)
+            for row in rows:
+                print(f"Policy {row['policy_number']}: {row['previous']:.3f} -> {row['current']:.3f} "
+                      f"(run {row['run_id']})  {row['dest_url']}")
+            print(f"{len(rows)} policies dropped below {args.threshold} since {args.since}")
+        elif args.command == 'deltas':
+            previous_id, run_id, deltas = store.deltas(args.run, args.against)
+            if run_id is None or previous_id is None:
+                print("The store needs two finished runs to compare")
+                return
+            listed = [row for row in deltas
+                      if row['delta'] is None or abs(row['delta']) > args.min_change
+                      or row['source_changed'] or row['dest_changed']]
+            print(f"Run {run_id} against run {previous_id}: {len(listed)} of {len(deltas)} pairs changed")
+            for row in sorted(listed, key=lambda row: row['delta'] if row['delta'] is not None else -2):
+                delta = f"{row['delta']:+.3f}" if row['delta'] is not None else ('new' if row['previous'] is None
+                                                                                  else 'gone')
+                texts = ', '.join(side for side, changed in (('source', row['source_changed']),
+                                                             ('destination', row['dest_changed'])) if changed)
+                print(f"Policy {row['policy_number']:>8s}: {_format_similarity(row['previous']):>6s} -> "
+                      f"{_format_similarity(row['current']):>6s} {delta:>7s}"
+                      + (f"  {texts} text changed" if texts else ""))
+            if args.csv:
+                with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=list(deltas[0]) if deltas else ['policy_number'])
+                    writer.writeheader()
+                    writer.writerows(listed)
+                print(f"Deltas written to {args.csv}")
+        else:
+            run_id = args.run or store.latest_run()
+            if run_id is None:
+                parser.error("The store holds no finished run")
+            if store.pruned_results(run_id):
+                parser.error(f"The report rows of run {run_id} are no longer stored; only the newest "
+                             "runs keep them")
+            # Imported here so queries do not load the comparison stack
+            from compare_urls import write_streaming_report
+            write_streaming_report(store.iter_results(run_id), args.output)
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Append-only journal of each URL pair's progress through a run
+
+Every state change is appended to a JSONL file as soon as it happens:
+
+    pending  -> the pair is part of this run (or shard)
+    fetched  -> both pages were fetched, with the fetch time
+    compared -> similarity and diff rows are computed, with the compare time
+    written  -> the policy is in the report and in output/
+    failed   -> a page could not be fetched, with the error
+
+A run killed part way through, for example by a job timeout, can be
+restarted with --resume: pairs whose last state is 'written' are not
+fetched or compared again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+def pair_key(pair):
+    """
+    Identify a pair by its input row and both URLs, so an edited workbook
+    does not resume the wrong pair
+    """
+    return f"{pair.get('row', '')}|{pair['source_url']}|{pair['dest_url']}"
+
+
+def saved_name(policy_number, source_url, dest_url):
+    """
+    Name of a pair's files in output/ and its manifest entry: the policy
+    number and a hash of both URLs, so pairs of one policy with different
+    URLs, such as ?lob= variants, do not overwrite each other
+    """
+    digest = hashlib.sha256(f"{source_url}|{dest_url}".encode('utf-8')).hexdigest()
+    return f"{policy_number}_{digest[:12]}"
+
+
+def parse_shard(value):
+    """
+    Parse a "--shard i/n" value into (i, n) with 1 <= i <= n
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise ValueError(f"shard must look like i/n, got {value!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"shard index must be between 1 and {count}, got {value!r}")
+    return index, count
+
+
+def select_shard(url_pairs, shard):
+    """
+    Lazily yield the pairs of shard (i, n): every n-th input row starting
+    at row i - 1
+    """
+    index, count = shard
+    return (pair for row, pair in enumerate(url_pairs) if row % count == index - 1)
+
+
+class RunJournal:
+    """
+    JSONL file recording the latest state of every pair in a run
+    """
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self.states = {}
+        self.stats = {}
+
+        if resume and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut short when the previous run was killed
+                        continue
+                    self.states[record['pair']] = record['state']
+            done = sum(1 for state in self.states.values() if state == 'written')
+            print(f"Loaded journal with {len(self.states)} pairs from {path}, {done} already written")
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Without --resume the previous run's journal is replaced
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def is_done(self, pair):
+        return self.states.get(pair_key(pair)) == 'written'
+
+    def record(self, pair, state, **details):
+        """
+        Append a state change for a pair, with optional details such as
+        seconds or error
+        """
+        record = {'pair': pair_key(pair), 'state': state, 'time': round(time.time(), 3)}
+        record.update(details)
+        line = json.dumps(record)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.states[record['pair']] = state
+            self.stats[state] = self.stats.get(state, 0) + 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def print_stats(self):
+        counts = {}
+        for state in self.states.values():
+            counts[state] = counts.get(state, 0) + 1
+        summary = ', '.join(f"{count} {state}" for state, count in sorted(counts.items()))
+        print(f"Run journal {self.path}: {summary or 'no pairs'}")
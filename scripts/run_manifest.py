@@ -0,0 +1,99 @@
+"""
+Manifest of the previous run's results for incremental re-comparison
+
+For each pair, by policy number and URLs, the manifest keeps the URLs,
+content hashes, similarity score and report rows of the last comparison, the
+rows as a LineDiff. When a pair's source and destination text hash to the
+same values again and the run uses the same similarity metric, the previous
+result is carried forward instead of recomputing the similarity and diff.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from diff_engine import LineDiff
+from run_journal import saved_name
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class RunManifest:
+    """
+    JSON file mapping pairs, named by run_journal.saved_name, to their last
+    comparison
+    """
+
+    def __init__(self, path, similarity_metric='word_jaccard'):
+        self.path = path
+        self.similarity_metric = similarity_metric
+        self._lock = threading.Lock()
+        self.entries = {}
+        self.stats = {
+            'unchanged': 0,
+            'changed': 0,
+        }
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get('policies', {})
+                for entry in self.entries.values():
+                    if 'diff' in entry:
+                        entry['diff'] = LineDiff.from_json(entry['diff'])
+                    else:
+                        # Saved before rows were stored compactly
+                        entry['diff'] = LineDiff.from_rows(entry.pop('diff_rows'))
+                print(f"Loaded manifest with {len(self.entries)} policies from {path}")
+            except (OSError, ValueError) as e:
+                print(f"Error loading manifest {path}, comparing every policy: {str(e)}")
+
+    def lookup(self, policy_number, source_url, dest_url, source_text, dest_text):
+        """
+        Return the previous entry if this pair's content is unchanged, or None
+        """
+        entry = self.entries.get(saved_name(policy_number, source_url, dest_url))
+        unchanged = (entry is not None
+                     and entry['source_url'] == source_url
+                     and entry['dest_url'] == dest_url
+                     and entry.get('similarity_metric', 'word_jaccard') == self.similarity_metric
+                     and entry['source_hash'] == text_hash(source_text)
+                     and entry['dest_hash'] == text_hash(dest_text))
+        with self._lock:
+            self.stats['unchanged' if unchanged else 'changed'] += 1
+        return entry if unchanged else None
+
+    def record(self, result, diff_rows):
+        """
+        Remember a result and its LineDiff for the next run
+        """
+        if result.get('error'):
+            return
+        # The texts are rebuilt from the diff if the result no longer holds them
+        source_text = result.get('source_text')
+        dest_text = result.get('dest_text')
+        entry = {
+            'source_url': result['source_url'],
+            'dest_url': result['dest_url'],
+            'source_hash': text_hash(diff_rows.source_text() if source_text is None else source_text),
+            'dest_hash': text_hash(diff_rows.dest_text() if dest_text is None else dest_text),
+            'similarity': result['similarity'],
+            'similarity_metric': self.similarity_metric,
+            'diff': diff_rows,
+        }
+        with self._lock:
+            self.entries[saved_name(result['policy_number'], result['source_url'], result['dest_url'])] = entry
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'policies': self.entries}, f, default=LineDiff.to_json)
+        os.replace(tmp_path, self.path)
+        print(f"Manifest saved to {self.path}")
+
+    def print_stats(self):
+        print(f"Incremental mode: {self.stats['unchanged']} unchanged policies carried forward, "
+              f"{self.stats['changed']} recompared")
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Similarity metrics for policy text pairs
+
+Every text is tokenized once into its words and, when the metrics need them,
+its 3-word shingles and lines; these metrics are computed from the tokens:
+
+  - word_jaccard: shared unique words over all unique words (the original
+    "Simple similarity score")
+  - shingle_jaccard: the same over 3-word shingles, so reordered or reworded
+    sentences count as changes
+  - tfidf_cosine: cosine of the TF-IDF word vectors, which weighs rare
+    policy-specific terms above boilerplate
+  - line_ratio: share of lines found in both texts, 2 * matching lines over
+    the lines of both
+
+score_pair() scores one pair in pure Python; the pipeline uses it for every
+compared pair, with the IDF taken over that pair. score_pairs() and
+best_matches() work offline on the texts of a finished run, with the IDF
+taken over the whole corpus: they put the tokens of every text into SciPy sparse matrices over a
+shared vocabulary and compute the scores with a few matrix operations.
+best_matches() finds the most similar destination texts for each source text
+(for rows whose URLs point at the wrong policy) with one sparse matrix
+product per chunk of sources, not a Python loop over every combination.
+
+NumPy and SciPy are optional; without them score_pairs() computes the
+TF-IDF cosine in pure Python and best_matches() is unavailable.
+
+Run on the texts a comparison run saved in output/:
+
+    python3 scripts/similarity.py --metrics all --match
+"""
+
+import math
+import os
+import re
+from collections import Counter, namedtuple
+from itertools import chain
+
+# NumPy and SciPy are optional and only imported by the batch functions
+np = sparse = None
+
+SIMILARITY_METRICS = ('word_jaccard', 'shingle_jaccard', 'tfidf_cosine', 'line_ratio')
+MATCH_METRICS = ('word_jaccard', 'shingle_jaccard', 'tfidf_cosine')
+SHINGLE_SIZE = 3
+
+Tokens = namedtuple('Tokens', ['words', 'shingles', 'lines'])
+
+
+def tokenize(text, metrics=SIMILARITY_METRICS):
+    """
+    Word counts of a text, plus its 3-word shingles and line counts if
+    `metrics` need them (None otherwise)
+    """
+    if isinstance(text, Tokens):
+        return text
+    words = text.lower().split()
+    shingles = lines = None
+    if 'shingle_jaccard' in metrics:
+        # Joined into strings, which cache their hash, rather than kept as tuples
+        shingles = set(map(' '.join, zip(*(words[i:] for i in range(SHINGLE_SIZE)))))
+    if 'line_ratio' in metrics:
+        lines = Counter(line.strip() for line in text.splitlines() if line.strip())
+    return Tokens(Counter(words), shingles, lines)
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator else 0.0
+
+
+def _jaccard(a, b):
+    common = len(a.keys() & b.keys()) if isinstance(a, Counter) else len(a & b)
+    return _ratio(common, len(a) + len(b) - common)
+
+
+def _idf(document_frequency, documents):
+    # Smoothed IDF, as in scikit-learn's TfidfVectorizer
+    return math.log((1 + documents) / (1 + document_frequency)) + 1
+
+
+def _tfidf_cosine(a, b, idf):
+    weights_a = {term: count * idf(term) for term, count in a.items()}
+    weights_b = {term: count * idf(term) for term, count in b.items()}
+    dot = sum(weight * weights_b[term] for term, weight in weights_a.items() if term in weights_b)
+    norm_a = math.sqrt(sum(weight * weight for weight in weights_a.values()))
+    norm_b = math.sqrt(sum(weight * weight for weight in weights_b.values()))
+    return _ratio(dot, norm_a * norm_b)
+
+
+def score_pair(source, dest, metrics=('word_jaccard',)):
+    """
+    Scores of one source/destination pair as {metric: score}; source and
+    dest are texts or Tokens with the features of `metrics`, and the TF-IDF
+    weights use the pair's own IDF
+    """
+    source, dest = tokenize(source, metrics), tokenize(dest, metrics)
+    scores = {}
+    for metric in metrics:
+        if metric == 'word_jaccard':
+            scores[metric] = _jaccard(source.words, dest.words)
+        elif metric == 'shingle_jaccard':
+            scores[metric] = _jaccard(source.shingles, dest.shingles)
+        elif metric == 'tfidf_cosine':
+            idf = lambda term: _idf((term in source.words) + (term in dest.words), 2)
+            scores[metric] = _tfidf_cosine(source.words, dest.words, idf)
+        elif metric == 'line_ratio':
+            common = sum((source.lines & dest.lines).values())
+            scores[metric] = _ratio(2 * common, sum(source.lines.values()) + sum(dest.lines.values()))
+        else:
+            raise ValueError(f"Unknown similarity metric: {metric}")
+    return scores
+
+
+def _load_scipy():
+    """
+    Import NumPy and SciPy on first use, so scoring single pairs never pays
+    for them; returns whether they are installed
+    """
+    global np, sparse
+    if sparse is None:
+        try:
+            import numpy as np
+            from scipy import sparse
+        except ImportError:  # pragma: no cover - NumPy and SciPy are optional
+            return False
+    return True
+
+
+def _require_scipy():
+    if not _load_scipy():
+        raise RuntimeError("Batch similarity needs NumPy and SciPy: pip install numpy scipy")
+
+
+def _count_matrices(*groups):
+    """
+    One sparse count matrix per group of Counters or sets, all over a
+    shared vocabulary
+    """
+    # Flattened with C-level iteration; only unique terms are numbered in Python
+    terms = [list(chain.from_iterable(documents)) for documents in groups]
+    vocabulary = {term: i for i, term in enumerate(dict.fromkeys(chain.from_iterable(terms)))}
+    matrices = []
+    for documents, group_terms in zip(groups, terms):
+        indptr = np.concatenate(([0], np.cumsum([len(document) for document in documents], dtype=np.int64)))
+        indices = np.fromiter(map(vocabulary.__getitem__, group_terms), dtype=np.int64, count=len(group_terms))
+        if documents and isinstance(documents[0], Counter):
+            data = np.fromiter(chain.from_iterable(document.values() for document in documents),
+                               dtype=np.float64, count=len(group_terms))
+        else:
+            data = np.ones(len(group_terms))
+        matrices.append(sparse.csr_matrix((data, indices, indptr), shape=(len(documents), len(vocabulary))))
+    return matrices
+
+
+def _binary(matrix):
+    matrix = matrix.copy()
+    matrix.data[:] = 1.0
+    return matrix
+
+
+def _row_sums(matrix):
+    return np.asarray(matrix.sum(axis=1)).ravel()
+
+
+def _divide(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=np.float64), where=denominator > 0)
+
+
+def _tfidf_rows(*matrices):
+    """
+    L2-normalized TF-IDF rows of count matrices, with the IDF taken over
+    the rows of all of them
+    """
+    documents = sum(matrix.shape[0] for matrix in matrices)
+    document_frequency = sum(np.bincount(matrix.indices, minlength=matrix.shape[1]) for matrix in matrices)
+    idf = np.log((1 + documents) / (1 + document_frequency)) + 1
+    normalized = []
+    for matrix in matrices:
+        weighted = sparse.csr_matrix(matrix.multiply(idf[np.newaxis, :]))
+        norms = np.sqrt(_row_sums(weighted.multiply(weighted)))
+        normalized.append(sparse.diags(_divide(np.ones_like(norms), norms)) @ weighted)
+    return normalized
+
+
+def _feature(metric):
+    return 'shingles' if metric == 'shingle_jaccard' else 'lines' if metric == 'line_ratio' else 'words'
+
+
+def score_pairs(sources, dests, metrics=('word_jaccard',)):
+    """
+    Scores of source[i] against dest[i] for every i, as one {metric: score}
+    per pair; TF-IDF weights use the IDF of all the texts
+
+    The Jaccard and line metrics of aligned pairs are set operations that
+    already run in C, and numbering every shingle of the corpus for a sparse
+    matrix costs more than they do, so only the TF-IDF cosine, which needs
+    corpus-wide weights, is computed on sparse matrices.
+    """
+    for metric in metrics:
+        if metric not in SIMILARITY_METRICS:
+            raise ValueError(f"Unknown similarity metric: {metric}")
+    sources = [tokenize(text, metrics) for text in sources]
+    dests = [tokenize(text, metrics) for text in dests]
+
+    results = [score_pair(source, dest, [metric for metric in metrics if metric != 'tfidf_cosine'])
+               for source, dest in zip(sources, dests)]
+    if 'tfidf_cosine' in metrics:
+        for scores, cosine in zip(results, _tfidf_cosines(sources, dests)):
+            scores['tfidf_cosine'] = cosine
+    return [{metric: scores[metric] for metric in metrics} for scores in results]
+
+
+def _tfidf_cosines(sources, dests):
+    if not _load_scipy():
+        document_frequency = Counter()
+        for tokens in sources + dests:
+            document_frequency.update(tokens.words.keys())
+        documents = len(sources) + len(dests)
+        idf = lambda term: _idf(document_frequency[term], documents)
+        return [_tfidf_cosine(source.words, dest.words, idf) for source, dest in zip(sources, dests)]
+
+    source_matrix, dest_matrix = _tfidf_rows(*_count_matrices([tokens.words for tokens in sources],
+                                                              [tokens.words for tokens in dests]))
+    return [float(cosine) for cosine in _row_sums(source_matrix.multiply(dest_matrix))]
+
+
+def best_matches(sources, dests, metric='tfidf_cosine', top=1, chunk_size=512):
+    """
+    For every source, the `top` most similar dests as a list of
+    (dest index, score), best first
+
+    Sources are compared against every dest with one sparse matrix product
+    per chunk of chunk_size sources, so memory stays at chunk_size x
+    len(dests) scores.
+    """
+    _require_scipy()
+    if metric not in MATCH_METRICS:
+        raise ValueError(f"Best matches support {', '.join(MATCH_METRICS)}, not {metric}")
+    sources = [tokenize(text, [metric]) for text in sources]
+    dests = [tokenize(text, [metric]) for text in dests]
+    if not sources or not dests:
+        return [[] for _ in sources]
+    top = max(1, min(top, len(dests)))
+
+    feature = _feature(metric)
+    source_matrix, dest_matrix = _count_matrices([getattr(tokens, feature) for tokens in sources],
+                                                 [getattr(tokens, feature) for tokens in dests])
+    if metric == 'tfidf_cosine':
+        source_matrix, dest_matrix = _tfidf_rows(source_matrix, dest_matrix)
+    else:
+        source_matrix, dest_matrix = _binary(source_matrix), _binary(dest_matrix)
+        source_sizes = np.diff(source_matrix.indptr)
+        dest_sizes = np.diff(dest_matrix.indptr)
+    dest_columns = dest_matrix.T.tocsc()
+
+    matches = []
+    for start in range(0, len(sources), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        scores = (source_matrix[chunk] @ dest_columns).toarray()
+        if metric != 'tfidf_cosine':
+            union = source_sizes[chunk, np.newaxis] + dest_sizes[np.newaxis, :] - scores
+            scores = _divide(scores, union)
+        best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+        for row, candidates in enumerate(best):
+            ranked = sorted(candidates, key=lambda col: -scores[row, col])
+            matches.append([(int(col), float(scores[row, col])) for col in ranked])
+    return matches
+
+
+def read_saved_texts(output_dir, name):
+    """
+    The (source text, destination text) a comparison run saved for a pair
+    as source_<name>.txt and dest_<name>.txt, name being the policy number
+    and a hash of the URLs (run_journal.saved_name), or None if either is
+    missing or the pair failed to fetch
+    """
+    texts = []
+    for kind in ('source', 'dest'):
+        try:
+            with open(os.path.join(output_dir, f"{kind}_{name}.txt"), 'r', encoding='utf-8') as f:
+                texts.append(f.read())
+        except OSError:
+            return None
+    # Pairs that failed to fetch saved their error messages
+    if texts[0].startswith("Error") or texts[1].startswith("Error"):
+        return None
+    return tuple(texts)
+
+
+def iter_saved_texts(output_dir='output'):
+    """
+    Yield (saved name, policy number, source text, destination text) for
+    every pair a comparison run saved, one pair at a time, leaving out pairs
+    that failed to fetch
+    """
+    for file_name in sorted(os.listdir(output_dir)):
+        match = re.fullmatch(r'source_(([^_]+)(?:_[0-9a-f]+)?)\.txt', file_name)
+        texts = read_saved_texts(output_dir, match.group(1)) if match else None
+        if texts:
+            yield match.group(1, 2) + texts
+
+
+def load_saved_texts(output_dir='output'):
+    """
+    The texts iter_saved_texts yields, as {saved name: (source text,
+    destination text)}
+    """
+    return {name: (source_text, dest_text) for name, _, source_text, dest_text in iter_saved_texts(output_dir)}
+
+
+def main():
+    import argparse
+    import csv
+    import time
+
+    parser = argparse.ArgumentParser(description='Score the texts saved by a comparison run with several similarity metrics')
+    parser.add_argument('--output-dir', default='output',
+                        help='Directory holding the source_<name>.txt and dest_<name>.txt files of a run')
+    parser.add_argument('--metrics', default='all',
+                        help=f"Comma-separated metrics out of {', '.join(SIMILARITY_METRICS)}, or all")
+    parser.add_argument('--match', action='store_true',
+                        help='Find the most similar destination for each source and list the policies '
+                             'whose paired destination is not the best match')
+    parser.add_argument('--match-metric', choices=MATCH_METRICS, default='tfidf_cosine',
+                        help='Metric used by --match')
+    parser.add_argument('--top', type=int, default=1,
+                        help='Destinations listed per source by --match')
+    parser.add_argument('--csv', default=None,
+                        help='Also write the scores to this CSV file')
+    args = parser.parse_args()
+
+    metrics = SIMILARITY_METRICS if args.metrics == 'all' else tuple(args.metrics.split(','))
+    texts = load_saved_texts(args.output_dir)
+    if not texts:
+        print(f"No saved source/destination texts in {args.output_dir}")
+        return
+    policies = list(texts)
+
+    start = time.perf_counter()
+    features = metrics + ((args.match_metric,) if args.match else ())
+    sources = [tokenize(texts[policy][0], features) for policy in policies]
+    dests = [tokenize(texts[policy][1], features) for policy in policies]
+    scores = score_pairs(sources, dests, metrics)
+    print(f"Scored {len(policies)} policies with {len(metrics)} metrics in {time.perf_counter() - start:.2f}s")
+    print("Policy          " + "".join(f"{metric:>17s}" for metric in metrics))
+    for policy, policy_scores in zip(policies, scores):
+        print(f"{policy:16s}" + "".join(f"{policy_scores[metric]:17.3f}" for metric in metrics))
+
+    rows = [[policy] + [f"{policy_scores[metric]:.4f}" for metric in metrics]
+            for policy, policy_scores in zip(policies, scores)]
+    header = ['policy_number'] + list(metrics)
+    if args.match:
+        start = time.perf_counter()
+        matches = best_matches(sources, dests, args.match_metric, args.top)
+        print(f"\nMatched {len(policies)} sources against {len(policies)} destinations by {args.match_metric} "
+              f"in {time.perf_counter() - start:.2f}s")
+        mismatched = 0
+        for i, (policy, candidates) in enumerate(zip(policies, matches)):
+            if candidates[0][0] != i:
+                mismatched += 1
+                listed = ', '.join(f"{policies[col]} ({score:.3f})" for col, score in candidates)
+                own = next((score for col, score in candidates if col == i), None)
+                print(f"Policy {policy}: best destination match is {listed}"
+                      + (f", its own destination scores {own:.3f}" if own is not None else ""))
+            rows[i] += [' '.join(policies[col] for col, _ in candidates),
+                        ' '.join(f"{score:.4f}" for _, score in candidates)]
+        header += ['best_match', 'best_match_score']
+        print(f"{mismatched} of {len(policies)} sources match another policy's destination best")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+        print(f"Scores written to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Per-stage timing spans and profiling for a comparison run
+
+Each timed step of a pair is recorded as a span: one JSON line with the
+stage, its duration and the policy number and host it ran for, e.g.
+
+    {"stage": "page_load", "seconds": 2.4183, "policy": "573", "host": "al-policies.exploremyplan.com"}
+
+The stages are:
+
+    pair_fetch      both pages of a pair, including waits for the rate limiter
+    rate_limit_wait waiting for the host's rate limiter
+    driver_startup  starting a Chrome driver or the DevTools Chromium
+    http_fetch      a plain HTTP request
+    page_load       loading a page in the browser
+    ready_wait      waiting for the policy container to render
+    html_parse      parsing the HTML with lxml or BeautifulSoup
+    extraction      extracting the policy text, parse included
+    pair_compare    similarity and diff of a pair
+    similarity      the similarity score
+    diff            the line diff behind the report rows
+    report_write    writing a policy's rows to the report
+    report_save     saving the report
+
+Worker processes of the CPU pool append to the same file, so summarize()
+reads every span back from it at the end of the run and computes the
+count, total, p50, p95 and max per stage.
+
+Timing is off until start() is called and span() does nothing until then,
+so code can be instrumented unconditionally.
+"""
+
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+_state = {'path': None, 'file': None, 'lock': threading.Lock()}
+_local = threading.local()
+
+
+def start(path, append=False):
+    """
+    Record spans to a JSON lines file, replacing it unless append is set
+    """
+    stop()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    _state['path'] = path
+    if not append:
+        open(path, 'w').close()
+    # Every process appends, line buffered, so each span is one atomic write
+    _state['file'] = open(path, 'a', encoding='utf-8', buffering=1)
+    # A lock inherited from a forking parent may be held, so always take a fresh one
+    _state['lock'] = threading.Lock()
+
+
+def start_worker(path):
+    """
+    ProcessPoolExecutor initializer that makes a worker process append its
+    spans to the parent's file
+    """
+    if path:
+        start(path, append=True)
+
+
+def stop():
+    if _state['file'] is not None:
+        _state['file'].close()
+    _state['file'] = None
+
+
+def path():
+    """
+    The file spans are recorded to, or None when timing is off
+    """
+    return _state['path'] if _state['file'] is not None else None
+
+
+def current_tags():
+    return dict(getattr(_local, 'tags', {}))
+
+
+@contextmanager
+def tagged(**tags):
+    """
+    Add tags, such as the policy number, to every span this thread records
+    inside the block
+    """
+    previous = getattr(_local, 'tags', {})
+    _local.tags = {**previous, **{name: value for name, value in tags.items() if value is not None}}
+    try:
+        yield
+    finally:
+        _local.tags = previous
+
+
+def record(stage, seconds, url=None, error=False, **tags):
+    """
+    Record one span; url adds a host tag
+    """
+    f = _state['file']
+    if f is None:
+        return
+    entry = {'stage': stage, 'seconds': round(seconds, 4)}
+    entry.update(current_tags())
+    entry.update(tags)
+    if url:
+        entry['host'] = urlsplit(url).netloc
+    if error:
+        entry['error'] = True
+    line = json.dumps(entry) + '\n'
+    with _state['lock']:
+        f.write(line)
+
+
+@contextmanager
+def span(stage, url=None, **tags):
+    """
+    Time the block as one span of `stage`; spans of blocks that raise are
+    marked with an error tag
+    """
+    if _state['file'] is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        record(stage, time.perf_counter() - start_time, url, error, **tags)
+
+
+def _percentile(ordered, fraction):
+    # Nearest rank
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(spans_path):
+    """
+    Count, total, p50, p95 and max seconds per stage of a spans file
+    """
+    durations = {}
+    errors = {}
+    with open(spans_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            durations.setdefault(entry['stage'], []).append(entry['seconds'])
+            if entry.get('error'):
+                errors[entry['stage']] = errors.get(entry['stage'], 0) + 1
+
+    summary = {}
+    for stage, seconds in durations.items():
+        seconds.sort()
+        summary[stage] = {
+            'count': len(seconds),
+            'errors': errors.get(stage, 0),
+            'total': round(sum(seconds), 3),
+            'p50': _percentile(seconds, 0.50),
+            'p95': _percentile(seconds, 0.95),
+            'max': seconds[-1],
+        }
+    return summary
+
+
+def load_summary(summary_path):
+    """
+    A summary written by save_summary, or None
+    """
+    try:
+        with open(summary_path, 'r', encoding='utf-8') as f:
+            return json.load(f)['stages']
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def save_summary(summary, summary_path):
+    tmp_path = f"{summary_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'stages': summary}, f, indent=2)
+    os.replace(tmp_path, summary_path)
+    print(f"Timing summary saved to {summary_path}")
+
+
+def print_summary(summary):
+    print("Stage timings (seconds):")
+    print(f"  {'stage':16s} {'count':>7s} {'total':>10s} {'p50':>8s} {'p95':>8s} {'max':>8s}")
+    for stage, stats in sorted(summary.items(), key=lambda item: -item[1]['total']):
+        errors = f"  {stats['errors']} failed" if stats['errors'] else ""
+        print(f"  {stage:16s} {stats['count']:7d} {stats['total']:10.2f} {stats['p50']:8.3f} "
+              f"{stats['p95']:8.3f} {stats['max']:8.3f}{errors}")
+
+
+def regressions(summary, baseline, threshold=0.25, min_seconds=0.05):
+    """
+    Stages whose p95 grew by more than threshold over the baseline's, as
+    (stage, baseline p95, p95); stages faster than min_seconds are ignored
+    """
+    slower = []
+    for stage, stats in summary.items():
+        before = (baseline or {}).get(stage)
+        if before and stats['p95'] >= min_seconds and stats['p95'] > before['p95'] * (1 + threshold):
+            slower.append((stage, before['p95'], stats['p95']))
+    return slower
+
+
+@contextmanager
+def profiled(output_path, top=25):
+    """
+    Profile the block with cProfile, threads included, then save the
+    stats to output_path for pstats or snakeviz and print the top entries
+    by cumulative time. Work done in CPU pool processes is not profiled.
+    """
+    profiles = [cProfile.Profile()]
+    per_thread = sys.version_info < (3, 12)
+    if per_thread:
+        # Before 3.12 a profiler only sees the thread that enabled it, so
+        # every thread started from here on enables one of its own
+        lock = threading.Lock()
+
+        def profile_thread(frame, event, arg):
+            profiler = cProfile.Profile()
+            with lock:
+                profiles.append(profiler)
+            profiler.enable()
+
+        threading.setprofile(profile_thread)
+    profiles[0].enable()
+    try:
+        yield
+    finally:
+        profiles[0].disable()
+        if per_thread:
+            threading.setprofile(None)
+        output = io.StringIO()
+        stats = pstats.Stats(profiles[0], stream=output)
+        for profiler in profiles[1:]:
+            stats.add(profiler)
+        stats.dump_stats(output_path)
+        stats.sort_stats('cumulative').print_stats(top)
+        print(output.getvalue())
+        print(f"Profile of {len(profiles)} threads saved to {output_path}")
@@ -2,13 +2,108 @@
 """
 Generate Policy Comparison XLSX Test Data
 This script generates a test XLSX file with 100 policy entries for website comparison
+With --base-url every entry is a distinct policy served by fixture_server.py
 """
 
+import random
+
 import openpyxl
 from openpyxl.styles import Font
 
-def generate_policy_comparison_data(output_file="policy_comparison_data.xlsx", count=100):
-    """Generate XLSX file with policy comparison data"""
+POLICY_SECTIONS = ["Description", "Policy", "Policy Guidelines", "Key Points", "Coding", "References", "Policy History"]
+
+POLICY_WORDS = [
+    "coverage", "criteria", "patient", "treatment", "therapy", "medically", "necessary", "investigational",
+    "clinical", "evidence", "outcomes", "trial", "diagnosis", "procedure", "device", "surgery", "dose",
+    "imaging", "genetic", "testing", "benefit", "member", "plan", "provider", "documentation", "indication",
+    "contraindication", "guideline", "study", "randomized", "population", "follow-up", "months", "adult",
+]
+
+# Short lines that repeat throughout real policies, e.g. in coverage tables
+REPEATED_LINES = ["Yes", "No", "Not applicable", "Medically necessary", "Investigational"]
+
+def generate_policy_text(policy_num, line_count=300, seed=None):
+    """Generate synthetic policy text with headed sections and table-like repeated lines"""
+    rng = random.Random(seed if seed is not None else policy_num)
+    lines = [f"Medical Policy {policy_num}"]
+    per_section = max(1, line_count // len(POLICY_SECTIONS))
+    
+    for section in POLICY_SECTIONS:
+        lines.append(section)
+        for i in range(per_section):
+            if rng.random() < 0.15:
+                lines.append(rng.choice(REPEATED_LINES))
+            else:
+                words = rng.sample(POLICY_WORDS, rng.randint(6, 14))
+                lines.append(f"{' '.join(words).capitalize()} ({policy_num}.{len(lines)}).")
+    
+    return '\n'.join(lines)
+
+def mutate_policy_text(text, rate=0.02, seed=None):
+    """Randomly edit, delete and insert about `rate` of the lines of a policy text,
+    occasionally rewriting a whole block of lines the way a revised table would be"""
+    rng = random.Random(seed)
+    lines = []
+    rewrite_left = 0
+    for idx, line in enumerate(text.split('\n')):
+        if rewrite_left:
+            rewrite_left -= 1
+            lines.append(line.replace(' ', '  ', 1) + " (rewritten)")
+            continue
+        roll = rng.random()
+        if roll < rate / 50:
+            rewrite_left = rng.randint(50, 200)
+            lines.append(line)
+        elif roll < rate / 3:
+            continue  # Deleted line
+        elif roll < 2 * rate / 3:
+            lines.append(line + " (revised)")  # Edited line
+        elif roll < rate:
+            lines.append(line)
+            lines.append(f"Added guidance for {rng.choice(POLICY_WORDS)} ({idx}).")  # Inserted line
+        else:
+            lines.append(line)
+    return '\n'.join(lines)
+
+def generate_policy_page(policy_num, kind='source', line_count=300, seed=None, text=None):
+    """Wrap a synthetic policy, or the given policy text, in page markup like the
+    source or destination site, with navigation, scripts, comments, entities and
+    print-only elements around and inside the policy container"""
+    rng = random.Random(seed if seed is not None else policy_num)
+    body = []
+    if text is None:
+        text = generate_policy_text(policy_num, line_count, seed)
+    for line in text.split('\n'):
+        if line in POLICY_SECTIONS:
+            body.append(f"<h2 id=\"{line.lower().replace(' ', '-')}\">{line}</h2>")
+        elif rng.random() < 0.05:
+            body.append(f"<table><tr><td>{line}</td><td> &nbsp;</td><td>{rng.choice(REPEATED_LINES)} &amp; more</td></tr></table>")
+        elif rng.random() < 0.05:
+            body.append(f"<ul>\n  <li><a href=\"#ref-{len(body)}\">{line}</a></li>\n  <li><b>Note:</b> see <i>references</i></li>\n</ul>")
+        elif rng.random() < 0.03:
+            body.append(f"<p>{line}<!-- reviewed --><br>\n<span>  </span></p>")
+        else:
+            body.append(f"<p>{line}</p>")
+        if rng.random() < 0.01:
+            body.append(f"<div class=\"hidden-print\">Print this page</div><script>track({len(body)});</script>")
+    content = '\n'.join(body)
+    
+    head = ("<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>Medical Policy</title>"
+            "<style>body { font-family: sans-serif; }</style>"
+            "<script>window.dataLayer = [];</script></head>\n<body>\n"
+            "<header><nav><a href=\"/\">Home</a> | <a href=\"/policies\">Policies</a></nav></header>\n")
+    if kind == 'source':
+        page = (f"<div class=\"portlet-body\"><div class=\"journal-content-article clearfix\" data-id=\"{policy_num}\">\n"
+                f"<a class=\"hidden-print\" href=\"#print\">Print</a>\n{content}\n</div></div>")
+    else:
+        page = (f"<main id=\"content\"><div class=\"breadcrumbs\">Policies</div>\n"
+                f"<div class=\"contentWrapper\">\n<noscript>Enable JavaScript</noscript>\n{content}\n</div>\n"
+                f"<div class=\"contentWrapper related\"><h3>Related policies</h3><p>Policy {policy_num + 1}</p></div></main>")
+    return f"{head}{page}\n<footer>&copy; Health plan</footer>\n<script>init();</script>\n</body></html>"
+
+def generate_policy_comparison_data(output_file="policy_comparison_data.xlsx", count=100, base_url=None, start=1):
+    """Generate XLSX file with policy comparison data; with a base_url, such as
+    a fixture_server.py address, each row is a distinct policy numbered from start"""
     print(f"Generating {count} policy comparison entries...")
     
     # Create a new workbook and select active worksheet
@@ -28,8 +123,13 @@ def generate_policy_comparison_data(output_file="policy_comparison_data.xlsx", c
         row = i + 2  # Start at row 2 after headers
         
         # Create the URLs based on the policy number
-        source_url = f"https://al-policies.exploremyplan.com/portal/web/medical-policies/-/mp-{policy_num}"
-        dest_url = f"https://stage-us-mypolicies.itilitihealth.us/policy/938125692074/{policy_num}?lob=BCBS+AL"
+        if base_url:
+            policy_num = start + i
+            source_url = f"{base_url}/portal/web/medical-policies/-/mp-{policy_num}"
+            dest_url = f"{base_url}/policy/938125692074/{policy_num}?lob=BCBS+AL"
+        else:
+            source_url = f"https://al-policies.exploremyplan.com/portal/web/medical-policies/-/mp-{policy_num}"
+            dest_url = f"https://stage-us-mypolicies.itilitihealth.us/policy/938125692074/{policy_num}?lob=BCBS+AL"
         
         # Add data to the worksheet
         ws.cell(row=row, column=1, value=source_url)
@@ -42,7 +142,10 @@ def generate_policy_comparison_data(output_file="policy_comparison_data.xlsx", c
     # Save the workbook
     wb.save(output_file)
     print(f"Generated XLSX file: {output_file}")
-    print(f"All entries use Policy Number: {policy_num}")
+    if base_url:
+        print(f"Entries use Policy Numbers {start} to {start + count - 1} on {base_url}")
+    else:
+        print(f"All entries use Policy Number: {policy_num}")
 
 
 if __name__ == "__main__":
@@ -53,6 +156,11 @@ if __name__ == "__main__":
                         help='Output XLSX file name')
     parser.add_argument('--count', type=int, default=100,
                         help='Number of policy entries to generate')
+    parser.add_argument('--base-url', default=None,
+                        help='Point every entry at a distinct policy on this server, e.g. the '
+                             'fixture_server.py address http://127.0.0.1:8765')
+    parser.add_argument('--start', type=int, default=1,
+                        help='First policy number with --base-url')
     
     args = parser.parse_args()
-    generate_policy_comparison_data(args.output, args.count)
\ No newline at end of file
+    generate_policy_comparison_data(args.output, args.count, args.base_url, args.start)
\ No newline at end of file
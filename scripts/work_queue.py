@@ -0,0 +1,229 @@
+"""
+SQLite work queue for comparing one workbook on several runners
+
+A coordinator loads the URL pairs into a SQLite database on a filesystem
+every runner can reach. Any number of worker processes, on this machine or
+others, then claim pairs from it, compare them and push each result back;
+the coordinator waits for the queue to drain and writes a single report
+from the stored results in input order.
+
+Every pair moves through the states
+
+    pending -> leased -> done
+                      -> failed   (the lease ran out max_attempts times)
+
+A claim leases a pair to one worker for `lease_seconds`. Workers renew the
+leases of the pairs they hold with a heartbeat, so a pair is only handed to
+another worker once its worker has stopped heartbeating, for example
+because it crashed or its machine went away.
+
+SQLite locking on network filesystems is only as good as the filesystem's
+own locking; NFS with working locks is fine, SMB shares often are not.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+PAIR_STATES = ('pending', 'leased', 'done', 'failed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pairs (
+    id INTEGER PRIMARY KEY,
+    pair TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS pairs_state ON pairs (state, lease_expires);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    started REAL,
+    heartbeat REAL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    run_stats TEXT
+);
+"""
+
+
+class WorkQueue:
+    """
+    URL pairs and their results in a SQLite database shared by a
+    coordinator and its workers; safe to use from several threads
+    """
+
+    def __init__(self, path, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        # Autocommit, with explicit transactions where reads and writes must not interleave
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        with self._lock:
+            self._db.executescript(_SCHEMA)
+
+    def _transaction(self, statements):
+        """
+        Run statements(cursor) in one write transaction and return its result
+        """
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(cursor)
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+            return result
+
+    def load(self, url_pairs, batch_size=1000):
+        """
+        Add url_pairs, any iterable, unless an earlier coordinator already
+        loaded the queue; returns the number of pairs in the queue
+        """
+        existing = self.size()
+        if existing:
+            print(f"Work queue {self.path} already holds {existing} URL pairs, continuing it")
+            return existing
+
+        batch = []
+        loaded = 0
+        for pair in url_pairs:
+            batch.append((json.dumps(pair),))
+            if len(batch) >= batch_size:
+                self._transaction(lambda cursor: cursor.executemany('INSERT INTO pairs (pair) VALUES (?)', batch))
+                loaded += len(batch)
+                batch = []
+        if batch:
+            self._transaction(lambda cursor: cursor.executemany('INSERT INTO pairs (pair) VALUES (?)', batch))
+            loaded += len(batch)
+        print(f"Loaded {loaded} URL pairs into work queue {self.path}")
+        return loaded
+
+    def size(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM pairs').fetchone()[0]
+
+    def register(self, worker):
+        now = time.time()
+        self._transaction(lambda cursor: cursor.execute(
+            'INSERT INTO workers (name, started, heartbeat) VALUES (?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET heartbeat = excluded.heartbeat', (worker, now, now)))
+
+    def claim(self, worker, limit=1):
+        """
+        Lease up to `limit` pairs to worker and return them as
+        (pair id, pair) tuples; pairs whose lease ran out are claimed again
+        until they have been leased max_attempts times
+        """
+        def statements(cursor):
+            now = time.time()
+            cursor.execute("UPDATE pairs SET state = 'failed', error = ? "
+                           "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                           (f"Lease expired {self.max_attempts} times without a result", now, self.max_attempts))
+            rows = cursor.execute("SELECT id, pair FROM pairs "
+                                  "WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                                  "ORDER BY id LIMIT ?", (now, limit)).fetchall()
+            cursor.executemany("UPDATE pairs SET state = 'leased', worker = ?, lease_expires = ?, "
+                               "attempts = attempts + 1 WHERE id = ?",
+                               [(worker, now + self.lease_seconds, pair_id) for pair_id, _ in rows])
+            return [(pair_id, json.loads(pair)) for pair_id, pair in rows]
+        return self._transaction(statements)
+
+    def heartbeat(self, worker, pair_ids):
+        """
+        Renew the leases worker holds on pair_ids
+        """
+        pair_ids = list(pair_ids)
+
+        def statements(cursor):
+            now = time.time()
+            cursor.execute('UPDATE workers SET heartbeat = ? WHERE name = ?', (now, worker))
+            cursor.executemany("UPDATE pairs SET lease_expires = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                               [(now + self.lease_seconds, pair_id, worker) for pair_id in pair_ids])
+        self._transaction(statements)
+
+    def complete(self, worker, pair_id, result):
+        """
+        Store a pair's result, a JSON-serializable dict; the first result
+        pushed for a pair wins
+        """
+        record = json.dumps(result)
+
+        def statements(cursor):
+            cursor.execute("UPDATE pairs SET state = 'done', worker = ?, result = ? WHERE id = ? AND state != 'done'",
+                           (worker, record, pair_id))
+            cursor.execute('UPDATE workers SET completed = completed + 1, heartbeat = ? WHERE name = ?',
+                           (time.time(), worker))
+        self._transaction(statements)
+
+    def finish_worker(self, worker, run_stats):
+        self._transaction(lambda cursor: cursor.execute(
+            'UPDATE workers SET heartbeat = ?, run_stats = ? WHERE name = ?',
+            (time.time(), json.dumps(run_stats), worker)))
+
+    def counts(self):
+        """
+        Number of pairs in each state
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT state, COUNT(*) FROM pairs GROUP BY state').fetchall()
+        counts = dict.fromkeys(PAIR_STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def unfinished(self, other_than=None):
+        """
+        Number of pairs pending or leased, leaving out the pairs leased to
+        worker `other_than`, if given
+        """
+        if other_than is None:
+            counts = self.counts()
+            return counts['pending'] + counts['leased']
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pairs WHERE state = 'pending' "
+                                    "OR (state = 'leased' AND worker != ?)", (other_than,)).fetchone()[0]
+
+    def workers(self):
+        """
+        {name: {'heartbeat', 'completed', 'run_stats'}} of every worker
+        that joined the queue
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT name, heartbeat, completed, run_stats FROM workers').fetchall()
+        return {name: {'heartbeat': heartbeat, 'completed': completed,
+                       'run_stats': json.loads(run_stats) if run_stats else None}
+                for name, heartbeat, completed, run_stats in rows}
+
+    def results(self, batch_size=100):
+        """
+        Yield (pair, state, result or None, error or None) in input order,
+        reading the results a batch at a time
+        """
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute('SELECT id, pair, state, result, error FROM pairs WHERE id > ? '
+                                        'ORDER BY id LIMIT ?', (last_id, batch_size)).fetchall()
+            if not rows:
+                return
+            for pair_id, pair, state, result, error in rows:
+                yield json.loads(pair), state, json.loads(result) if result else None, error
+            last_id = rows[-1][0]
+
+    def print_progress(self):
+        counts = self.counts()
+        now = time.time()
+        alive = sum(1 for worker in self.workers().values()
+                    if worker['heartbeat'] and now - worker['heartbeat'] < self.lease_seconds)
+        print(f"Work queue: {counts['done']} done, {counts['leased']} leased, {counts['pending']} pending, "
+              f"{counts['failed']} failed; {alive} workers heartbeating")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
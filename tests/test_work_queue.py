@@ -0,0 +1,48 @@
+"""
+End-to-end run of the SQLite work queue: a coordinator with several local
+worker processes, each fetching with several threads, against the offline
+fixture server
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from fixture_server import PolicyPages, serve  # noqa: E402
+from test_data_generator import generate_policy_comparison_data  # noqa: E402
+
+PAIRS = 12
+
+
+class QueueRunTest(unittest.TestCase):
+
+    def test_coordinator_with_local_workers_drains_the_queue(self):
+        with tempfile.TemporaryDirectory() as tmp_dir, serve(PolicyPages(lines=40)) as base_url:
+            config = os.path.join(tmp_dir, 'pairs.xlsx')
+            generate_policy_comparison_data(config, count=PAIRS, base_url=base_url)
+            queue_path = os.path.join(tmp_dir, 'queue.db')
+            output = os.path.join(tmp_dir, 'results', 'comparisons.xlsx')
+
+            run = subprocess.run(
+                [sys.executable, os.path.join(SCRIPTS_DIR, 'compare_urls.py'), '--config', config,
+                 '--output', output, '--headless', '--no-cache', '--rate-limit', '0',
+                 '--queue', queue_path, '--spawn-workers', '2', '--workers', '3'],
+                cwd=tmp_dir, capture_output=True, text=True, timeout=300)
+            self.assertEqual(run.returncode, 0, run.stdout[-3000:] + run.stderr[-3000:])
+
+            with sqlite3.connect(queue_path) as db:
+                states = dict(db.execute('SELECT state, COUNT(*) FROM pairs GROUP BY state').fetchall())
+                runners = db.execute('SELECT COUNT(*) FROM workers WHERE run_stats IS NOT NULL').fetchone()[0]
+            self.assertEqual(states, {'done': PAIRS})
+            self.assertEqual(runners, 2)
+            self.assertTrue(os.path.exists(output))
+
+
+if __name__ == '__main__':
+    unittest.main()